@@ -1 +1,97 @@
+#!/usr/bin/env python
+"""
+Gemeinsamer Einstiegspunkt für die Analyse-Werkzeuge in user_data/analysis.
 
+    python trade.py download --sync --async --resample
+    python trade.py resample --timeframes 15m,30m,1h,4h
+    python trade.py scan local --workers 4 --min-corr 0.7
+    python trade.py scan csv | scan 15m
+    python trade.py backtest --pair1 ETHUSDT --pair2 ETHDAI --no-plot
+    python trade.py batch stationary_pairs_15m_local.csv
+    python trade.py sweep --pair1 ... --pair2 ...
+    python trade.py features --horizons 1,6,12,24
+    python trade.py stream --pairs 200 --replay 500 --prom stream.prom
+    python trade.py bench [suite|indicators|signals|startup] ...
+
+Alle Argumente nach dem Unterbefehl (bzw. der Variante) gehen unverändert an main() des
+jeweiligen Skripts, `trade.py scan local --help` zeigt also dessen Hilfe. Das Modul wird erst
+beim Aufruf importiert: `trade.py --help` lädt weder numpy/pandas noch statsmodels, ccxt oder
+matplotlib (Startzeit-Budget prüft `trade.py bench startup`).
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_DIRS = (os.path.join(ROOT, 'user_data', 'analysis'), os.path.join(ROOT, 'user_data', 'strategies'))
+
+# Unterbefehl -> {Variante: (Modul, Kurzbeschreibung)}; die erste Variante ist der Default
+COMMANDS = {
+    'download': {'': ('download_binance_pairs', "OHLCV-Daten von Binance laden/aktualisieren")},
+    'resample': {'': ('resample', "Höhere Timeframes lokal aus den 5m-Kerzen ableiten")},
+    'scan': {
+        'local': ('find_stationary_pairs_local', "stationäre Paare in user_data/data/binance"),
+        'csv': ('find_stationary_pairs_from_csv', "stationäre Paare in data/binance"),
+        '15m': ('find_stationary_pairs_15m', "1h-Scan live von Binance, Bestätigung auf 15m"),
+    },
+    'backtest': {'': ('spread_mean_reversion_backtest', "Spread-Mean-Reversion-Backtest für ein Paar")},
+    'batch': {'': ('batch_backtest', "Backtest aller Paare einer Scanner-Ausgabe")},
+    'sweep': {'': ('spread_sweep', "Parameter-Grid des Spread-Backtests")},
+    'features': {'': ('volume_feature_analysis', "Vorhersagekraft der Volumen-Features")},
+    'stream': {'': ('candle_stream', "Kerzen-Stream mit Ringpuffern und Signal je Kerzenschluss")},
+    'bench': {
+        'suite': ('bench', "Benchmark-Suite mit JSON-Baseline"),
+        'indicators': ('bench_indicators', "Parität und Benchmark der Indikator-Kernels"),
+        'signals': ('bench_signals', "Buy/Sell-Signale: NumPy gegen pandas"),
+        'startup': ('bench', "Import-Zeiten der CLI (python -X importtime) gegen das Budget"),
+    },
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='trade.py', description="Analyse-Werkzeuge (Paar-Scan, Backtests, "
+                                                                  "Features, Benchmarks)")
+    sub = parser.add_subparsers(dest='command', metavar='BEFEHL', required=True)
+    for command, variants in COMMANDS.items():
+        names = [v for v in variants if v]
+        if names:
+            lines = [f"  {v:12s}{desc}" for v, (_, desc) in variants.items()]
+            help_text = f"{command} [{'|'.join(names)}] ..."
+            description = "Varianten (Default: erste):\n" + '\n'.join(lines)
+        else:
+            help_text = variants[''][1]
+            description = help_text
+        # Ohne eigenes -h: --help wird an das Skript durchgereicht
+        sub.add_parser(command, help=help_text, description=description, add_help=False,
+                       formatter_class=argparse.RawDescriptionHelpFormatter)
+    return parser
+
+
+def resolve(command, rest):
+    """(Modul, Variante, restliche Argumente) für einen Unterbefehl."""
+    variants = COMMANDS[command]
+    if rest and rest[0] in variants:
+        variant, rest = rest[0], rest[1:]
+    else:
+        variant = next(iter(variants))
+    if command == 'bench' and variant == 'startup':
+        rest = ['--startup', *rest]
+    return variants[variant][0], variant, rest
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    module_name, variant, rest = resolve(args.command, rest)
+    for path in SCRIPT_DIRS:
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    sys.argv = [' '.join(filter(None, ['trade.py', args.command, variant])), *rest]
+    module = importlib.import_module(module_name)
+    return module.main(rest)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
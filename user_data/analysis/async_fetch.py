@@ -0,0 +1,241 @@
+# user_data/analysis/async_fetch.py
+"""
+Nebenläufiges OHLCV-Laden mit ccxt.async_support.
+
+- begrenzte Anzahl gleichzeitiger Requests (concurrency)
+- ein gemeinsamer Token-Bucket über das Binance-Request-Gewicht (statt fixer Pausen
+  und ccxt-enableRateLimit)
+- Retry mit exponentiellem Backoff bei 429/418 und Netzwerkfehlern; ein Rate-Limit-Fehler
+  leert zusätzlich den Bucket, damit alle Worker gemeinsam pausieren
+- Ergebnisse laufen über einen Writer-Task in den Binär-Store, während weiter geladen wird
+
+Die Exchange wird übergeben (oder per make_async_exchange erzeugt), damit lokal gegen
+eine Fake-Exchange mit künstlicher Latenz und Rate-Limit-Fehlern getestet werden kann
+(fake_exchange.py, prüft auch die Lückenlosigkeit der geschriebenen Partitionen).
+"""
+
+import asyncio
+import random
+import time
+
+import pandas as pd
+from tqdm import tqdm
+
+import ohlcv_store
+
+WEIGHT_PER_MINUTE = 6000   # Binance Spot Request-Weight-Limit
+WEIGHT_SAFETY = 0.8        # nur 80% des Budgets ausnutzen
+CONCURRENCY = 16
+RETRIES = 5
+BACKOFF = 1.0              # Sekunden, verdoppelt sich pro Versuch
+RATE_LIMIT_PENALTY = 10.0  # Sekunden Pause für alle Worker nach 429/418
+
+
+def kline_weight(limit):
+    """Request-Gewicht von GET /api/v3/klines je nach limit."""
+    if limit <= 100:
+        return 1
+    if limit <= 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class TokenBucket:
+    """Gewichtsbasierter Token-Bucket, von allen Tasks einer Event-Loop gemeinsam genutzt."""
+
+    def __init__(self, capacity=WEIGHT_PER_MINUTE * WEIGHT_SAFETY, per_second=None, clock=time.monotonic):
+        self.capacity = capacity
+        self.per_second = capacity / 60.0 if per_second is None else per_second
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    async def acquire(self, weight=1):
+        # Lock sorgt für FIFO-Reihenfolge: große Requests verhungern nicht
+        async with self._lock:
+            self._refill()
+            while self.tokens < weight:
+                delay = (weight - self.tokens) / self.per_second
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self.tokens -= weight
+
+    def penalize(self, seconds):
+        """
+        Nach 429/418: Bucket leeren, sodass erst nach `seconds` wieder Tokens da sind.
+        Mehrere gleichzeitige Fehler verlängern die Pause nicht (kein Aufsummieren je Worker).
+        """
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.per_second)
+
+
+async def fetch_ohlcv_retry(exchange, bucket, symbol, timeframe, since=None, limit=1000,
+                            retries=RETRIES, backoff=BACKOFF, stats=None, penalty=RATE_LIMIT_PENALTY):
+    import ccxt  # Exception-Klassen; ccxt lädt erst mit dem ersten Request
+    for attempt in range(retries + 1):
+        await bucket.acquire(kline_weight(limit))
+        try:
+            return await exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+        except (ccxt.RateLimitExceeded, ccxt.DDoSProtection):
+            # 429 (RateLimitExceeded) bzw. 418 (IP-Ban, DDoSProtection)
+            if stats is not None:
+                stats['rate_limited'] += 1
+            bucket.penalize(penalty)
+            if attempt == retries:
+                raise
+        except ccxt.NetworkError:
+            if stats is not None:
+                stats['retries'] += 1
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+
+
+async def fetch_pages(exchange, bucket, symbol, timeframe, since, now, limit, emit, stats=None, **retry):
+    """Blättert ab `since` bis zur letzten abgeschlossenen Kerze; jede Seite geht an emit()."""
+    tf_ms = exchange.parse_timeframe(timeframe) * 1000
+    added = 0
+    while since + tf_ms <= now:
+        batch = await fetch_ohlcv_retry(exchange, bucket, symbol, timeframe, since, limit, stats=stats, **retry)
+        batch = [c for c in batch if c[0] >= since and c[0] + tf_ms <= now]
+        if not batch:
+            break
+        await emit(symbol, timeframe, batch)
+        added += len(batch)
+        since = batch[-1][0] + tf_ms
+    return added
+
+
+class StoreWriter:
+    """
+    Schreibt Seiten über eine Queue in den Binär-Store (Dateizugriffe im Thread, nicht in der Loop).
+    Scheitert ein Schreibvorgang, leert der Writer die Queue nur noch (emit() blockiert nie auf
+    einer vollen Queue); der Fehler kommt beim nächsten emit() und beim Verlassen des Kontexts.
+    """
+
+    def __init__(self, data_dir, maxsize=256):
+        self.data_dir = data_dir
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.written = 0
+        self.error = None
+        self._task = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.queue.put(None)
+        await self._task
+        if self.error is not None and exc_type is None:
+            raise self.error
+
+    async def emit(self, symbol, timeframe, batch):
+        if self.error is not None:
+            raise self.error
+        await self.queue.put((symbol.replace('/', ''), timeframe, batch))
+
+    async def _run(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue
+            name, timeframe, batch = item
+            try:
+                self.written += await asyncio.to_thread(ohlcv_store.append_ohlcv, self.data_dir, name, timeframe,
+                                                        batch)
+            except Exception as e:
+                self.error = e
+
+
+async def run_jobs(jobs, worker, concurrency=CONCURRENCY, desc=None):
+    """Führt worker(job) für alle Jobs mit höchstens `concurrency` gleichzeitigen Tasks aus."""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+    errors = {}
+
+    async def run(job):
+        async with semaphore:
+            try:
+                results[job] = await worker(job)
+            except Exception as e:
+                errors[job] = e
+            bar.update(1)
+
+    with tqdm(total=len(jobs), desc=desc, disable=desc is None) as bar:
+        await asyncio.gather(*(run(job) for job in jobs))
+    return results, errors
+
+
+def make_async_exchange():
+    import ccxt.async_support as ccxt_async
+    # Rate-Limit übernimmt der Token-Bucket
+    return ccxt_async.binance({'enableRateLimit': False})
+
+
+async def download(symbols, timeframes, data_dir, history_days, limit=1000,
+                   concurrency=CONCURRENCY, exchange=None, backoff=BACKOFF, penalty=RATE_LIMIT_PENALTY):
+    """
+    Async-Gegenstück zu download_binance_pairs.sync_ohlcv für alle (Symbol, Timeframe)-Jobs.
+    backoff/penalty: Pausen nach Netzwerk- bzw. Rate-Limit-Fehlern (Sekunden, für Tests kürzer).
+    """
+    own = exchange is None
+    exchange = exchange or make_async_exchange()
+    bucket = TokenBucket()
+    stats = {'rate_limited': 0, 'retries': 0}
+    now = exchange.milliseconds()
+    try:
+        async with StoreWriter(data_dir) as writer:
+            async def worker(job):
+                symbol, tf = job
+                last = ohlcv_store.last_timestamp(data_dir, symbol.replace('/', ''), tf)
+                tf_ms = exchange.parse_timeframe(tf) * 1000
+                since = now - history_days * 86400000 if last is None else last + tf_ms
+                return await fetch_pages(exchange, bucket, symbol, tf, since, now, limit, writer.emit, stats,
+                                         backoff=backoff, penalty=penalty)
+
+            jobs = [(s, tf) for tf in timeframes for s in symbols]
+            results, errors = await run_jobs(jobs, worker, concurrency, desc="Lade OHLCV (async)")
+    finally:
+        if own:
+            await exchange.close()
+    for (symbol, tf), e in errors.items():
+        print(f"Fehler bei {symbol} {tf}: {e}")
+    stats.update(candles=writer.written, errors=len(errors), waited=bucket.waited)
+    return stats
+
+
+async def fetch_closes(symbols, timeframe, limit, concurrency=CONCURRENCY, exchange=None, desc=None):
+    """Letzte `limit` Kerzen je Symbol als {symbol: Close-Serie mit DatetimeIndex}."""
+    own = exchange is None
+    exchange = exchange or make_async_exchange()
+    bucket = TokenBucket()
+    try:
+        async def worker(symbol):
+            return await fetch_ohlcv_retry(exchange, bucket, symbol, timeframe, limit=limit)
+
+        results, errors = await run_jobs(list(symbols), worker, concurrency, desc=desc)
+    finally:
+        if own:
+            await exchange.close()
+    for symbol, e in errors.items():
+        print(f"Fehler beim Laden von {symbol}: {e}")
+    closes = {}
+    for symbol in symbols:
+        if symbol not in results:
+            continue
+        df = pd.DataFrame(results[symbol], columns=list(ohlcv_store.COLUMNS))
+        closes[symbol] = pd.Series(df['close'].to_numpy(), index=pd.to_datetime(df['timestamp'], unit='ms'))
+    return closes
@@ -0,0 +1,143 @@
+# user_data/analysis/batch_backtest.py
+"""
+Batch-Backtest aller Paare aus einer Scanner-Ausgabe (stationary_pairs_*.csv).
+
+Jedes Symbol wird genau einmal geladen und von allen Paaren, in denen es vorkommt,
+wiederverwendet; die Paare laufen parallel über einen Prozess-Pool. Ergebnis ist eine
+Tabelle mit Trades, P&L, Trefferquote, Drawdown und ADF-Statistik je Paar.
+
+Beispiel:
+    python user_data/analysis/batch_backtest.py stationary_pairs_15m.csv --workers 8
+"""
+
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from tqdm import tqdm
+
+import ohlcv_store
+from coint_scan import adf_batch
+from instrument import collect, merge, timed
+from online_spread import cumulative_sums, rolling_zscore
+from spread_mean_reversion_backtest import (
+    DATA_DIR, ENTRY_Z, EXIT_Z, FEE_RATE, WINDOW, backtest,
+)
+from spread_sweep import hedge_spread
+
+SUMMARY_COLUMNS = ['pair1', 'pair2', 'timeframe', 'n', 'hedge_ratio', 'trades', 'final_pnl', 'hit_ratio',
+                   'max_drawdown', 'fee_paid', 'adf_stat', 'pvalue']
+
+
+def timeframe_from_filename(path):
+    """stationary_pairs_15m.csv / stationary_pairs_1h_local.csv -> '15m' / '1h'."""
+    match = re.search(r'stationary_pairs_(\d+[mhdw])', os.path.basename(path))
+    return match.group(1) if match else None
+
+
+def load_pairs(path):
+    pairs = pd.read_csv(path)
+    # Der 15m-Scanner schreibt ccxt-Symbole (ETH/USDT), der Store kennt ETHUSDT
+    for col in ('pair1', 'pair2'):
+        pairs[col] = pairs[col].str.replace('/', '', regex=False)
+    return pairs
+
+
+@timed('batch.pair')
+def evaluate_pair(s1, s2, window=WINDOW, entry_z=ENTRY_Z, exit_z=EXIT_Z, fee_rate=FEE_RATE):
+    """Backtest eines Paares auf zwei Close-Serien; Rückgabe: Kennzahlen als Dict."""
+    df = pd.concat([s1.rename('p1'), s2.rename('p2')], axis=1, join='inner').dropna()
+    if len(df) <= window:
+        return None
+    spread, hedge_ratio = hedge_spread(df, 'p1', 'p2')
+    z = rolling_zscore(*cumulative_sums(spread), window)
+    res = backtest(spread, z, entry_z, exit_z, fee_rate)
+    adf_stat, pvalue, _ = adf_batch(spread[None, :])
+    return {
+        'n': len(df),
+        'hedge_ratio': hedge_ratio,
+        'trades': len(res['trades']),
+        'final_pnl': res['final_pnl'],
+        'hit_ratio': res['hit_ratio'],
+        'max_drawdown': res['max_drawdown'],
+        'fee_paid': res['fee_paid'],
+        'adf_stat': adf_stat[0],
+        'pvalue': pvalue[0],
+    }
+
+
+_batch_state = {}
+
+
+def _init_batch(closes, params):
+    _batch_state.update(closes=closes, params=params)
+
+
+def _evaluate_chunk(pairs):
+    closes, params = _batch_state['closes'], _batch_state['params']
+    return [evaluate_pair(closes[p1], closes[p2], **params) for p1, p2 in pairs]
+
+
+def run_batch(pairs, timeframe, data_dir=DATA_DIR, workers=1, chunk_size=16, **params):
+    """Backtestet alle (pair1, pair2)-Tupel; fehlende Symbole werden übersprungen."""
+    symbols = sorted(set(p for pair in pairs for p in pair))
+    closes = {}
+    for s in tqdm(symbols, desc=f"Lade Symbole ({timeframe})"):
+        close = ohlcv_store.load_close(data_dir, s, timeframe)
+        if close is not None:
+            closes[s] = close.astype(float)
+    todo = [(p1, p2) for p1, p2 in pairs if p1 in closes and p2 in closes]
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+
+    results = []
+    with tqdm(total=len(todo), desc="Backteste Paare") as bar:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch,
+                                     initargs=(closes, params)) as pool:
+                for out, stages in pool.map(collect, [_evaluate_chunk] * len(chunks), chunks):
+                    merge(stages)
+                    results.extend(out)
+                    bar.update(len(out))
+        else:
+            _init_batch(closes, params)
+            for chunk in chunks:
+                results.extend(_evaluate_chunk(chunk))
+                bar.update(len(chunk))
+
+    rows = [dict(pair1=p1, pair2=p2, timeframe=timeframe, **res)
+            for (p1, p2), res in zip(todo, results) if res is not None]
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    return summary.sort_values('final_pnl', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtestet alle Paare einer stationary_pairs-CSV")
+    parser.add_argument('pairs_csv', help="Ausgabe eines find_stationary_pairs-Scanners")
+    parser.add_argument('--timeframe', default=None, help="Default: aus dem Dateinamen")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--window', type=int, default=WINDOW)
+    parser.add_argument('--entry-z', type=float, default=ENTRY_Z)
+    parser.add_argument('--exit-z', type=float, default=EXIT_Z)
+    parser.add_argument('--fee', type=float, default=FEE_RATE)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--out', default=None, help="Default: backtest_summary_{tf}.csv")
+    args = parser.parse_args(argv)
+
+    timeframe = args.timeframe or timeframe_from_filename(args.pairs_csv)
+    if timeframe is None:
+        parser.error("Timeframe nicht aus dem Dateinamen ableitbar, bitte --timeframe angeben")
+    scan = load_pairs(args.pairs_csv)
+    pairs = list(zip(scan['pair1'], scan['pair2']))
+    summary = run_batch(pairs, timeframe, args.data_dir, args.workers, window=args.window,
+                        entry_z=args.entry_z, exit_z=args.exit_z, fee_rate=args.fee)
+    out = args.out or f"backtest_summary_{timeframe}.csv"
+    summary.to_csv(out, index=False)
+    print(f"{len(summary)} von {len(pairs)} Paaren getestet.")
+    print(summary.head(20).to_string(index=False))
+    print(f"Ergebnis gespeichert in: {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,451 @@
+# user_data/analysis/bench.py
+"""
+Benchmark-Suite für Strategien, Paar-Scanner und Spread-Backtest auf synthetischen Daten.
+
+Jeder Fall läuft in einem eigenen Prozess (saubere Peak-RSS-Messung). Gemessen werden
+Wall-Time (bestes von --repeat, Scanner: --scan-repeat), Peak-RSS des Prozesses und die
+Spitzen-Allokation per tracemalloc (eigener erster Lauf, da tracemalloc die Laufzeit verfälscht).
+
+    python user_data/analysis/bench.py --save bench_baseline.json
+    python user_data/analysis/bench.py --compare bench_baseline.json --tolerance 0.2
+    python user_data/analysis/bench.py --only scan --symbols 50,200
+    python user_data/analysis/bench.py --only _P --batch-pairs 100,200   # evaluate() gegen populate_* je Paar
+    python user_data/analysis/bench.py --startup      # Import-Zeiten von trade.py gegen das Budget
+
+Im Compare-Modus gilt ein Fall als Regression, wenn Wall-Time, Peak-RSS oder Allokationen
+mehr als `tolerance` (relativ) über der Baseline liegen; Exit-Code dann 1.
+
+Live-Check (läuft mit den Indikator-Fällen): kalter und Live-Fall einer Strategie laufen
+abwechselnd im selben Prozess (gleiche Last für beide, Median von --live-rounds; der Cache
+wird vor der Messung gewärmt und in keiner gemessenen Runde neu aufgebaut). Braucht der
+Live-Fall (eine neue Kerze, Cache warm) mehr als LIVE_RATIOS[Strategie] der kalten Zeit,
+ist der Exit-Code 1.
+
+--startup startet trade.py-Kommandos mit `python -X importtime` und summiert die Zeit der
+Top-Level-Imports; liegt ein Kommando über seinem Budget (STARTUP_BUDGETS), ist der
+Exit-Code 1 und die teuersten Imports werden angezeigt.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+STRATEGY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'strategies')
+STRATEGIES = ('TrendVolatilityStrategy', 'VolumeFeatureStrategy', 'SimpleMarketMaker')
+METRICS = ('wall_s', 'peak_rss_mb', 'alloc_peak_mb')
+TOLERANCE = 0.2
+LIVE_STEPS = 50  # neue Kerzen im Live-Fall, danach beginnt der Cache von vorn
+LIVE_ROUNDS = 101
+# Strategie -> höchster Anteil der kalten Zeit, den der Live-Fall brauchen darf
+# (Mediane bei 1000 Kerzen etwa 0.60 / 0.82 / 0.75; Spalten lesen und Anhängen kosten in beiden Fällen gleich)
+LIVE_RATIOS = {
+    'TrendVolatilityStrategy': 0.7,
+    # OBV/CVD sind auch kalt nur Cumsums, der Rest ist der pandas-Anteil
+    'VolumeFeatureStrategy': 0.88,
+    'SimpleMarketMaker': 0.85,
+}
+TRADE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'trade.py')
+# trade.py-Argumente -> Budget für die Import-Zeit in Sekunden
+STARTUP_BUDGETS = {
+    '--help': 0.15,
+    'download --help': 0.8,
+    'scan local --help': 0.8,
+    'scan csv --help': 0.8,
+    'scan 15m --help': 0.8,
+    'backtest --help': 0.8,
+    'batch --help': 0.8,
+    'sweep --help': 0.8,
+    'features --help': 0.8,
+    'resample --help': 0.8,
+    'stream --help': 0.8,
+}
+
+
+# ==== SYNTHETISCHE DATEN ====
+def synthetic_frame(candles, seed=0):
+    """OHLCV-Dataframe im freqtrade-Format (Spalte 'date', tz-aware)."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, candles)))
+    open_ = close * (1 + rng.normal(0, 0.002, candles))
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=candles, freq='5min', tz='UTC'),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.random(candles) * 0.002),
+        'low': np.minimum(open_, close) * (1 - rng.random(candles) * 0.002),
+        'close': close,
+        'volume': rng.random(candles) * 100,
+    })
+
+
+def synthetic_closes(symbols, candles, seed=0):
+    """Close-Matrix (Kerzen x Symbole): Random Walks, jedes fünfte Symbol kointegriert mit dem Vorgänger."""
+    rng = np.random.default_rng(seed)
+    values = np.cumsum(rng.normal(0, 1, (candles, symbols)), axis=0) + 100
+    for j in range(1, symbols, 5):
+        values[:, j] = 0.8 * values[:, j - 1] + rng.normal(0, 1, candles) + 20
+    return values, [f"SYM{j}USDT" for j in range(symbols)]
+
+
+# ==== FÄLLE ====
+# Jeder Fall: setup(config) -> Funktion ohne Argumente, die gemessen wird.
+def _strategy(name):
+    sys.path.insert(0, STRATEGY_DIR)
+    module = __import__(name)
+    strategy = getattr(module, name)()
+    if hasattr(strategy, 'feature_export'):
+        strategy.feature_export = False
+    return strategy
+
+
+def setup_indicators(config, name):
+    """Kalter Cache: jeder Lauf rechnet alle Indikatoren komplett."""
+    strategy = _strategy(name)
+    frames = [synthetic_frame(config['candles'], seed=i) for i in range(config['pairs'])]
+
+    def run():
+        strategy._indicators = None
+        # populate_indicators liefert ein neues Objekt, die Eingabe bleibt unverändert
+        for i, df in enumerate(frames):
+            strategy.populate_indicators(df, {'pair': f"P{i}/USDT"})
+    return run
+
+
+def setup_indicators_live(config, name, cold=False):
+    """
+    Live-Betrieb: jeder Lauf schiebt das Fenster um eine neue Kerze weiter (Cache vorab gewärmt).
+    cold=True: dieselben Fenster, aber jeder Lauf rechnet komplett (Vergleich im Live-Check).
+    """
+    strategy = _strategy(name)
+    steps, candles = config['live_steps'], config['candles']
+    # Fenster vorab schneiden (Views), damit beide Fälle nur populate_indicators messen
+    windows = [[df.iloc[k:k + candles] for k in range(steps)]
+               for df in (synthetic_frame(candles + steps, seed=i) for i in range(config['pairs']))]
+    step = [0]
+
+    def populate(k):
+        for i, frames in enumerate(windows):
+            strategy.populate_indicators(frames[k], {'pair': f"P{i}/USDT"})
+
+    def run():
+        step[0] += 1
+        k = step[0] % steps
+        if cold or k == 0:  # k == 0: Fenster aufgebraucht, dieser Lauf baut den Cache neu auf
+            strategy._indicators = None
+        populate(k)
+    populate(0)
+    return run
+
+
+def setup_signals(config, name):
+    strategy = _strategy(name)
+    frames = [strategy.populate_indicators(synthetic_frame(config['candles'], seed=i), {'pair': f"P{i}/USDT"})
+              for i in range(config['pairs'])]
+
+    def run():
+        for i, df in enumerate(frames):
+            metadata = {'pair': f"P{i}/USDT"}
+            strategy.populate_sell_trend(strategy.populate_buy_trend(df.copy(), metadata), metadata)
+    return run
+
+
+def setup_batch(config, name, pairs):
+    """Alle Paare als Matrix über batch_signals.evaluate (Indikatoren gestapelt über den IndicatorCache, Signale)."""
+    strategy = _strategy(name)
+    from batch_signals import evaluate
+    frames = {f"P{i}/USDT": synthetic_frame(config['candles'], seed=i) for i in range(pairs)}
+
+    def run():
+        strategy._indicators = None  # kalt wie setup_per_pair (sonst nur der Fall "Dataframe unverändert")
+        evaluate(strategy, frames)
+    return run
+
+
+def setup_per_pair(config, name, pairs):
+    """Gleiche Arbeit wie setup_batch, aber je Paar populate_indicators/_buy_trend/_sell_trend (kalt)."""
+    strategy = _strategy(name)
+    frames = {f"P{i}/USDT": synthetic_frame(config['candles'], seed=i) for i in range(pairs)}
+
+    def run():
+        strategy._indicators = None
+        for pair, df in frames.items():
+            metadata = {'pair': pair}
+            df = strategy.populate_indicators(df, metadata)
+            strategy.populate_sell_trend(strategy.populate_buy_trend(df, metadata), metadata)
+    return run
+
+
+def setup_scan(config, symbols):
+    from coint_scan import scan_pairs
+    values, names = synthetic_closes(symbols, config['scan_candles'])
+
+    def run():
+        scan_pairs(values, names)
+    return run
+
+
+def setup_backtest(config):
+    from online_spread import cumulative_sums, rolling_zscore
+    from spread_mean_reversion_backtest import ENTRY_Z, EXIT_Z, WINDOW, backtest
+    values, _ = synthetic_closes(2, config['backtest_candles'])
+    y, x = values[:, 1], values[:, 0]
+
+    def run():
+        xc = x - x.mean()
+        beta = np.dot(xc, y - y.mean()) / np.dot(xc, xc)
+        spread = y - beta * x
+        z = rolling_zscore(*cumulative_sums(spread), WINDOW)
+        backtest(spread, z, ENTRY_Z, EXIT_Z)
+    return run
+
+
+def setup_online_spread(config):
+    from online_spread import batch_spread
+    values, _ = synthetic_closes(2, config['backtest_candles'])
+
+    def run():
+        batch_spread(values[:, 1], values[:, 0], mode='rolling')
+        batch_spread(values[:, 1], values[:, 0], mode='ewm')
+    return run
+
+
+def setup_startup(config, command):
+    """Start von trade.py als eigener Prozess (Interpreter + Imports + Argumentprüfung)."""
+    argv = [sys.executable, TRADE, *command.split()]
+
+    def run():
+        subprocess.run(argv, stdout=subprocess.DEVNULL, check=True)
+    return run
+
+
+def cases(config):
+    """{name: (setup, args[, repeat])} aller Fälle für die Konfiguration."""
+    out = {}
+    for name in STRATEGIES:
+        out[f"strategy.{name}.indicators"] = (setup_indicators, (name,))
+        out[f"strategy.{name}.indicators_live"] = (setup_indicators_live, (name,))
+        out[f"strategy.{name}.signals"] = (setup_signals, (name,))
+        for n in config['batch_pairs']:
+            out[f"strategy.{name}.batch_P{n}"] = (setup_batch, (name, n))
+            out[f"strategy.{name}.per_pair_P{n}"] = (setup_per_pair, (name, n))
+    for n in config['symbols']:
+        out[f"scan.N{n}"] = (setup_scan, (n,), config['scan_repeat'])
+    out['backtest.spread'] = (setup_backtest, ())
+    out['backtest.online_spread'] = (setup_online_spread, ())
+    out['startup.help'] = (setup_startup, ('--help',))
+    out['startup.scan_local'] = (setup_startup, ('scan local --help',))
+    return out
+
+
+# ==== MESSUNG ====
+def _measure(case, config, repeat, queue):
+    try:
+        setup, args, *limit = cases(config)[case]
+        fn = setup(config, *args)
+        # Erster Lauf unter tracemalloc dient zugleich als Aufwärmen (Imports, Caches, Puffer)
+        tracemalloc.start()
+        fn()
+        alloc = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        wall = np.inf
+        for _ in range(min(repeat, *limit) if limit else repeat):
+            t = time.perf_counter()
+            fn()
+            wall = min(wall, time.perf_counter() - t)
+        rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Linux: KB
+        queue.put({'wall_s': wall, 'peak_rss_mb': rss_kb / 1024, 'alloc_peak_mb': alloc / 2 ** 20})
+    except ImportError as e:
+        queue.put({'skipped': f"{type(e).__name__}: {e}"})
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def _measure_live(name, config, rounds, queue):
+    """Kalter und Live-Fall abwechselnd, je der Median der Wall-Time."""
+    try:
+        # genug Fenster, damit keine gemessene Runde den Cache neu aufbaut; beide Fälle bekommen
+        # je Lauf frische Fenster-Objekte (pandas cacht sonst z.B. Spaltenwerte nur für den kalten Fall)
+        config = {**config, 'live_steps': max(config['live_steps'], rounds + 1)}
+        fns = {'cold': setup_indicators_live(config, name, cold=True), 'live': setup_indicators_live(config, name)}
+        walls = {key: [] for key in fns}
+        for _ in range(rounds):
+            for key, fn in fns.items():
+                t = time.perf_counter()
+                fn()
+                walls[key].append(time.perf_counter() - t)
+        queue.put({key: float(np.median(w)) for key, w in walls.items()})
+    except ImportError as e:
+        queue.put({'skipped': f"{type(e).__name__}: {e}"})
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def _spawn(target, *args):
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=(*args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def run_case(case, config, repeat):
+    return _spawn(_measure, case, config, repeat)
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Liste (Fall, Metrik, Baseline, Aktuell, Änderung) aller Regressionen über der Toleranz."""
+    regressions = []
+    for case, current in results.items():
+        base = baseline.get('results', {}).get(case)
+        if not base or 'wall_s' not in current or 'wall_s' not in base:
+            continue
+        for metric in METRICS:
+            if base[metric] > 0 and current[metric] > base[metric] * (1 + tolerance):
+                regressions.append((case, metric, base[metric], current[metric], current[metric] / base[metric] - 1))
+    return regressions
+
+
+def check_live(config, names=STRATEGIES, rounds=LIVE_ROUNDS, ratios=LIVE_RATIOS):
+    """Gibt kalt/live je Strategie aus; Rückgabe: Strategien, deren Live-Fall über dem Limit liegt."""
+    slow = []
+    for name in names:
+        res = _spawn(_measure_live, name, config, rounds)
+        if 'live' not in res:
+            print(f"live-check {name:30s} übersprungen ({res.get('skipped') or res.get('error')})")
+            continue
+        ratio = res['live'] / res['cold']
+        flag = 'OK' if ratio <= ratios[name] else 'ZU LANGSAM'
+        print(f"live-check {name:30s} kalt {res['cold'] * 1e3:8.2f} ms  live {res['live'] * 1e3:8.2f} ms "
+              f"({ratio:.0%}, Grenze {ratios[name]:.0%}) {flag}")
+        if ratio > ratios[name]:
+            slow.append(name)
+    return slow
+
+
+# ==== STARTZEIT ====
+def import_profile(command):
+    """(Summe der Top-Level-Imports in s, [(Sekunden, Modul)] absteigend) laut -X importtime."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', TRADE, *command.split()],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    top = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|', 2)
+        if not name.startswith('  '):  # eingerückt = von einem anderen Import ausgelöst
+            top.append((int(cumulative) / 1e6, name.strip()))
+    top.sort(reverse=True)
+    return sum(t for t, _ in top), top
+
+
+def check_startup(budgets=STARTUP_BUDGETS, show=5):
+    """Gibt die Import-Zeit je Kommando aus; Rückgabe: Kommandos über ihrem Budget."""
+    over = []
+    for command, budget in budgets.items():
+        total, top = import_profile(command)
+        flag = 'OK' if total <= budget else 'ÜBER BUDGET'
+        print(f"trade.py {command:22s} {total * 1e3:8.1f} ms (Budget {budget * 1e3:.0f} ms) {flag}")
+        if total > budget:
+            over.append(command)
+            for seconds, name in top[:show]:
+                print(f"    {seconds * 1e3:8.1f} ms  {name}")
+    return over
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark-Suite mit JSON-Baseline")
+    parser.add_argument('--candles', type=int, default=1000, help="Kerzen je Paar für die Strategien")
+    parser.add_argument('--pairs', type=int, default=20, help="Paare je Strategie-Fall")
+    parser.add_argument('--symbols', default='50,200,500', help="Symbolanzahlen für die Scanner")
+    parser.add_argument('--batch-pairs', default='100,200',
+                        help="Paaranzahlen für batch_signals.evaluate gegen populate_* je Paar")
+    parser.add_argument('--scan-candles', type=int, default=1000)
+    parser.add_argument('--scan-repeat', type=int, default=1, help="Wiederholungen der (langsamen) Scanner-Fälle")
+    parser.add_argument('--backtest-candles', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', default=None, help="Nur Fälle, deren Name diesen Text enthält")
+    parser.add_argument('--save', default=None, help="Ergebnisse als Baseline-JSON speichern")
+    parser.add_argument('--compare', default=None, help="Mit Baseline-JSON vergleichen")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="Erlaubte relative Verschlechterung")
+    parser.add_argument('--startup', action='store_true', help="Nur Import-Zeiten von trade.py prüfen")
+    parser.add_argument('--live-rounds', type=int, default=LIVE_ROUNDS,
+                        help="Abwechselnde Läufe kalt/live im Live-Check (0: aus)")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        over = check_startup()
+        if over:
+            print(f"{len(over)} Kommando(s) über dem Startzeit-Budget.")
+            sys.exit(1)
+        return
+
+    config = {
+        'candles': args.candles,
+        'pairs': args.pairs,
+        'symbols': [int(n) for n in args.symbols.split(',') if n],
+        'batch_pairs': [int(n) for n in args.batch_pairs.split(',') if n],
+        'scan_candles': args.scan_candles,
+        'scan_repeat': args.scan_repeat,
+        'live_steps': LIVE_STEPS,
+        'backtest_candles': args.backtest_candles,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != config:
+            print(f"Warnung: Konfiguration weicht von der Baseline ab: {baseline.get('config')}")
+
+    results = {}
+    for case in cases(config):
+        if args.only and args.only not in case:
+            continue
+        res = results[case] = run_case(case, config, args.repeat)
+        if 'wall_s' in res:
+            print(f"{case:45s} {res['wall_s'] * 1e3:10.2f} ms {res['peak_rss_mb']:8.1f} MB RSS "
+                  f"{res['alloc_peak_mb']:8.2f} MB alloc")
+        else:
+            print(f"{case:45s} übersprungen ({res.get('skipped') or res.get('error')})")
+
+    if args.save:
+        meta = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                'machine': platform.machine(), 'cpus': os.cpu_count(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with open(args.save, 'w') as f:
+            json.dump({'meta': meta, 'config': config, 'results': results}, f, indent=2)
+        print(f"Baseline gespeichert in: {args.save}")
+
+    failed = False
+    live_names = [name for name in STRATEGIES if f"strategy.{name}.indicators_live" in results]
+    if live_names and args.live_rounds > 0:
+        slow = check_live(config, live_names, args.live_rounds)
+        if slow:
+            print(f"{len(slow)} Strategie(n): Live-Fall nicht schneller als erlaubt.")
+            failed = True
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if not regressions:
+            print(f"Keine Regressionen (Toleranz {args.tolerance:.0%}).")
+        else:
+            print(f"{len(regressions)} Regression(en) über {args.tolerance:.0%}:")
+            for case, metric, base, current, change in regressions:
+                print(f"  {case} {metric}: {base:.4g} -> {current:.4g} (+{change:.0%})")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
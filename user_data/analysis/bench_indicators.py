@@ -0,0 +1,127 @@
+# user_data/analysis/bench_indicators.py
+"""
+Paritätsprüfung und Benchmark der NumPy-Indikator-Kernels gegen das Package 'ta'.
+
+    python user_data/analysis/bench_indicators.py                 # Parität + Benchmark 10k / 1M
+    python user_data/analysis/bench_indicators.py --sizes 10000 --pairs 200
+
+Parität: jede Kernel-Ausgabe muss (inkl. NaN-Positionen) innerhalb TOLERANCE mit ta bzw.
+pandas übereinstimmen, sonst Exit-Code 1. Der Benchmark misst pro Größe ta/pandas gegen
+die Kernels auf einer Serie sowie die Kernels auf einer (Paare x Kerzen)-Matrix.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'strategies'))
+import indicator_kernels as kernels  # noqa: E402
+
+TOLERANCE = 1e-9  # relativ zum Betrag des Referenzwerts (mindestens 1)
+
+
+def synthetic_ohlcv(n, pairs=None, seed=0):
+    shape = (n,) if pairs is None else (pairs, n)
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, shape), axis=-1))
+    open_ = close * (1 + rng.normal(0, 0.002, shape))
+    high = np.maximum(open_, close) * (1 + rng.random(shape) * 0.002)
+    low = np.minimum(open_, close) * (1 - rng.random(shape) * 0.002)
+    volume = rng.random(shape) * 100
+    return open_, high, low, close, volume
+
+
+def reference(open_, high, low, close, volume):
+    """Dieselben Indikatoren über ta/pandas (wie bisher in den Strategien)."""
+    import ta
+    c, v = pd.Series(close), pd.Series(volume)
+    return {
+        'ema': ta.trend.ema_indicator(close=c, window=50).to_numpy(),
+        'atr': ta.volatility.average_true_range(high=pd.Series(high), low=pd.Series(low), close=c,
+                                                window=14).to_numpy(),
+        'obv': ta.volume.on_balance_volume(close=c, volume=v).to_numpy(),
+        'cvd': (np.where(close > open_, volume, 0) - np.where(close < open_, volume, 0)).cumsum(),
+        'sma': c.rolling(window=20).mean().to_numpy(),
+        'std': c.rolling(window=20).std().to_numpy(),
+    }
+
+
+def compute(open_, high, low, close, volume, buffers=None):
+    buffers = buffers or {}
+    return {
+        'ema': kernels.ema(close, 50, out=buffers.get('ema')),
+        'atr': kernels.atr(high, low, close, 14, out=buffers.get('atr')),
+        'obv': kernels.obv(close, volume, out=buffers.get('obv')),
+        'cvd': kernels.cvd(open_, close, volume, out=buffers.get('cvd')),
+        'sma': kernels.sma(close, 20, out=buffers.get('sma')),
+        'std': kernels.rolling_std(close, 20, out=buffers.get('std')),
+    }
+
+
+def check_parity(n=5000, pairs=4):
+    """Vergleicht jede Zeile der Matrix-Ausgabe mit ta/pandas; Rückgabe: Liste der Abweichungen."""
+    data = synthetic_ohlcv(n, pairs, seed=1)
+    got = compute(*data)
+    failures = []
+    for p in range(pairs):
+        ref = reference(*(a[p] for a in data))
+        for name, expected in ref.items():
+            actual = got[name][p]
+            if not np.array_equal(np.isnan(actual), np.isnan(expected)):
+                failures.append(f"{name}[{p}]: NaN-Positionen weichen ab")
+                continue
+            err = np.nanmax(np.abs(actual - expected) / np.maximum(1.0, np.abs(expected)))
+            if err > TOLERANCE:
+                failures.append(f"{name}[{p}]: max. rel. Abweichung {err:.2e}")
+    return failures
+
+
+def _timeit(fn, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def benchmark(n, pairs, repeat=3):
+    series = synthetic_ohlcv(n)
+    t_ta = _timeit(lambda: reference(*series), 1)
+    buffers = {name: np.empty(n) for name in ('ema', 'atr', 'obv', 'cvd', 'sma', 'std')}
+    t_np = _timeit(lambda: compute(*series, buffers=buffers), repeat)
+    matrix = synthetic_ohlcv(max(n // pairs, 300), pairs)
+    mbuf = {name: np.empty(matrix[0].shape) for name in buffers}
+    t_mat = _timeit(lambda: compute(*matrix, buffers=mbuf), repeat)
+    return {'candles': n, 'ta_s': t_ta, 'numpy_s': t_np, 'speedup': t_ta / t_np,
+            'matrix': f"{matrix[0].shape[0]}x{matrix[0].shape[1]}", 'matrix_s': t_mat}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parität und Benchmark der Indikator-Kernels")
+    parser.add_argument('--sizes', default='10000,1000000', help="Kerzenanzahlen, kommagetrennt")
+    parser.add_argument('--pairs', type=int, default=100, help="Zeilen der Matrix im Matrix-Benchmark")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-bench', action='store_true', help="Nur Parität prüfen")
+    args = parser.parse_args(argv)
+
+    failures = check_parity()
+    if failures:
+        print("Parität FEHLGESCHLAGEN:")
+        for f in failures:
+            print(f"  {f}")
+        sys.exit(1)
+    print(f"Parität mit ta/pandas OK (Toleranz {TOLERANCE:g}).")
+    if args.no_bench:
+        return
+
+    rows = [benchmark(int(n), args.pairs, args.repeat) for n in args.sizes.split(',') if n]
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+
+
+if __name__ == '__main__':
+    main()
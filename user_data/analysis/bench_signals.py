@@ -0,0 +1,179 @@
+# user_data/analysis/bench_signals.py
+"""
+Allokationen und Latenz der Signal-Stufe (populate_buy_trend / populate_sell_trend).
+
+Vergleicht die bisherige pandas-Variante (Bool-Series, shift-Kopien, .loc-Zuweisung) mit
+den NumPy-Signal-Kernels der Strategien. Gemessen wird pro Aufruf mit tracemalloc die
+Spitzenwert der Allokationen sowie die Laufzeit (ohne tracemalloc).
+Vorher wird geprüft, dass beide Varianten dieselben Signale liefern und dass der Batch-Pfad
+(batch_signals.evaluate) über ein gleitendes Fenster exakt dieselben Indikatoren und Signale
+liefert wie populate_* je Paar; sonst Exit-Code 1.
+
+    python user_data/analysis/bench_signals.py --candles 1000 --calls 200
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'strategies'))
+from SimpleMarketMaker import SimpleMarketMaker  # noqa: E402
+from TrendVolatilityStrategy import TrendVolatilityStrategy  # noqa: E402
+from VolumeFeatureStrategy import VolumeFeatureStrategy  # noqa: E402
+from batch_signals import evaluate  # noqa: E402
+
+from bench_indicators import synthetic_ohlcv  # noqa: E402
+
+
+# ==== BISHERIGE VARIANTE (Referenz) ====
+def legacy_trend_buy(dataframe, metadata):
+    dataframe.loc[
+        (
+            (dataframe['ema50'] > dataframe['ema200']) &
+            (dataframe['ema50'].shift(1) <= dataframe['ema200'].shift(1)) &
+            (dataframe['atr'] > dataframe['atr_mean'])
+        ),
+        'buy'] = 1
+    return dataframe
+
+
+def legacy_trend_sell(dataframe, metadata):
+    dataframe.loc[
+        (
+            (dataframe['ema50'] < dataframe['ema200']) |
+            (dataframe['close'] > dataframe['close'].shift(1) * 1.02)
+        ),
+        'sell'] = 1
+    return dataframe
+
+
+def legacy_mm_buy(dataframe, metadata, grid_pct=0.003):
+    grid_level = dataframe['midprice'] * (1 - grid_pct)
+    dataframe.loc[(dataframe['close'] < grid_level), 'buy'] = 1
+    return dataframe
+
+
+def legacy_mm_sell(dataframe, metadata, grid_pct=0.003):
+    grid_level = dataframe['midprice'] * (1 + grid_pct)
+    dataframe.loc[(dataframe['close'] > grid_level), 'sell'] = 1
+    return dataframe
+
+
+def ohlcv_frame(n, seed=0):
+    open_, high, low, close, volume = synthetic_ohlcv(n, seed=seed)
+    return pd.DataFrame({'date': pd.date_range('2024-01-01', periods=n, freq='5min', tz='UTC'),
+                         'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume})
+
+
+def make_frame(n, strategy):
+    return strategy.populate_indicators(ohlcv_frame(n), {'pair': 'BENCH/USDT'})
+
+
+def measure(fn, frame, calls):
+    """Mittlere Spitzen-Allokation pro Aufruf (tracemalloc, Bytes) und Mikrosekunden pro Aufruf."""
+    metadata = {'pair': 'BENCH/USDT'}
+    fn(frame.copy(), metadata)  # Aufwärmen: Scratch-Puffer anlegen
+    frames = [frame.copy() for _ in range(calls)]
+    peaks = []
+    tracemalloc.start()
+    for df in frames:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(df, metadata)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    frames = [frame.copy() for _ in range(calls)]
+    t = time.perf_counter()
+    for df in frames:
+        fn(df, metadata)
+    return float(np.mean(peaks)), (time.perf_counter() - t) / calls * 1e6
+
+
+def signals_equal(a, b):
+    return all(np.array_equal(a[c].fillna(0).to_numpy(dtype=np.int8), b[c].to_numpy(dtype=np.int8))
+               for c in ('buy', 'sell'))
+
+
+def check_batch_parity(strategy_class, candles=600, pairs=5, steps=(1,) * 10 + (3, 12, 1, 40, 1, 9, 1)):
+    """
+    Schiebt ein Fenster über die Paare und vergleicht populate_* je Paar mit evaluate() (je
+    eine eigene Strategie-Instanz, beide mit warmem Cache). Beim Sprung um 40 Kerzen fehlt einem
+    Paar die zuletzt gecachte Kerze (Neuaufbau, eigene Gruppe), bei einem anderen wurde sie
+    umgeschrieben (Neuaufbau neben warmen Paaren). Rückgabe: Liste der Abweichungen.
+    """
+    single, batch = strategy_class(), strategy_class()
+    for strategy in (single, batch):
+        strategy.feature_export = False
+    frames = {f"P{i}/USDT": ohlcv_frame(candles + sum(steps), seed=i) for i in range(pairs)}
+    failures = []
+    k = 0
+    for step in steps:
+        k += step
+        window = {pair: df.iloc[k:k + candles] for pair, df in frames.items()}
+        if step == 40:
+            gap = window['P1/USDT']
+            window['P1/USDT'] = gap.drop(gap.index[-step - 1])
+            rewritten = window['P2/USDT'].copy()
+            rewritten.loc[rewritten.index[-step - 1], 'close'] *= 1.01
+            window['P2/USDT'] = rewritten
+        results = evaluate(batch, window)
+        for pair, df in window.items():
+            metadata = {'pair': pair}
+            df = single.populate_indicators(df, metadata)
+            df = single.populate_sell_trend(single.populate_buy_trend(df, metadata), metadata)
+            result = results[pair]
+            for name, values in result.indicators.items():
+                if not np.array_equal(df[name].to_numpy(), values, equal_nan=True):
+                    failures.append(f"{strategy_class.__name__} {pair} Kerze {k}: {name} weicht ab")
+            for side, values in (('buy', result.buy), ('sell', result.sell)):
+                if not np.array_equal(df[side].to_numpy(), values):
+                    failures.append(f"{strategy_class.__name__} {pair} Kerze {k}: {side} weicht ab")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="tracemalloc-Benchmark der Signal-Stufe")
+    parser.add_argument('--candles', type=int, default=1000)
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    failures = [f for cls in (TrendVolatilityStrategy, VolumeFeatureStrategy, SimpleMarketMaker)
+                for f in check_batch_parity(cls)]
+    if failures:
+        print("Batch-Pfad weicht vom Einzelpfad ab:")
+        for f in failures:
+            print(f"  {f}")
+        sys.exit(1)
+    print("Batch-Pfad (evaluate) gleich populate_* je Paar.")
+
+    rows = []
+    cases = [
+        ('TrendVolatility', TrendVolatilityStrategy(), legacy_trend_buy, legacy_trend_sell),
+        ('SimpleMarketMaker', SimpleMarketMaker(), legacy_mm_buy, legacy_mm_sell),
+    ]
+    for name, strategy, legacy_buy, legacy_sell in cases:
+        frame = make_frame(args.candles, strategy)
+
+        def legacy(df, metadata):
+            return legacy_sell(legacy_buy(df, metadata), metadata)
+
+        def current(df, metadata):
+            return strategy.populate_sell_trend(strategy.populate_buy_trend(df, metadata), metadata)
+
+        if not signals_equal(legacy(frame.copy(), {}), current(frame.copy(), {'pair': 'BENCH/USDT'})):
+            print(f"{name}: Signale weichen ab!")
+            sys.exit(1)
+        for variant, fn in (('pandas', legacy), ('numpy', current)):
+            peak, us = measure(fn, frame, args.calls)
+            rows.append({'strategie': name, 'variante': variant, 'peak_kb': peak / 1024, 'us_pro_aufruf': us})
+    print(f"Signale identisch. {args.candles} Kerzen, {args.calls} Aufrufe:")
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+# user_data/analysis/candle_stream.py
+"""
+Streaming-Marktdaten: die letzten Kerzen je Paar in NumPy-Ringpuffern, Signal beim Kerzenschluss.
+
+Feeds sind async iterierbar und liefern Kline- bzw. Trade-Ereignisse:
+  ReplayFeed  gespeicherte Kerzen aus ohlcv_store, über alle Paare zeitlich gemischt (lokal testen)
+  CcxtFeed    Websocket über ccxt.pro (watch_ohlcv, optional watch_trades)
+CandleStream verarbeitet die Ereignisse: laufende Kerzen (closed=False) und Trades aktualisieren
+nur die offene Kerze, eine geschlossene Kerze wird in den CandleRing des Paares geschrieben und
+on_close(pair, window) aufgerufen. window ist {spalte: View} der letzten Kerzen ohne Kopie;
+strategy_signal() macht daraus für Strategien mit BatchSignalMixin das Signal der letzten Kerze
+und führt dabei den IndicatorCache der Strategie weiter (nur die neue Kerze wird gerechnet,
+EMA/ATR laufen über die Ringgröße hinaus ungestört weiter).
+
+Die Feeds stempeln jedes Ereignis beim Eintreffen (received, perf_counter). Die Latenz von
+dort bis zum fertigen Signal, inklusive Wartezeit in Queue und Event-Loop, landet im
+instrument-Histogramm 'stream.close_to_signal' (--json / --prom wie instrument.py).
+
+    python user_data/analysis/candle_stream.py --data-dir user_data/data/binance --timeframe 5m \\
+        --pairs 200 --replay 500 --prom stream.prom
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import instrument
+import ohlcv_store
+from resample import timeframe_ms
+
+RING_SIZE = 500          # Kerzen je Paar
+LATENCY_SAMPLES = 100_000  # letzte Latenzen für Perzentile
+YIELD_EVERY = 1000       # Replay ohne Tempo: so oft die Event-Loop freigeben
+QUEUE_SIZE = 10_000
+STRATEGY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'strategies')
+
+OHLCV = ohlcv_store.COLUMNS[1:]
+# received: perf_counter beim Eintreffen im Feed (None: Zeitpunkt von handle())
+Kline = namedtuple('Kline', 'pair timestamp open high low close volume closed received', defaults=(None,))
+Trade = namedtuple('Trade', 'pair timestamp price amount received', defaults=(None,))
+
+
+# ==== RINGPUFFER ====
+class CandleRing:
+    """
+    Die letzten `size` Kerzen eines Paares. Jede Kerze steht doppelt im Puffer (Slot i und
+    i + size), daher ist jedes Fenster der letzten n Kerzen ein zusammenhängender Slice.
+    """
+
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self.timestamp = np.zeros(2 * size, dtype=np.int64)
+        self.data = np.zeros((len(OHLCV), 2 * size))
+        self.count = 0  # insgesamt geschriebene Kerzen
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    @property
+    def last(self):
+        """Zeitstempel der letzten Kerze oder None."""
+        return int(self.timestamp[(self.count - 1) % self.size]) if self.count else None
+
+    def append(self, timestamp, open_, high, low, close, volume):
+        i = self.count % self.size
+        self.timestamp[i] = self.timestamp[i + self.size] = timestamp
+        column = (open_, high, low, close, volume)
+        self.data[:, i] = column
+        self.data[:, i + self.size] = column
+        self.count += 1
+
+    def extend(self, columns):
+        """Hängt {spalte: array} an (z.B. Historie beim Start); nur die letzten size Kerzen zählen."""
+        ts = np.asarray(columns['timestamp'], dtype=np.int64)
+        n = len(ts)
+        if not n:
+            return
+        take = min(n, self.size)
+        slots = (self.count + n - take + np.arange(take)) % self.size
+        self.timestamp[slots] = self.timestamp[slots + self.size] = ts[n - take:]
+        for k, col in enumerate(OHLCV):
+            values = np.asarray(columns[col], dtype=np.float64)[n - take:]
+            self.data[k, slots] = values
+            self.data[k, slots + self.size] = values
+        self.count += n
+
+    def window(self, n=None):
+        """{'timestamp', 'open', ..., 'volume': read-only View} der letzten n Kerzen, älteste zuerst."""
+        n = len(self) if n is None else min(n, len(self))
+        end = (self.count - 1) % self.size + 1 + self.size
+        out = {'timestamp': self.timestamp[end - n:end]}
+        for k, col in enumerate(OHLCV):
+            out[col] = self.data[k, end - n:end]
+        for view in out.values():
+            view.flags.writeable = False
+        return out
+
+
+# ==== STREAM ====
+class CandleStream:
+
+    def __init__(self, timeframe, size=RING_SIZE, on_close=None, min_candles=1):
+        self.timeframe = timeframe
+        self.step = timeframe_ms(timeframe)
+        self.size = size
+        self.on_close = on_close      # on_close(pair, window) -> Signal, Ergebnis in self.signals
+        self.min_candles = min_candles
+        self.rings = {}
+        self.live = {}                # pair -> offene Kerze als Kline(closed=False)
+        self.signals = {}
+        self.closed = 0
+        self.stale = 0
+        self._partial = set()
+        self._latency = np.zeros(LATENCY_SAMPLES)
+        self._measured = 0
+
+    def ring(self, pair):
+        ring = self.rings.get(pair)
+        if ring is None:
+            ring = self.rings[pair] = CandleRing(self.size)
+        return ring
+
+    def preload(self, pair, columns):
+        """Historie (z.B. aus dem Store) ohne Signal in den Ring schreiben."""
+        self.ring(pair).extend(columns)
+
+    def handle(self, event):
+        """Verarbeitet ein Feed-Ereignis; bei Kerzenschluss Rückgabe des Signals (sonst None)."""
+        start = time.perf_counter() if event.received is None else event.received
+        if isinstance(event, Trade):
+            event = self._add_trade(event)
+            if event is None:
+                return None
+        if not event.closed:
+            self.live[event.pair] = event
+            return None
+        return self._close(event, start)
+
+    def _add_trade(self, trade):
+        """
+        Trade in die offene Kerze; der erste Trade im nächsten Bucket schließt sie (Rückgabe: Kline
+        mit dessen received). Die erste Kerze eines Paares beginnt mitten im Bucket und wird verworfen.
+        """
+        pair, price = trade.pair, trade.price
+        bucket = trade.timestamp // self.step * self.step
+        live = self.live.get(pair)
+        if live is None or bucket > live.timestamp:
+            self.live[pair] = Kline(pair, bucket, price, price, price, price, trade.amount, False)
+            if live is None:
+                self._partial.add(pair)
+                return None
+            if pair in self._partial:
+                self._partial.discard(pair)
+                return None
+            return live._replace(closed=True, received=trade.received)
+        if bucket < live.timestamp:
+            return None  # verspäteter Trade einer bereits geschlossenen Kerze
+        self.live[pair] = live._replace(high=max(live.high, price), low=min(live.low, price), close=price,
+                                        volume=live.volume + trade.amount)
+        return None
+
+    def _close(self, kline, start):
+        ring = self.ring(kline.pair)
+        if ring.count and kline.timestamp <= ring.last:
+            self.stale += 1  # doppelt oder verspätet; Lücken werden nicht aufgefüllt
+            instrument.count('stream.stale')
+            return None
+        ring.append(kline.timestamp, kline.open, kline.high, kline.low, kline.close, kline.volume)
+        live = self.live.get(kline.pair)
+        if live is not None and live.timestamp <= kline.timestamp:
+            del self.live[kline.pair]
+        self.closed += 1
+        if self.on_close is None or len(ring) < self.min_candles:
+            return None
+        signal = self.signals[kline.pair] = self.on_close(kline.pair, ring.window())
+        seconds = time.perf_counter() - start
+        instrument.observe('stream.close_to_signal', seconds)
+        self._latency[self._measured % LATENCY_SAMPLES] = seconds
+        self._measured += 1
+        return signal
+
+    def latency_percentiles(self, q=(50, 99, 99.9)):
+        """Perzentile der letzten LATENCY_SAMPLES Latenzen in Sekunden."""
+        samples = self._latency[:min(self._measured, LATENCY_SAMPLES)]
+        return np.percentile(samples, q) if len(samples) else np.full(len(q), np.nan)
+
+    async def run(self, feed, limit=None):
+        """Verarbeitet Ereignisse, bis der Feed endet bzw. limit Kerzen geschlossen wurden."""
+        events = feed.__aiter__()
+        try:
+            async for event in events:
+                self.handle(event)
+                if limit is not None and self.closed >= limit:
+                    break
+        finally:
+            await events.aclose()  # beendet z.B. die Watch-Tasks des CcxtFeed
+
+
+# ==== FEEDS ====
+class ReplayFeed:
+    """
+    Gespeicherte Kerzen als geschlossene Klines in Zeitreihenfolge (gleicher Zeitstempel:
+    Paar-Reihenfolge). replay=N spielt je Paar nur die letzten N Kerzen ab, warmup() legt die
+    davor in die Ringe. speed=0 so schnell wie möglich, sonst Faktor gegenüber Echtzeit.
+    """
+
+    def __init__(self, data_dir, pairs, timeframe, replay=None, speed=0.0):
+        self.pairs = []
+        self.data = {}
+        self.split = {}
+        self.speed = speed
+        for pair in pairs:
+            data = ohlcv_store.read_ohlcv(data_dir, pair, timeframe)
+            if data is None or not len(data['timestamp']):
+                continue
+            self.pairs.append(pair)
+            self.data[pair] = data
+            n = len(data['timestamp'])
+            self.split[pair] = 0 if replay is None else max(n - replay, 0)
+
+    def warmup(self, stream):
+        for pair in self.pairs:
+            split = self.split[pair]
+            if split:
+                stream.preload(pair, {col: a[:split] for col, a in self.data[pair].items()})
+
+    def events(self):
+        """(Paarindex, Zeitstempel, OHLCV) aller abzuspielenden Kerzen, sortiert."""
+        parts = []
+        for k, pair in enumerate(self.pairs):
+            data, split = self.data[pair], self.split[pair]
+            parts.append(np.column_stack([np.full(len(data['timestamp']) - split, k),
+                                          data['timestamp'][split:],
+                                          *(data[col][split:] for col in OHLCV)]))
+        if not parts:
+            return np.empty((0, 2 + len(OHLCV)))
+        rows = np.concatenate(parts)
+        return rows[np.lexsort((rows[:, 0], rows[:, 1]))]
+
+    async def __aiter__(self):
+        rows = self.events()
+        previous = None
+        for n, (k, ts, *candle) in enumerate(rows.tolist()):
+            ts = int(ts)
+            if self.speed and previous is not None and ts > previous:
+                await asyncio.sleep((ts - previous) / 1000.0 / self.speed)
+            elif n % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            previous = ts
+            yield Kline(self.pairs[int(k)], ts, *candle, True, time.perf_counter())
+
+
+class CcxtFeed:
+    """
+    Websocket-Feed über ccxt.pro. watch_ohlcv liefert nur die laufende Kerze; sie gilt als
+    geschlossen, sobald eine neuere eintrifft. trades=True abonniert zusätzlich die Trades.
+    """
+
+    def __init__(self, exchange, pairs, timeframe, trades=False, queue_size=QUEUE_SIZE):
+        self.exchange = exchange
+        self.pairs = list(pairs)
+        self.timeframe = timeframe
+        self.trades = trades
+        self.queue_size = queue_size
+
+    async def _watch_ohlcv(self, pair, queue):
+        last = None
+        while True:
+            candles = await self.exchange.watch_ohlcv(pair, self.timeframe)
+            received = time.perf_counter()
+            for candle in candles:
+                ts = int(candle[0])
+                if last is not None and ts < last.timestamp:
+                    continue
+                if last is not None and ts > last.timestamp:
+                    await queue.put(last._replace(closed=True, received=received))
+                last = Kline(pair, ts, *map(float, candle[1:6]), False, received)
+                await queue.put(last)
+
+    async def _watch_trades(self, pair, queue):
+        last_id = -1
+        while True:
+            trades = await self.exchange.watch_trades(pair)
+            received = time.perf_counter()
+            for trade in trades:
+                trade_id = int(trade['id']) if trade.get('id') is not None else None
+                if trade_id is not None:
+                    if trade_id <= last_id:
+                        continue  # ccxt liefert den Trade-Cache, bereits gesehene überspringen
+                    last_id = trade_id
+                await queue.put(Trade(pair, int(trade['timestamp']), float(trade['price']), float(trade['amount']),
+                                      received))
+
+    async def __aiter__(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        watch = self._watch_trades if self.trades else self._watch_ohlcv
+        tasks = [asyncio.ensure_future(watch(pair, queue)) for pair in self.pairs]
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def make_pro_exchange():
+    """Binance über ccxt.pro (Websocket); erst hier importiert."""
+    import ccxt.pro as ccxtpro
+    return ccxtpro.binance({'enableRateLimit': True})
+
+
+# ==== STRATEGIEN ====
+def strategy_signal(strategy):
+    """
+    on_close für Strategien mit BatchSignalMixin: (buy, sell) der letzten Kerze des Fensters.
+    Die Indikatoren kommen aus dem IndicatorCache der Strategie (Zustand je Paar, wie populate_indicators).
+    """
+    cache = strategy.indicator_cache()
+
+    def on_close(pair, window):
+        indicators = cache.advance(pair, window['timestamp'], window)
+        buy, sell = strategy.batch_signals({**window, **indicators})
+        return bool(buy[-1]), bool(sell[-1])
+    return on_close
+
+
+def load_strategy(name):
+    """Strategie-Klasse gleichen Namens aus user_data/strategies instanziieren."""
+    if STRATEGY_DIR not in sys.path:
+        sys.path.insert(0, STRATEGY_DIR)
+    return getattr(importlib.import_module(name), name)()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kerzen-Stream mit Ringpuffern je Paar; Replay aus dem Store "
+                                                 "oder live per Websocket")
+    parser.add_argument('--data-dir', default='user_data/data/binance')
+    parser.add_argument('--timeframe', default='5m')
+    parser.add_argument('--pairs', type=int, default=200, help="Anzahl Paare (Replay: die ersten im Store)")
+    parser.add_argument('--symbols', default=None, help="Kommagetrennte Paare statt --pairs")
+    parser.add_argument('--size', type=int, default=RING_SIZE, help="Kerzen je Ringpuffer")
+    parser.add_argument('--replay', type=int, default=500, help="Je Paar so viele Kerzen abspielen (Rest = Historie)")
+    parser.add_argument('--speed', type=float, default=0.0, help="Replay-Tempo (0 = so schnell wie möglich)")
+    parser.add_argument('--strategy', default='TrendVolatilityStrategy', help="Strategie-Klasse oder 'none'")
+    parser.add_argument('--live', action='store_true', help="Binance-Websocket (ccxt.pro) statt Replay")
+    parser.add_argument('--trades', action='store_true', help="Live: Kerzen aus Trades statt aus Klines bauen")
+    parser.add_argument('--limit', type=int, default=None, help="Nach so vielen geschlossenen Kerzen beenden")
+    parser.add_argument('--json', default=None, help="Histogramme als JSON")
+    parser.add_argument('--prom', default=None, help="Histogramme im Prometheus-Textformat")
+    args = parser.parse_args(argv)
+
+    on_close = None if args.strategy == 'none' else strategy_signal(load_strategy(args.strategy))
+    if args.symbols:
+        pairs = [s for s in args.symbols.split(',') if s]
+    else:
+        pairs = ohlcv_store.list_symbols(args.data_dir, args.timeframe)[:args.pairs]
+    stream = CandleStream(args.timeframe, size=args.size, on_close=on_close)
+
+    async def run():
+        if args.live:
+            exchange = make_pro_exchange()
+            try:
+                await stream.run(CcxtFeed(exchange, pairs, args.timeframe, trades=args.trades), limit=args.limit)
+            finally:
+                await exchange.close()
+        else:
+            feed = ReplayFeed(args.data_dir, pairs, args.timeframe, replay=args.replay, speed=args.speed)
+            feed.warmup(stream)
+            print(f"Replay: {len(feed.pairs)} Paare, Ringpuffer {args.size} Kerzen")
+            await stream.run(feed, limit=args.limit)
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"{stream.closed} Kerzen geschlossen in {elapsed:.2f}s ({stream.stale} verworfen), "
+          f"{len(stream.signals)} Paare mit Signal")
+    if on_close is not None:
+        p50, p99, p999 = stream.latency_percentiles() * 1e3
+        print(f"Kerzenschluss -> Signal: p50 {p50:.3f} ms, p99 {p99:.3f} ms, p99.9 {p999:.3f} ms")
+    if args.json:
+        instrument.write_json(args.json)
+    if args.prom:
+        instrument.write_prometheus(args.prom)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+# user_data/analysis/coint_scan.py
+"""
+Gemeinsame Scan-Engine für die find_stationary_pairs_*-Skripte.
+
+Statt pro Paar np.polyfit + adfuller aufzurufen, werden alle Close-Kurse in eine
+(Zeit x Symbol)-Matrix gelegt und Hedge-Ratios sowie ADF-Statistiken für viele
+Paare gleichzeitig berechnet. Die ADF-Regressionen werden dabei als gestapelte
+Least-Squares-Probleme (batched QR) gelöst. Mit autolag="AIC" entspricht das
+Ergebnis statsmodels.adfuller(spread) mit Default-Parametern.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from instrument import collect, merge, timed
+from price_panel import pack_valid, support_rows
+
+RESULT_COLUMNS = ['pair1', 'pair2', 'beta', 'adf_stat', 'pvalue', 'n']
+CHUNK_SIZE = 256  # Paare pro Batch (begrenzt den Speicher der gestapelten Designmatrizen)
+
+
+# ==== PAARE ====
+def upper_pairs(n_symbols):
+    """Alle (i, j) mit i < j in der Reihenfolge der bisherigen Doppelschleife."""
+    i, j = np.triu_indices(n_symbols, k=1)
+    return np.column_stack([i, j])
+
+
+# ==== HEDGE-RATIO ====
+@timed('scan.hedge_ratio')
+def hedge_ratios(y, x):
+    """Steigung der OLS-Regression y ~ a + b*x je Zeile (entspricht np.polyfit(x, y, 1)[0])."""
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.einsum('pm,pm->p', xc, yc) / np.einsum('pm,pm->p', xc, xc)
+
+
+# ==== ADF ====
+def default_maxlag(n):
+    """Schwert-Regel wie in statsmodels.adfuller (regression='c')."""
+    maxlag = int(np.ceil(12.0 * np.power(n / 100.0, 1 / 4.0)))
+    return min(n // 2 - 2, maxlag)
+
+
+_mackinnon = {}
+
+
+def _mackinnon_tables():
+    """
+    MacKinnon-Koeffizienten (regression='c', N=1); statsmodels/scipy erst beim ersten Test laden.
+    Die Tabellen sind privat in statsmodels; fehlen sie in einer Version, bleibt nur das
+    öffentliche mackinnonp (Eintrag 'public', skalar und damit langsamer).
+    """
+    if not _mackinnon:
+        try:
+            from scipy.special import ndtr
+            from statsmodels.tsa.adfvalues import (
+                _tau_largeps, _tau_maxs, _tau_mins, _tau_smallps, _tau_stars,
+            )
+            _mackinnon.update(small=_tau_smallps['c'][0][::-1], large=_tau_largeps['c'][0][::-1],
+                              star=_tau_stars['c'][0], max=_tau_maxs['c'][0], min=_tau_mins['c'][0], cdf=ndtr)
+        except (ImportError, KeyError, IndexError, TypeError):
+            from statsmodels.tsa.adfvalues import mackinnonp
+            _mackinnon['public'] = np.vectorize(lambda s: mackinnonp(s, regression='c', N=1), otypes=[np.float64])
+    return _mackinnon
+
+
+def mackinnon_pvalues(stats):
+    """Vektorisierte Variante von statsmodels.tsa.adfvalues.mackinnonp (regression='c', N=1)."""
+    tables = _mackinnon_tables()
+    stats = np.asarray(stats, dtype=np.float64)
+    if 'public' in tables:
+        valid = ~np.isnan(stats)
+        pvalues = np.full(stats.shape, np.nan)
+        if valid.any():
+            pvalues[valid] = tables['public'](stats[valid])
+        return pvalues
+    small = np.polyval(tables['small'], stats)
+    large = np.polyval(tables['large'], stats)
+    pvalues = tables['cdf'](np.where(stats <= tables['star'], small, large))
+    pvalues = np.where(stats > tables['max'], 1.0, pvalues)
+    pvalues = np.where(stats < tables['min'], 0.0, pvalues)
+    return np.where(np.isnan(stats), np.nan, pvalues)
+
+
+def _adf_design(x, lag):
+    """
+    Designmatrizen [const, Level, dx_{t-1} .. dx_{t-lag}] und Zielvektoren dx_t
+    für alle Zeilen von x (P x n) – gleiche Stichprobe wie adfuller mit diesem Lag.
+    """
+    n = x.shape[1]
+    dx = np.diff(x, axis=1)
+    nobs = n - 1 - lag
+    design = np.empty((x.shape[0], nobs, lag + 2))
+    design[:, :, 0] = 1.0
+    design[:, :, 1] = x[:, lag:n - 1]
+    for k in range(1, lag + 1):
+        design[:, :, k + 1] = dx[:, lag - k:n - 1 - k]
+    return design, dx[:, lag:]
+
+
+def _level_tstat(design, target):
+    """t-Wert des Level-Koeffizienten (Spalte 1) für gestapelte OLS-Probleme."""
+    nobs, k = design.shape[1], design.shape[2]
+    q, r = np.linalg.qr(design)
+    qty = np.einsum('pmk,pm->pk', q, target)
+    try:
+        r_inv = np.linalg.inv(r)
+    except np.linalg.LinAlgError:
+        r_inv = np.linalg.pinv(r)  # singuläre Regression (kollineare Spalten)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coef = np.einsum('pij,pj->pi', r_inv, qty)
+        ssr = np.einsum('pm,pm->p', target, target) - np.einsum('pk,pk->p', qty, qty)
+        scale = ssr / (nobs - k)
+        var = scale * np.einsum('pj,pj->p', r_inv[:, 1, :], r_inv[:, 1, :])
+        return coef[:, 1] / np.sqrt(var)
+
+
+@timed('scan.adf')
+def adf_batch(x, maxlag=None, autolag='AIC'):
+    """
+    ADF-Test (mit Konstante) für jede Zeile von x (P x n).
+    autolag='AIC' wählt den Lag wie statsmodels.adfuller, autolag=None nutzt maxlag fix.
+    Rückgabe: (adf_stat, pvalue, usedlag) als Arrays der Länge P, ungültige Serien = NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n_series, n = x.shape
+    if maxlag is None:
+        maxlag = default_maxlag(n)
+    if maxlag < 0:
+        raise ValueError("Zu wenige Datenpunkte für den ADF-Test")
+    stats = np.full(n_series, np.nan)
+    usedlag = np.full(n_series, maxlag)
+    # Konstante Serien verwirft adfuller mit ValueError
+    valid = np.flatnonzero(np.ptp(x, axis=1) > 0)
+    if len(valid) == 0:
+        return stats, stats.copy(), usedlag
+
+    if autolag is not None:
+        if autolag.lower() != 'aic':
+            raise ValueError(f"Nicht unterstütztes autolag: {autolag}")
+        # Alle Lags auf derselben Stichprobe: Präfixe der Designmatrix -> eine QR-Zerlegung reicht
+        design, target = _adf_design(x[valid], maxlag)
+        nobs = design.shape[1]
+        q, _ = np.linalg.qr(design)
+        qty = np.einsum('pmk,pm->pk', q, target)
+        yy = np.einsum('pm,pm->p', target, target)
+        ncols = np.arange(2, maxlag + 3)
+        ssr = yy[:, None] - np.cumsum(qty ** 2, axis=1)[:, 1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aic = nobs * (np.log(2 * np.pi) + np.log(ssr / nobs) + 1) + 2 * ncols
+        aic = np.where(np.isnan(aic), np.inf, aic)
+        usedlag[valid] = np.argmin(aic, axis=1)
+
+    for lag in np.unique(usedlag[valid]):
+        rows = valid[usedlag[valid] == lag]
+        design, target = _adf_design(x[rows], int(lag))
+        stats[rows] = _level_tstat(design, target)
+    return stats, mackinnon_pvalues(stats), usedlag
+
+
+# ==== PAAR-SCAN ====
+def _scan_chunk(values, valid, pairs, min_length, maxlag, autolag):
+    """Testet einen Block von Paaren; Paare mit gleicher gemeinsamer Stützmenge werden gemeinsam gerechnet."""
+    out = np.full((len(pairs), 4), np.nan)
+    groups = {}
+    for k, (i, j) in enumerate(pairs):
+        mask = valid[i] & valid[j]  # gepackte Bitmasken (Symbol x ceil(T/8))
+        groups.setdefault(mask.tobytes(), (mask, []))[1].append(k)
+    for mask, members in groups.values():
+        rows = support_rows(mask, len(values))
+        out[members, 3] = len(rows)
+        if len(rows) < max(min_length, 4):  # adfuller braucht mindestens 4 Punkte
+            continue
+        members = np.asarray(members)
+        y = values[np.ix_(rows, pairs[members, 0])].T
+        x = values[np.ix_(rows, pairs[members, 1])].T
+        beta = hedge_ratios(y, x)
+        spread = y - beta[:, None] * x
+        ok = np.isfinite(beta)
+        stat, pvalue, _ = adf_batch(spread[ok], maxlag=maxlag, autolag=autolag)
+        out[members, 0] = beta
+        out[members[ok], 1] = stat
+        out[members[ok], 2] = pvalue
+    return out
+
+
+@timed('scan.pairs')
+def scan_pairs(values, symbols, pairs=None, min_length=0, maxlag=None, autolag='AIC',
+               chunk_size=CHUNK_SIZE, desc=None, workers=1, valid=None, cache=None):
+    """
+    Cointegration-Scan über eine (Zeit x Symbol)-Matrix mit NaN für fehlende Werte.
+    Jedes Paar (i, j) wird auf seiner gemeinsamen Stützmenge getestet:
+    beta = polyfit(s_j, s_i), spread = s_i - beta * s_j, ADF auf den Spread.
+    Liefert ein DataFrame mit pair1/pair2/beta/adf_stat/pvalue/n in Paar-Reihenfolge;
+    Paare unter min_length bzw. mit ungültigem ADF fehlen (wie die try/except-Schleifen bisher).
+    workers > 1 verteilt die Paar-Blöcke auf einen Prozess-Pool (Ergebnis bis auf Rundung gleich dem seriellen Lauf,
+    da die Blöcke anders geschnitten und gruppiert werden).
+    valid: gepackte Gültigkeitsmaske (price_panel.pack_valid), sonst aus den NaN berechnet.
+    cache: scan_cache.PanelCache; bereits bekannte Paare werden nicht neu gerechnet.
+    Ist values eine float64-np.memmap (z.B. load_panel(low_memory=True)), blenden die Worker
+    dieselbe Datei ein, statt die Matrix ins Shared Memory zu kopieren.
+    """
+    source = values.filename if isinstance(values, np.memmap) and values.dtype == np.float64 else None
+    values = np.asarray(values, dtype=np.float64)
+    pairs = upper_pairs(len(symbols)) if pairs is None else np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+    if cache is None:
+        results = _scan_results(values, pairs, valid, min_length, maxlag, autolag, chunk_size, desc, workers, source)
+        return _to_frame(symbols, pairs, results)
+    params = (min_length, maxlag, autolag)
+    results, missing = cache.lookup(pairs, params)
+    if missing.any():
+        todo = pairs[missing]
+        results[missing] = _scan_results(values, todo, valid, min_length, maxlag, autolag, chunk_size, desc,
+                                         workers, source)
+        cache.store(todo, results[missing], params)
+    return _to_frame(symbols, pairs, results)
+
+
+def _scan_results(values, pairs, valid, min_length, maxlag, autolag, chunk_size, desc, workers, source=None):
+    """(Paare x 4)-Array beta/adf_stat/pvalue/n, NaN für nicht testbare Paare."""
+    if workers > 1 and len(pairs) > chunk_size:
+        if source is not None:
+            return _scan_parallel(values, pairs, min_length, maxlag, autolag, chunk_size, desc, workers,
+                                  source=source, valid=valid)
+        return _scan_parallel(values, pairs, min_length, maxlag, autolag, chunk_size, desc, workers)
+    valid = pack_valid(values) if valid is None else valid
+    results = np.full((len(pairs), 4), np.nan)
+    with tqdm(total=len(pairs), desc=desc, disable=desc is None) as bar:
+        for start in range(0, len(pairs), chunk_size):
+            block = pairs[start:start + chunk_size]
+            results[start:start + len(block)] = _scan_chunk(values, valid, block, min_length, maxlag, autolag)
+            bar.update(len(block))
+    return results
+
+
+# ==== PARALLELER SCAN ====
+_worker_state = {}
+
+
+def _init_worker(shm_name, shape):
+    """Hängt die Preis-Matrix aus dem Shared Memory ein (kein Pickle pro Worker/Block)."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _worker_state.update(shm=shm, values=values, valid=pack_valid(values))
+
+
+def _init_worker_file(path, valid):
+    """Blendet die Preis-Matrix aus der .npy-Datei ein (memmapped Panel, kein Kopieren)."""
+    values = np.load(path, mmap_mode='r')
+    _worker_state.update(values=values, valid=pack_valid(values) if valid is None else valid)
+
+
+def _scan_chunk_shared(start, block, min_length, maxlag, autolag):
+    state = _worker_state
+    return start, _scan_chunk(state['values'], state['valid'], block, min_length, maxlag, autolag)
+
+
+def _scan_parallel(values, pairs, min_length, maxlag, autolag, chunk_size, desc, workers, source=None, valid=None):
+    # Gleich große Blöcke aus dem oberen Dreieck, mehrere pro Worker für gleichmäßige Auslastung
+    chunk_size = max(1, min(chunk_size, -(-len(pairs) // (workers * 4))))
+    if source is not None:
+        return _run_pool(pairs, min_length, maxlag, autolag, chunk_size, desc, workers,
+                         _init_worker_file, (source, valid))
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    try:
+        np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+        return _run_pool(pairs, min_length, maxlag, autolag, chunk_size, desc, workers,
+                         _init_worker, (shm.name, values.shape))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _run_pool(pairs, min_length, maxlag, autolag, chunk_size, desc, workers, initializer, initargs):
+    results = np.full((len(pairs), 4), np.nan)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool, \
+            tqdm(total=len(pairs), desc=desc, disable=desc is None) as bar:
+        futures = [
+            pool.submit(collect, _scan_chunk_shared, start, pairs[start:start + chunk_size], min_length, maxlag,
+                        autolag)
+            for start in range(0, len(pairs), chunk_size)
+        ]
+        for future in as_completed(futures):
+            (start, out), stages = future.result()
+            merge(stages)
+            results[start:start + len(out)] = out
+            bar.update(len(out))
+    return results
+
+
+def _to_frame(symbols, pairs, results):
+    keep = np.isfinite(results[:, 2])
+    names = np.asarray(symbols, dtype=object)
+    return pd.DataFrame({
+        'pair1': names[pairs[keep, 0]],
+        'pair2': names[pairs[keep, 1]],
+        'beta': results[keep, 0],
+        'adf_stat': results[keep, 1],
+        'pvalue': results[keep, 2],
+        'n': results[keep, 3].astype(int),
+    }, columns=RESULT_COLUMNS)
@@ -1,36 +1,43 @@
-import ccxt
+import argparse
+import asyncio
 import pandas as pd
 import os
 import time
 from tqdm import tqdm
 
+import async_fetch
+import ohlcv_store
+import resample
+
 # === EINSTELLUNGEN ===
 TIMEFRAMES = ['5m', '15m', '1h']
 LIMITS = {'5m': 1000, '15m': 1000, '1h': 1000}   # max 1000 Kerzen pro Request
 PAUSE = 0.08    # Binance API Limitierung
 DATA_DIR = 'data/binance'
-os.makedirs(DATA_DIR, exist_ok=True)
-
-exchange = ccxt.binance({
-    'enableRateLimit': True,
-    'rateLimit': 1200,
-})
-
-print("Lade alle aktiven Binance-Paare ...")
-markets = exchange.load_markets()
-symbols = []
-for s in markets:
-    if not markets[s]['active']:
-        continue
-    # xxx/USDT, ETH/xxx, BTC/xxx
-    if s.endswith('/USDT') or s.startswith('ETH/') or s.startswith('BTC/'):
-        symbols.append(s)
-
-print(f"Gefunden: {len(symbols)} Paare.")
-print("Starte Download für 5m, 15m, 1h ...")
-
-def save_ohlcv(symbol, tf):
-    fname = f"{DATA_DIR}/{symbol.replace('/', '')}_{tf}.csv"
+HISTORY_DAYS = 90  # Sync-Modus: Tiefe der Historie beim ersten Download
+
+
+def make_exchange():
+    import ccxt  # erst laden, wenn wirklich ein Exchange gebraucht wird (~0.5 s)
+    return ccxt.binance({
+        'enableRateLimit': True,
+        'rateLimit': 1200,
+    })
+
+
+def select_symbols(markets):
+    symbols = []
+    for s in markets:
+        if not markets[s]['active']:
+            continue
+        # xxx/USDT, ETH/xxx, BTC/xxx
+        if s.endswith('/USDT') or s.startswith('ETH/') or s.startswith('BTC/'):
+            symbols.append(s)
+    return symbols
+
+
+def save_ohlcv(exchange, symbol, tf, data_dir=DATA_DIR):
+    fname = f"{data_dir}/{symbol.replace('/', '')}_{tf}.csv"
     if os.path.exists(fname):
         return  # Bereits geladen
     try:
@@ -42,12 +49,119 @@ def save_ohlcv(symbol, tf):
         df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         df.to_csv(fname, index=False)
+        ohlcv_store.write_ohlcv(data_dir, symbol.replace('/', ''), tf, df)
         time.sleep(PAUSE)
     except Exception as e:
         print(f"Fehler bei {symbol} {tf}: {e}")
 
-for tf in TIMEFRAMES:
-    for s in tqdm(symbols, desc=f"Lade {tf} Daten"):
-        save_ohlcv(s, tf)
 
-print("Fertig!")
+def sync_ohlcv(exchange, symbol, tf, data_dir=DATA_DIR, history_days=HISTORY_DAYS, export_csv=False):
+    """
+    Inkrementeller Download: setzt beim letzten gespeicherten Zeitstempel an (oder
+    history_days in der Vergangenheit) und blättert mit `since` vorwärts, bis die letzte
+    abgeschlossene Kerze erreicht ist. Jede Seite wird sofort atomar angehängt, ein
+    abgebrochener Lauf macht beim nächsten Start einfach an der letzten Seite weiter.
+    Die noch offene Kerze wird nicht gespeichert. Rückgabe: Anzahl neuer Kerzen.
+    """
+    name = symbol.replace('/', '')
+    tf_ms = exchange.parse_timeframe(tf) * 1000
+    now = exchange.milliseconds()
+    last = ohlcv_store.last_timestamp(data_dir, name, tf)
+    since = now - history_days * 86400000 if last is None else last + tf_ms
+    added = 0
+    while since + tf_ms <= now:
+        batch = exchange.fetch_ohlcv(symbol, timeframe=tf, since=since, limit=LIMITS[tf])
+        batch = [c for c in batch if c[0] >= since and c[0] + tf_ms <= now]
+        if not batch:
+            break
+        added += ohlcv_store.append_ohlcv(data_dir, name, tf, batch)
+        since = batch[-1][0] + tf_ms
+        time.sleep(PAUSE)
+    if export_csv and added:
+        ohlcv_store.export_csv(data_dir, name, tf)
+    return added
+
+
+def download_timeframes(args):
+    """Mit --resample wird nur der Basis-Timeframe geladen, der Rest lokal abgeleitet."""
+    return [resample.BASE_TIMEFRAME] if args.resample else TIMEFRAMES
+
+
+def derive_timeframes(args, symbols):
+    if not args.resample:
+        return
+    derived = [tf for tf in TIMEFRAMES if tf != resample.BASE_TIMEFRAME]
+    added = resample.resample_dir(args.data_dir, derived, symbols=[s.replace('/', '') for s in symbols],
+                                  export_csv=args.csv)
+    print("Lokal abgeleitet: " + ', '.join(f"{tf}: {n} Kerzen" for tf, n in added.items()))
+
+
+async def download_async(args, exchange=None):
+    own = exchange is None
+    exchange = exchange or async_fetch.make_async_exchange()
+    try:
+        print("Lade alle aktiven Binance-Paare ...")
+        symbols = select_symbols(await exchange.load_markets())
+        print(f"Gefunden: {len(symbols)} Paare.")
+        stats = await async_fetch.download(symbols, download_timeframes(args), args.data_dir, args.history_days,
+                                           limit=max(LIMITS.values()), concurrency=args.concurrency,
+                                           exchange=exchange)
+    finally:
+        if own:
+            await exchange.close()
+    if args.csv:
+        for tf in download_timeframes(args):
+            for s in symbols:
+                ohlcv_store.export_csv(args.data_dir, s.replace('/', ''), tf)
+    derive_timeframes(args, symbols)
+    print(f"Fertig! {stats['candles']} neue Kerzen, {stats['rate_limited']} Rate-Limit-Antworten, "
+          f"{stats['errors']} Fehler.")
+
+
+def main(argv=None, exchange=None):
+    parser = argparse.ArgumentParser(description="Lädt OHLCV-Daten aller relevanten Binance-Paare")
+    parser.add_argument('--sync', action='store_true',
+                        help="Inkrementell synchronisieren statt nur fehlende Dateien zu laden")
+    parser.add_argument('--history-days', type=int, default=HISTORY_DAYS,
+                        help="Sync-Modus: Historientiefe für neue Symbole")
+    parser.add_argument('--csv', action='store_true', help="Sync-Modus: zusätzlich CSV-Dateien aktualisieren")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Sync-Modus nebenläufig mit ccxt.async_support und Token-Bucket")
+    parser.add_argument('--concurrency', type=int, default=async_fetch.CONCURRENCY,
+                        help="Async-Modus: gleichzeitige Requests")
+    parser.add_argument('--resample', action='store_true',
+                        help=f"Sync-Modus: nur {resample.BASE_TIMEFRAME} laden, höhere Timeframes daraus ableiten "
+                             "(resample.py)")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    args = parser.parse_args(argv)
+    if args.resample and not (args.sync or args.use_async):
+        # ohne Sync nur die letzten 1000 Kerzen inkl. offener Kerze: zu flach und verfälscht die letzte Stunde
+        parser.error("--resample braucht --sync oder --async")
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    if args.use_async:
+        asyncio.run(download_async(args, exchange))
+        return
+
+    exchange = exchange or make_exchange()
+    print("Lade alle aktiven Binance-Paare ...")
+    symbols = select_symbols(exchange.load_markets())
+    print(f"Gefunden: {len(symbols)} Paare.")
+    print(f"Starte Download für {', '.join(download_timeframes(args))} ...")
+
+    for tf in download_timeframes(args):
+        for s in tqdm(symbols, desc=f"Lade {tf} Daten"):
+            if not args.sync:
+                save_ohlcv(exchange, s, tf, args.data_dir)
+                continue
+            try:
+                sync_ohlcv(exchange, s, tf, args.data_dir, args.history_days, export_csv=args.csv)
+            except Exception as e:
+                print(f"Fehler bei {s} {tf}: {e}")
+
+    derive_timeframes(args, symbols)
+    print("Fertig!")
+
+
+if __name__ == '__main__':
+    main()
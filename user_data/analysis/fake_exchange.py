@@ -0,0 +1,153 @@
+# user_data/analysis/fake_exchange.py
+"""
+Lokale Fake-Exchange für async_fetch: deterministische Kerzen, künstliche Latenz und
+eingestreute Rate-Limit- (429) und Netzwerkfehler als echte ccxt-Exceptions.
+
+Der Check lädt damit über async_fetch.download() in ein temporäres Verzeichnis, lädt danach
+mit vorgerückter Uhr inkrementell nach und prüft, dass jede Partition lückenlos ist, bis zur
+letzten abgeschlossenen Kerze reicht und die Werte der Fake-Exchange enthält.
+
+    python user_data/analysis/fake_exchange.py --symbols 8 --history-days 20 --rate-limit 0.1 --network-errors 0.05
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+
+import ccxt
+import numpy as np
+
+import async_fetch
+import ohlcv_store
+
+TIMEFRAMES = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+NOW = 1_700_000_123_456  # feste Startzeit (ms), nicht auf eine Kerzengrenze ausgerichtet
+
+
+def candle(symbol, t):
+    """Deterministische Kerze je (Symbol, Öffnungszeit)."""
+    base = 10.0 + sum(map(ord, symbol)) % 97
+    close = base + (t // 60000) % 101 / 100.0
+    return [t, close - 0.01, close + 0.02, close - 0.02, close, float((t // 60000) % 13 + 1)]
+
+
+class FakeExchange:
+    """Minimaler Ersatz für ccxt.async_support.binance (milliseconds, parse_timeframe, fetch_ohlcv, close)."""
+
+    def __init__(self, now=NOW, latency=0.002, rate_limit=0.0, network_errors=0.0, seed=0):
+        self.now = now
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.network_errors = network_errors
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.failures = {'rate_limit': 0, 'network': 0}
+        self.closed = False
+
+    def milliseconds(self):
+        return self.now
+
+    def parse_timeframe(self, timeframe):
+        return TIMEFRAMES[timeframe]
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=500):
+        self.calls += 1
+        await asyncio.sleep(self.latency * self.rng.random())
+        roll = self.rng.random()
+        if roll < self.rate_limit:
+            self.failures['rate_limit'] += 1
+            raise ccxt.RateLimitExceeded('binance 429 Too Many Requests')
+        if roll < self.rate_limit + self.network_errors:
+            self.failures['network'] += 1
+            raise ccxt.NetworkError('binance GET /api/v3/klines: connection reset')
+        tf_ms = TIMEFRAMES[timeframe] * 1000
+        # wie Binance: ab der ersten Kerze >= since, inklusive der noch offenen Kerze
+        start = -(-int(since) // tf_ms) * tf_ms if since is not None else (self.now // tf_ms - limit + 1) * tf_ms
+        stop = min(start + limit * tf_ms, self.now // tf_ms * tf_ms + tf_ms)
+        return [candle(symbol, t) for t in range(start, stop, tf_ms)]
+
+    async def close(self):
+        self.closed = True
+
+
+def check_partition(data_dir, symbol, timeframe, now, history_days):
+    """Fehlerliste einer Partition: Lücken, falscher Anfang/Ende, abweichende Werte."""
+    tf_ms = TIMEFRAMES[timeframe] * 1000
+    data = ohlcv_store.read_ohlcv(data_dir, symbol.replace('/', ''), timeframe)
+    if data is None or not len(data['timestamp']):
+        return [f"{symbol} {timeframe}: keine Daten"]
+    ts = data['timestamp']
+    problems = []
+    first = -(-(now - history_days * 86400000) // tf_ms) * tf_ms
+    last = now // tf_ms * tf_ms - tf_ms
+    if ts[0] != first:
+        problems.append(f"{symbol} {timeframe}: Beginn {ts[0]} statt {first}")
+    if ts[-1] != last:
+        problems.append(f"{symbol} {timeframe}: Ende {ts[-1]} statt {last}")
+    gaps = np.flatnonzero(np.diff(ts) != tf_ms)
+    if len(gaps):
+        problems.append(f"{symbol} {timeframe}: {len(gaps)} Lücken/Duplikate, erste nach {ts[gaps[0]]}")
+    expected = np.array([candle(symbol, int(t)) for t in ts])
+    if not np.array_equal(np.column_stack([data[c] for c in ohlcv_store.COLUMNS]), expected):
+        problems.append(f"{symbol} {timeframe}: Werte weichen von der Fake-Exchange ab")
+    return problems
+
+
+def run_check(data_dir, symbols, timeframes, history_days, advance_days=1.0, limit=1000, concurrency=8,
+              rate_limit=0.1, network_errors=0.05, seed=0):
+    """Voll- und inkrementeller Download gegen die Fake-Exchange; Rückgabe (stats je Lauf, Fehlerliste)."""
+    runs = []
+    exchange = FakeExchange(rate_limit=rate_limit, network_errors=network_errors, seed=seed)
+    for now in (NOW, NOW + int(advance_days * 86400000)):
+        exchange.now = now
+        exchange.calls, exchange.failures = 0, dict.fromkeys(exchange.failures, 0)
+        stats = asyncio.run(async_fetch.download(symbols, timeframes, data_dir, history_days, limit=limit,
+                                                 concurrency=concurrency, exchange=exchange,
+                                                 backoff=0.001, penalty=0.01))
+        stats.update(calls=exchange.calls, **exchange.failures)
+        runs.append(stats)
+        if stats['errors']:
+            break
+    now = exchange.now
+    # nach dem Nachladen beginnt die Partition weiterhin beim ersten Lauf
+    start_days = history_days + (now - NOW) / 86400000
+    problems = [p for symbol in symbols for tf in timeframes
+                for p in check_partition(data_dir, symbol, tf, now, start_days)]
+    return runs, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="async_fetch.download() gegen eine lokale Fake-Exchange prüfen")
+    parser.add_argument('--symbols', type=int, default=8, help="Anzahl Fake-Symbole")
+    parser.add_argument('--timeframes', nargs='+', default=['5m', '1h'])
+    parser.add_argument('--history-days', type=float, default=20)
+    parser.add_argument('--limit', type=int, default=1000, help="Kerzen je Request")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate-limit', type=float, default=0.1, help="Anteil Requests mit 429")
+    parser.add_argument('--network-errors', type=float, default=0.05, help="Anteil Requests mit Netzwerkfehler")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help="Zielverzeichnis (Standard: temporär)")
+    args = parser.parse_args(argv)
+
+    symbols = [f"F{i:03d}/USDT" for i in range(args.symbols)]
+    with tempfile.TemporaryDirectory() as tmp:
+        runs, problems = run_check(args.data_dir or tmp, symbols, args.timeframes, args.history_days,
+                                   limit=args.limit, concurrency=args.concurrency, rate_limit=args.rate_limit,
+                                   network_errors=args.network_errors, seed=args.seed)
+    for name, stats in zip(("voll", "inkrementell"), runs):
+        print(f"{name}: {stats['candles']} Kerzen, {stats['calls']} Requests, {stats['rate_limit']} x 429, "
+              f"{stats['network']} Netzwerkfehler, {stats['errors']} abgebrochene Jobs")
+    if not any(stats['rate_limit'] for stats in runs) or not any(stats['network'] for stats in runs):
+        problems.append("keine Fehler eingestreut (--rate-limit/--network-errors erhöhen)")
+    if any(stats['errors'] for stats in runs):
+        problems.append("Jobs nach allen Retries gescheitert")
+    for problem in problems:
+        print(problem)
+    print("OK" if not problems else f"{len(problems)} Probleme")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
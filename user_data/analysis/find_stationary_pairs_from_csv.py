@@ -1,8 +1,10 @@
-import os
-import pandas as pd
-import numpy as np
-from statsmodels.tsa.stattools import adfuller
-from tqdm import tqdm
+import argparse
+
+from coint_scan import CHUNK_SIZE, scan_pairs
+from pair_screen import add_arguments, options, screen_pairs
+from price_panel import load_panel
+import scan_cache
+import tiled_screen
 
 # === EINSTELLUNGEN ===
 DATA_DIR = 'data/binance'
@@ -10,66 +12,56 @@ TIMEFRAMES = ['1h', '15m', '5m']
 PVAL_THRESHOLD = 0.1
 MIN_LENGTH = 100  # Mindestanzahl gemeinsamer Datenpunkte
 
-def load_close(symbol, timeframe):
-    fname = f"{DATA_DIR}/{symbol}_{timeframe}.csv"
-    if not os.path.exists(fname):
-        return None
-    df = pd.read_csv(fname)
-    if 'timestamp' in df.columns:
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df.set_index('timestamp', inplace=True)
-    if 'close' in df.columns:
-        return df['close']
-    return None
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sucht stationäre Paare in data/binance")
+    parser.add_argument('--workers', type=int, default=1, help="Anzahl Prozesse für den Paar-Scan")
+    parser.add_argument('--rebuild-panel', action='store_true', help="Preis-Panel neu bauen statt aus dem Cache")
+    add_arguments(parser)
+    tiled_screen.add_arguments(parser)
+    scan_cache.add_arguments(parser, DATA_DIR)
+    args = parser.parse_args(argv)
+    workers = args.workers
+    cache = scan_cache.open_cache(args)
+
+    for timeframe in TIMEFRAMES:
+        print(f"\nSuche stationäre Paare für {timeframe} ...")
+        # Panel aus dem Plattencache; Symbole unter MIN_LENGTH Kerzen fallen vorab heraus
+        panel = load_panel(DATA_DIR, timeframe, rebuild=args.rebuild_panel, low_memory=args.tiled)
+
+        # Vorsieben (--min-corr usw.), dann alle übrigen Paare auf einmal testen
+        # (gemeinsame Stützmenge je Paar wie beim Inner-Join)
+        if args.tiled:
+            cols = panel.columns(min_length=MIN_LENGTH)
+            view = cache.for_panel(timeframe, panel, cols) if cache is not None else None
+            pairs, report = tiled_screen.screen_panel(DATA_DIR, timeframe, panel, cols, min_length=MIN_LENGTH,
+                                                      **options(args), **tiled_screen.options(args))
+            chunk_size = tiled_screen.adf_chunk_size(len(panel), args.max_memory_mb * 2 ** 20)
+        else:
+            panel = panel.select(min_length=MIN_LENGTH)
+            view = cache.for_panel(timeframe, panel) if cache is not None else None
+            pairs, report = screen_pairs(panel.values, panel.symbols, valid=panel.valid, min_length=MIN_LENGTH,
+                                         **options(args))
+            chunk_size = CHUNK_SIZE
+        print(report.to_string(index=False))
+        dfp = scan_pairs(panel.values, panel.symbols, pairs=pairs, min_length=MIN_LENGTH, chunk_size=chunk_size,
+                         desc=f"Vergleiche Paare für {timeframe}", workers=workers, valid=panel.valid,
+                         cache=view)
+        dfp = dfp[dfp['pvalue'] < PVAL_THRESHOLD]
 
-def find_all_symbols(timeframe):
-    files = os.listdir(DATA_DIR)
-    symbols = [f.replace(f'_{timeframe}.csv','') for f in files if f.endswith(f'_{timeframe}.csv')]
-    return symbols
+        if dfp.empty:
+            print(f"Keine stationären Paare für {timeframe} gefunden.")
+        else:
+            dfp = dfp.sort_values('pvalue')
+            print(f"Gefundene stationäre Paare für {timeframe}:")
+            print(dfp[['pair1', 'pair2', 'pvalue', 'n']].head(10))
+            outname = f'stationary_pairs_{timeframe}.csv'
+            dfp.to_csv(outname, index=False)
+            print(f"Ergebnis gespeichert in: {outname}")
 
-for timeframe in TIMEFRAMES:
-    print(f"\nSuche stationäre Paare für {timeframe} ...")
-    symbols = find_all_symbols(timeframe)
-    closes = {}
-    for s in tqdm(symbols, desc=f"Lade Close-Daten für {timeframe}"):
-        close = load_close(s, timeframe)
-        if close is not None and len(close) >= MIN_LENGTH:
-            closes[s] = close
+    if cache is not None:
+        print(cache.report())
+        cache.close()
 
-    pairs = []
-    syms = list(closes.keys())
-    for i in tqdm(range(len(syms)), desc=f"Vergleiche Paare für {timeframe}"):
-        for j in range(i+1, len(syms)):
-            s1 = closes[syms[i]]
-            s2 = closes[syms[j]]
-            df_pair = pd.concat([s1, s2], axis=1, join='inner').dropna()
-            if df_pair.shape[0] < MIN_LENGTH:
-                continue
-            s1a, s2a = df_pair.iloc[:, 0], df_pair.iloc[:, 1]
-            try:
-                beta = np.polyfit(s2a, s1a, 1)[0]
-                spread = s1a - beta * s2a
-                adf_result = adfuller(spread)
-                pvalue = adf_result[1]
-                stat = adf_result[0]
-                if pvalue < PVAL_THRESHOLD:
-                    pairs.append({
-                        'pair1': syms[i],
-                        'pair2': syms[j],
-                        'beta': beta,
-                        'adf_stat': stat,
-                        'pvalue': pvalue,
-                        'n': len(spread)
-                    })
-            except Exception:
-                continue
 
-    if not pairs:
-        print(f"Keine stationären Paare für {timeframe} gefunden.")
-    else:
-        dfp = pd.DataFrame(pairs).sort_values('pvalue')
-        print(f"Gefundene stationäre Paare für {timeframe}:")
-        print(dfp[['pair1', 'pair2', 'pvalue', 'n']].head(10))
-        outname = f'stationary_pairs_{timeframe}.csv'
-        dfp.to_csv(outname, index=False)
-        print(f"Ergebnis gespeichert in: {outname}")
+if __name__ == '__main__':
+    main()
@@ -1,82 +1,69 @@
 # user_data/analysis/find_stationary_pairs_local.py
 
-import os
-import glob
-import pandas as pd
-import numpy as np
-from statsmodels.tsa.stattools import adfuller
-from tqdm import tqdm
+import argparse
+
+from coint_scan import CHUNK_SIZE, scan_pairs
+from pair_screen import add_arguments, options, screen_pairs
+from price_panel import load_panel
+import scan_cache
+import tiled_screen
 
 DATA_DIR = "user_data/data/binance"
 TIMEFRAMES = ["5m", "15m", "1h"]
 MIN_LEN = 800  # Min. Kerzenanzahl für Paar-Analyse
 
-def load_prices(symbol, timeframe):
-    fpath = os.path.join(DATA_DIR, f"{symbol}_{timeframe}.csv")
-    if os.path.exists(fpath):
-        df = pd.read_csv(fpath)
-        # Prüfe auf gängige Spaltennamen
-        if "date" in df.columns:
-            df = df.set_index("date")
-        elif "timestamp" in df.columns:
-            df = df.set_index("timestamp")
-        return df["close"]
-    else:
-        return None
-
-def all_symbols(timeframe):
-    files = glob.glob(os.path.join(DATA_DIR, f"*_{timeframe}.csv"))
-    return [os.path.basename(f).replace(f"_{timeframe}.csv", "") for f in files]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sucht stationäre Paare in den lokalen CSV-Daten")
+    parser.add_argument("--workers", type=int, default=1, help="Anzahl Prozesse für den Paar-Scan")
+    parser.add_argument("--rebuild-panel", action="store_true", help="Preis-Panel neu bauen statt aus dem Cache")
+    add_arguments(parser)
+    tiled_screen.add_arguments(parser)
+    scan_cache.add_arguments(parser, DATA_DIR)
+    args = parser.parse_args(argv)
+    workers = args.workers
+    cache = scan_cache.open_cache(args)
 
-def test_stationarity(s1, s2):
-    if len(s1) != len(s2) or len(s1) < MIN_LEN:
-        return None
-    # Lineare Regression für Hedge-Ratio (Beta)
-    beta = np.polyfit(s2, s1, 1)[0]
-    spread = s1 - beta * s2
-    # ADF-Test auf Stationarität
-    result = adfuller(spread)
-    pvalue = result[1]
-    return pvalue, beta, spread
+    for timeframe in TIMEFRAMES:
+        print(f"\n=== Suche stationäre Paare im {timeframe} ===")
+        # Ein Panel je Timeframe (Plattencache, neu gebaut nur bei geänderten Dateien);
+        # jedes Paar wird über den Zeitstempel auf seine gemeinsame Stützmenge ausgerichtet
+        panel = load_panel(DATA_DIR, timeframe, rebuild=args.rebuild_panel, low_memory=args.tiled)
+        candidates = [s for s in panel.symbols if s.endswith(("USDT", "BTC", "ETH"))]
+        if args.tiled:
+            # Panel bleibt memmapped, Vorsieben kachelweise auf float32-Log-Preisen
+            cols = panel.columns(candidates)
+            print(f"{len(cols)} Symbole x {len(panel)} Kerzen im Panel (Kachel-Modus)")
+            view = cache.for_panel(timeframe, panel, cols) if cache is not None else None
+            pairs, report = tiled_screen.screen_panel(DATA_DIR, timeframe, panel, cols, min_length=MIN_LEN,
+                                                      **options(args), **tiled_screen.options(args))
+            chunk_size = tiled_screen.adf_chunk_size(len(panel), args.max_memory_mb * 2 ** 20)
+        else:
+            panel = panel.select(candidates)
+            print(f"{len(panel.symbols)} Symbole x {len(panel)} Kerzen im Panel")
+            view = cache.for_panel(timeframe, panel) if cache is not None else None
+            pairs, report = screen_pairs(panel.values, panel.symbols, valid=panel.valid, min_length=MIN_LEN,
+                                         **options(args))
+            chunk_size = CHUNK_SIZE
+        print(report.to_string(index=False))
+        df = scan_pairs(panel.values, panel.symbols, pairs=pairs, min_length=MIN_LEN, chunk_size=chunk_size,
+                        desc=f"Vergleiche Paare ({timeframe})", workers=workers, valid=panel.valid,
+                        cache=view)
+        df = df[df["pvalue"] < 0.05]
+        df.insert(2, "timeframe", timeframe)
+        df = df[["pair1", "pair2", "timeframe", "pvalue", "beta", "n"]]
+        fname = f"stationary_pairs_{timeframe}_local.csv"
+        if not df.empty and "pvalue" in df.columns:
+            df = df.sort_values("pvalue")
+            df.to_csv(fname, index=False)
+            print(f"{len(df)} stationäre Paare gefunden. Ergebnis gespeichert in {fname}.")
+            print(df.head(10))
+        else:
+            print("Keine stationären Paare gefunden.")
 
-for timeframe in TIMEFRAMES:
-    print(f"\n=== Suche stationäre Paare im {timeframe} ===")
-    symbols = all_symbols(timeframe)
-    usdt = [s for s in symbols if s.endswith("USDT")]
-    btc  = [s for s in symbols if s.endswith("BTC")]
-    eth  = [s for s in symbols if s.endswith("ETH")]
-    all_candidates = list(set(usdt + btc + eth))
+    if cache is not None:
+        print(cache.report())
+        cache.close()
 
-    results = []
-    for i, s1 in enumerate(tqdm(all_candidates, desc=f"Vergleiche Paare ({timeframe})")):
-        price1 = load_prices(s1, timeframe)
-        if price1 is None: continue
-        for s2 in all_candidates[i+1:]:
-            if s1 == s2: continue
-            price2 = load_prices(s2, timeframe)
-            if price2 is None: continue
-            l = min(len(price1), len(price2))
-            s1p = price1[-l:].reset_index(drop=True)
-            s2p = price2[-l:].reset_index(drop=True)
-            out = test_stationarity(s1p, s2p)
-            if out is None: continue
-            pvalue, beta, spread = out
-            if pvalue < 0.05:
-                results.append({
-                    "pair1": s1,
-                    "pair2": s2,
-                    "timeframe": timeframe,
-                    "pvalue": pvalue,
-                    "beta": beta,
-                    "n": l
-                })
 
-    df = pd.DataFrame(results)
-    fname = f"stationary_pairs_{timeframe}_local.csv"
-    if not df.empty and "pvalue" in df.columns:
-        df = df.sort_values("pvalue")
-        df.to_csv(fname, index=False)
-        print(f"{len(df)} stationäre Paare gefunden. Ergebnis gespeichert in {fname}.")
-        print(df.head(10))
-    else:
-        print("Keine stationären Paare gefunden.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+# user_data/analysis/instrument.py
+"""
+Leichtgewichtige Instrumentierung: Stage-Timer, Zähler und Histogramme.
+
+Im Code:
+    from instrument import count, stage, timed
+
+    @timed('scan.adf')
+    def adf_batch(...): ...
+
+    with stage('csv.read'):
+        df = pd.read_csv(...)
+
+Ausgeschaltet (Default) kostet ein @timed-Aufruf nur eine Flag-Abfrage und stage() liefert
+einen geteilten No-op-Kontext. Eingeschaltet wird per enable() oder Umgebungsvariable
+TRADE_INSTRUMENT=1; jede Stage sammelt Anzahl, Summe, Min/Max und ein Histogramm mit festen
+Buckets, geschrieben als JSON oder im Prometheus-Textformat.
+
+Prozess-Pools: Worker starten leer (auch nach fork) und geben ihre Stages mit dem Ergebnis
+zurück, der Elternprozess verbucht sie:
+    for out, stages in pool.map(collect, [work] * len(chunks), chunks):
+        merge(stages)
+
+Ein einzelner Lauf lässt sich komplett instrumentieren (inkl. np.polyfit, adfuller,
+pandas.read_csv und der populate_*-Methoden von freqtrade-Strategien) und optional mit
+cProfile oder pyinstrument aufzeichnen:
+    python user_data/analysis/instrument.py --json stages.json --prom stages.prom \\
+        user_data/analysis/find_stationary_pairs_local.py --workers 4
+    python user_data/analysis/instrument.py --profile cprofile --profile-out scan.pstats \\
+        user_data/analysis/spread_mean_reversion_backtest.py --no-plot
+    python user_data/analysis/instrument.py --json live.json -m freqtrade trade --config config.json
+"""
+
+import argparse
+import contextlib
+import functools
+import importlib
+import json
+import os
+import runpy
+import sys
+import threading
+import time
+
+# Obergrenzen der Histogramm-Buckets in Sekunden (Prometheus 'le'), +Inf kommt implizit dazu
+BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+_enabled = os.environ.get('TRADE_INSTRUMENT', '') not in ('', '0')
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+_NULL = contextlib.nullcontext()
+
+
+class _Histogram:
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def merge(self, data):
+        """Addiert ein Histogramm im Format von to_dict()."""
+        if not data['count']:
+            return
+        self.count += data['count']
+        self.total += data['sum_s']
+        self.min = min(self.min, data['min_s'])
+        self.max = max(self.max, data['max_s'])
+        for i, n in enumerate(data['buckets'].values()):
+            self.buckets[i] += n
+
+    def to_dict(self):
+        return {'count': self.count, 'sum_s': self.total, 'min_s': self.min if self.count else 0.0,
+                'max_s': self.max, 'mean_s': self.total / self.count if self.count else 0.0,
+                'buckets': dict(zip([*map(str, BUCKETS), '+Inf'], self.buckets))}
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def _after_fork():
+    # Ein geforkter Worker soll nur eigene Messungen zurückgeben (Lock evtl. im Elternprozess gehalten)
+    global _lock
+    _lock = threading.Lock()
+    _stages.clear()
+    _counters.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def observe(name, seconds):
+    with _lock:
+        hist = _stages.get(name)
+        if hist is None:
+            hist = _stages[name] = _Histogram()
+        hist.observe(seconds)
+
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+
+
+def stage(name):
+    """Kontextmanager, der die Dauer des Blocks unter `name` verbucht."""
+    return _Stage(name) if _enabled else _NULL
+
+
+def timed(name=None):
+    """Decorator: verbucht jeden Aufruf unter `name` (Default: modul.funktion)."""
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(label, time.perf_counter() - start)
+        wrapper.__wrapped_stage__ = label
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    with _lock:
+        return {'stages': {name: h.to_dict() for name, h in sorted(_stages.items())},
+                'counters': dict(sorted(_counters.items()))}
+
+
+def drain():
+    """Snapshot seit dem letzten drain() und zurücksetzen; None, wenn ausgeschaltet (für Worker)."""
+    if not _enabled:
+        return None
+    with _lock:
+        snap = {'stages': {name: h.to_dict() for name, h in _stages.items()}, 'counters': dict(_counters)}
+        _stages.clear()
+        _counters.clear()
+    return snap
+
+
+def merge(snap):
+    """Verbucht einen Snapshot (z.B. drain() eines Workers) zusätzlich zu den eigenen Stages."""
+    if not snap:
+        return
+    with _lock:
+        for name, data in snap['stages'].items():
+            hist = _stages.get(name)
+            if hist is None:
+                hist = _stages[name] = _Histogram()
+            hist.merge(data)
+        for name, n in snap['counters'].items():
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def collect(fn, *args, **kwargs):
+    """Für Prozess-Pools: (fn(*args), drain()); der Elternprozess ruft merge() auf den zweiten Wert."""
+    result = fn(*args, **kwargs)
+    return result, drain()
+
+
+def write_json(path):
+    with open(path, 'w') as f:
+        json.dump(snapshot(), f, indent=2)
+
+
+def prometheus_text():
+    """Alle Stages als Prometheus-Histogramm trade_stage_seconds{stage=...}, Zähler als trade_count."""
+    snap = snapshot()
+    lines = ['# HELP trade_stage_seconds Dauer instrumentierter Stages',
+             '# TYPE trade_stage_seconds histogram']
+    for name, h in snap['stages'].items():
+        cumulative = 0
+        for bound, n in h['buckets'].items():
+            cumulative += n
+            lines.append(f'trade_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'trade_stage_seconds_sum{{stage="{name}"}} {h["sum_s"]}')
+        lines.append(f'trade_stage_seconds_count{{stage="{name}"}} {h["count"]}')
+    if snap['counters']:
+        lines += ['# HELP trade_count Zähler instrumentierter Ereignisse', '# TYPE trade_count counter']
+        for name, n in snap['counters'].items():
+            lines.append(f'trade_count{{name="{name}"}} {n}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path):
+    with open(path + '.tmp', 'w') as f:
+        f.write(prometheus_text())
+    os.replace(path + '.tmp', path)  # node_exporter-Textfile-Collector liest nie halbe Dateien
+
+
+def report(out=sys.stdout):
+    snap = snapshot()
+    rows = sorted(snap['stages'].items(), key=lambda kv: -kv[1]['sum_s'])
+    print(f"{'Stage':45s} {'Aufrufe':>9s} {'Summe s':>10s} {'Mittel ms':>10s} {'Max ms':>10s}", file=out)
+    for name, h in rows:
+        print(f"{name:45s} {h['count']:9d} {h['sum_s']:10.3f} {h['mean_s'] * 1e3:10.3f} {h['max_s'] * 1e3:10.3f}",
+              file=out)
+    for name, n in snap['counters'].items():
+        print(f"{name:45s} {n:9d}", file=out)
+
+
+# ==== NACHTRÄGLICHES INSTRUMENTIEREN (Drittbibliotheken, Strategien) ====
+def patch(owner, attr, name=None):
+    """Ersetzt owner.attr durch eine @timed-Variante. Rückgabe: Funktion zum Rückgängigmachen."""
+    original = getattr(owner, attr)
+    if hasattr(original, '__wrapped_stage__'):
+        return lambda: None
+    label = name or f"{getattr(owner, '__name__', type(owner).__name__)}.{attr}"
+    setattr(owner, attr, timed(label)(original))
+    return lambda: setattr(owner, attr, original)
+
+
+def _patch_everywhere(original, wrapped):
+    """Auch Module, die die Funktion per `from x import f` übernommen haben, bekommen den Wrapper."""
+    for module in list(sys.modules.values()):
+        for key, value in list(getattr(module, '__dict__', {}).items()):
+            if value is original:
+                setattr(module, key, wrapped)
+
+
+DEFAULT_TARGETS = (
+    ('numpy', 'polyfit', 'np.polyfit'),
+    ('pandas', 'read_csv', 'csv.read'),
+    ('statsmodels.tsa.stattools', 'adfuller', 'adfuller'),
+)
+
+STRATEGY_METHODS = ('advise_indicators', 'advise_buy', 'advise_sell', 'advise_entry', 'advise_exit')
+
+
+def _patch_strategies():
+    """freqtrade lädt Strategien erst später; instrumentiert werden daher die advise_*-Methoden
+    von IStrategy, die je Aufruf populate_* der konkreten Strategie ausführen."""
+    try:
+        from freqtrade.strategy import IStrategy
+    except ImportError:
+        return
+    for method in STRATEGY_METHODS:
+        original = getattr(IStrategy, method, None)
+        if original is None or hasattr(original, '__wrapped_stage__'):
+            continue
+
+        def make(original, method):
+            stage_name = method.replace('advise_', 'populate_')
+
+            @functools.wraps(original)
+            def wrapper(self, *args, **kwargs):
+                if not _enabled:
+                    return original(self, *args, **kwargs)
+                with _Stage(f"strategy.{type(self).__name__}.{stage_name}"):
+                    return original(self, *args, **kwargs)
+            wrapper.__wrapped_stage__ = stage_name
+            return wrapper
+        setattr(IStrategy, method, make(original, method))
+
+
+def instrument_defaults():
+    """np.polyfit, pandas.read_csv, adfuller und freqtrade-Strategien instrumentieren (soweit installiert)."""
+    for module_name, attr, name in DEFAULT_TARGETS:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        original = getattr(module, attr, None)
+        if original is None or hasattr(original, '__wrapped_stage__'):
+            continue
+        _patch_everywhere(original, timed(name)(original))
+    _patch_strategies()
+
+
+@contextlib.contextmanager
+def profile(mode='cprofile', out=None):
+    """Zeichnet den Block mit cProfile (out: .pstats) oder pyinstrument (out: .html) auf."""
+    if mode == 'pyinstrument':
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            if out:
+                with open(out, 'w') as f:
+                    f.write(profiler.output_html())
+            else:
+                print(profiler.output_text(unicode=True))
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if out:
+            profiler.dump_stats(out)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Führt ein Skript oder Modul instrumentiert aus")
+    parser.add_argument('--json', default=None, help="Stage-Histogramme als JSON")
+    parser.add_argument('--prom', default=None, help="Stage-Histogramme im Prometheus-Textformat")
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'], default=None)
+    parser.add_argument('--profile-out', default=None, help="cProfile: .pstats, pyinstrument: .html")
+    parser.add_argument('-m', dest='module', default=None, help="Modul statt Skript ausführen (wie python -m)")
+    parser.add_argument('target', nargs=argparse.REMAINDER, help="Skript und dessen Argumente")
+    args = parser.parse_args(argv)
+    if not args.module and not args.target:
+        parser.error("Skript oder -m Modul angeben")
+
+    os.environ['TRADE_INSTRUMENT'] = '1'  # auch für Worker-Prozesse
+    enable()
+    if args.module:
+        sys.argv = [args.module, *args.target]
+    else:
+        script = args.target[0]
+        sys.argv = list(args.target)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    instrument_defaults()
+
+    runner = profile(args.profile, args.profile_out) if args.profile else contextlib.nullcontext()
+    try:
+        with runner:
+            if args.module:
+                runpy.run_module(args.module, run_name='__main__', alter_sys=True)
+            else:
+                runpy.run_path(script, run_name='__main__')
+    finally:
+        if args.json:
+            write_json(args.json)
+        if args.prom:
+            write_prometheus(args.prom)
+        report()
+
+
+if __name__ == '__main__':
+    # Über den Modulnamen starten: Zielcode importiert dieselbe Instanz, und collect() bleibt
+    # für Prozess-Pools als instrument.collect picklebar (runpy ersetzt __main__ durch das Ziel)
+    import instrument
+    instrument.main()
@@ -0,0 +1,227 @@
+# user_data/analysis/ohlcv_store.py
+"""
+Binärer, spaltenorientierter OHLCV-Store neben den CSV-Dateien in data/binance.
+
+Layout: {data_dir}/npy/{timeframe}/{symbol}/{spalte}.npy
+  timestamp -> int64 (Epoch-Millisekunden), open/high/low/close/volume -> float64
+Jede Spalte ist eine eigene .npy-Datei und wird per np.load(mmap_mode='r') eingeblendet,
+d.h. ein Leser zahlt nur für die Spalten (und Seiten), die er wirklich anfasst.
+
+Einmalige Konvertierung der vorhandenen CSVs:
+    python user_data/analysis/ohlcv_store.py --data-dir user_data/data/binance
+"""
+
+import argparse
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrument import stage, timed
+
+STORE_SUBDIR = 'npy'
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+def partition_dir(data_dir, symbol, timeframe):
+    return os.path.join(data_dir, STORE_SUBDIR, timeframe, symbol)
+
+
+def csv_path(data_dir, symbol, timeframe):
+    return os.path.join(data_dir, f"{symbol}_{timeframe}.csv")
+
+
+def to_epoch_ms(timestamps):
+    """Zeitstempel (datetime-like, Strings oder bereits ms-Integer) -> int64 Epoch-ms."""
+    ts = pd.Series(timestamps)
+    if pd.api.types.is_integer_dtype(ts):
+        return ts.to_numpy(dtype=np.int64)
+    ts = pd.to_datetime(ts)
+    return ts.to_numpy(dtype='datetime64[ms]').view(np.int64)
+
+
+def exists(data_dir, symbol, timeframe):
+    return os.path.exists(os.path.join(partition_dir(data_dir, symbol, timeframe), 'timestamp.npy'))
+
+
+def write_ohlcv(data_dir, symbol, timeframe, df):
+    """
+    Schreibt ein OHLCV-DataFrame (Spalte 'timestamp' oder DatetimeIndex) in den Store.
+    Jede Spalte wird erst als .tmp geschrieben und dann per os.replace atomar ersetzt;
+    timestamp kommt zuletzt, damit Leser nie einen längeren Index als Daten sehen.
+    """
+    path = partition_dir(data_dir, symbol, timeframe)
+    os.makedirs(path, exist_ok=True)
+    timestamps = df['timestamp'] if 'timestamp' in df.columns else df.index
+    arrays = {'timestamp': to_epoch_ms(timestamps)}
+    for col in COLUMNS[1:]:
+        arrays[col] = df[col].to_numpy(dtype=np.float64)
+    for col in COLUMNS[1:] + COLUMNS[:1]:
+        target = os.path.join(path, f"{col}.npy")
+        with open(target + '.tmp', 'wb') as f:
+            np.save(f, arrays[col])
+        os.replace(target + '.tmp', target)
+
+
+def _npy_header(path):
+    """(Datenoffset, Länge, dtype) einer 1-D-.npy-Datei."""
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        return f.tell(), shape[0], dtype
+
+
+def _header_bytes(dtype, length):
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                  'fortran_order': False, 'shape': (length,)})
+    return header.getvalue()
+
+
+def append_ohlcv(data_dir, symbol, timeframe, rows):
+    """
+    Hängt neue Kerzen an (Liste [ts, o, h, l, c, v] wie von ccxt oder DataFrame).
+    Nur Zeilen nach dem letzten gespeicherten Zeitstempel werden übernommen.
+    Angehängt wird in place: je Spalte die neuen Werte ans Dateiende, danach die Länge im
+    .npy-Header (np.save reserviert dafür Platz); timestamp zuletzt, seine Länge ist der
+    Commit-Stand. Verwaiste Zeilen eines abgebrochenen Anhängens werden vorher abgeschnitten.
+    Passt ein Header nicht (z.B. Format 2.0), wird die Partition wie in write_ohlcv neu geschrieben.
+    Rückgabe: Anzahl angehängter Kerzen.
+    """
+    new = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=list(COLUMNS))
+    new = new.assign(timestamp=to_epoch_ms(new['timestamp']))
+    if not exists(data_dir, symbol, timeframe):
+        new = new.drop_duplicates('timestamp').sort_values('timestamp')
+        if new.empty:
+            return 0
+        write_ohlcv(data_dir, symbol, timeframe, new)
+        return len(new)
+
+    path = partition_dir(data_dir, symbol, timeframe)
+    headers = {col: _npy_header(os.path.join(path, f"{col}.npy")) for col in COLUMNS}
+    length = min(n for _, n, _ in headers.values())
+    if length:
+        timestamps = np.load(os.path.join(path, 'timestamp.npy'), mmap_mode='r')
+        new = new[new['timestamp'] > timestamps[length - 1]]
+        del timestamps
+    new = new.drop_duplicates('timestamp').sort_values('timestamp')
+    if new.empty:
+        return 0
+    total = length + len(new)
+    if any(len(_header_bytes(dtype, total)) != offset for offset, _, dtype in headers.values()):
+        existing = read_ohlcv(data_dir, symbol, timeframe, mmap=False)
+        existing = {col: a[:length] for col, a in existing.items()}
+        write_ohlcv(data_dir, symbol, timeframe, pd.concat([pd.DataFrame(existing), new], ignore_index=True))
+        return len(new)
+    for col in COLUMNS[1:] + COLUMNS[:1]:
+        offset, _, dtype = headers[col]
+        with open(os.path.join(path, f"{col}.npy"), 'r+b') as f:
+            f.truncate(offset + length * dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(new[col].to_numpy(), dtype=dtype).tobytes())
+            f.flush()
+            f.seek(0)
+            f.write(_header_bytes(dtype, total))
+    return len(new)
+
+
+def last_timestamp(data_dir, symbol, timeframe):
+    """Letzter gespeicherter Zeitstempel (Epoch-ms) oder None."""
+    data = read_ohlcv(data_dir, symbol, timeframe, columns=('timestamp',))
+    if data is None or not len(data['timestamp']):
+        return None
+    return int(data['timestamp'][-1])
+
+
+def export_csv(data_dir, symbol, timeframe):
+    """Schreibt die Partition als {symbol}_{tf}.csv (Format des alten Downloaders), atomar via os.replace."""
+    df = load_frame(data_dir, symbol, timeframe)
+    if df is None:
+        return
+    fname = csv_path(data_dir, symbol, timeframe)
+    df.reset_index().to_csv(fname + '.tmp', index=False)
+    os.replace(fname + '.tmp', fname)
+
+
+@timed('store.read')
+def read_ohlcv(data_dir, symbol, timeframe, columns=COLUMNS, mmap=True):
+    """Liefert {spalte: array} (memmapped, read-only) oder None, wenn das Symbol fehlt."""
+    path = partition_dir(data_dir, symbol, timeframe)
+    if not os.path.exists(os.path.join(path, 'timestamp.npy')):
+        return None
+    mode = 'r' if mmap else None
+    out = {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode=mode) for col in columns}
+    n = min(len(a) for a in out.values())  # Schutz gegen halb geschriebene Updates
+    return {col: a[:n] for col, a in out.items()}
+
+
+@timed('store.load_frame')
+def load_frame(data_dir, symbol, timeframe, columns=COLUMNS[1:]):
+    """OHLCV als DataFrame mit DatetimeIndex 'timestamp' (Store bevorzugt, sonst CSV)."""
+    data = read_ohlcv(data_dir, symbol, timeframe, columns=('timestamp',) + tuple(columns))
+    if data is not None:
+        index = pd.DatetimeIndex(data['timestamp'].astype('datetime64[ms]'), name='timestamp')
+        return pd.DataFrame({c: data[c] for c in columns}, index=index)
+    fname = csv_path(data_dir, symbol, timeframe)
+    if not os.path.exists(fname):
+        return None
+    with stage('store.csv_fallback'):
+        df = pd.read_csv(fname)
+    if 'date' in df.columns and 'timestamp' not in df.columns:
+        df = df.rename(columns={'date': 'timestamp'})
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df.set_index('timestamp')[list(columns)]
+
+
+def load_close(data_dir, symbol, timeframe):
+    """Close-Serie mit DatetimeIndex oder None."""
+    df = load_frame(data_dir, symbol, timeframe, columns=('close',))
+    return None if df is None else df['close']
+
+
+def list_symbols(data_dir, timeframe):
+    """Alle Symbole eines Timeframes aus Store und CSVs."""
+    symbols = set()
+    store_dir = os.path.join(data_dir, STORE_SUBDIR, timeframe)
+    if os.path.isdir(store_dir):
+        symbols.update(s for s in os.listdir(store_dir) if exists(data_dir, s, timeframe))
+    if os.path.isdir(data_dir):
+        suffix = f"_{timeframe}.csv"
+        symbols.update(f[:-len(suffix)] for f in os.listdir(data_dir) if f.endswith(suffix))
+    return sorted(symbols)
+
+
+def convert_csv_dir(data_dir, force=False):
+    """Konvertiert alle {symbol}_{tf}.csv in den Binär-Store; unveränderte Dateien werden übersprungen."""
+    converted = 0
+    for fname in sorted(os.listdir(data_dir)):
+        if not fname.endswith('.csv') or '_' not in fname:
+            continue
+        symbol, timeframe = fname[:-4].rsplit('_', 1)
+        src = os.path.join(data_dir, fname)
+        target = os.path.join(partition_dir(data_dir, symbol, timeframe), 'timestamp.npy')
+        if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(src):
+            continue
+        df = pd.read_csv(src)
+        if 'date' in df.columns and 'timestamp' not in df.columns:
+            df = df.rename(columns={'date': 'timestamp'})
+        write_ohlcv(data_dir, symbol, timeframe, df)
+        converted += 1
+    return converted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Konvertiert OHLCV-CSVs in den binären Spalten-Store")
+    parser.add_argument('--data-dir', default='data/binance')
+    parser.add_argument('--force', action='store_true', help="Auch bereits konvertierte Dateien neu schreiben")
+    args = parser.parse_args(argv)
+    n = convert_csv_dir(args.data_dir, force=args.force)
+    print(f"{n} Dateien nach {os.path.join(args.data_dir, STORE_SUBDIR)} konvertiert.")
+
+
+if __name__ == '__main__':
+    main()
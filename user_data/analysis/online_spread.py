@@ -0,0 +1,322 @@
+# user_data/analysis/online_spread.py
+"""
+Rollierender / exponentiell gewichteter Hedge-Ratio- und Z-Score-Motor.
+
+Statt eines statischen OLS-Hedge-Ratios über die gesamte Historie (Look-Ahead) wird
+beta zu jedem Zeitpunkt nur aus vergangenen Kerzen geschätzt:
+  mode='rolling': OLS über die letzten hedge_window Kerzen, Spread-Mean/Std über z_window
+  mode='ewm':     exponentiell gewichtete Regression (span=hedge_window) und Mean/Var (span=z_window)
+
+OnlineSpread aktualisiert alles in O(1) pro neuer Kerze (Welford-Updates mit Ringpuffer bzw.
+rekursive EW-Momente) für den Live-Betrieb; batch_spread rechnet dasselbe vektorisiert über
+die Historie für Backtests. Beide liefern (bis auf Rundung) identische Werte.
+
+    python user_data/analysis/online_spread.py   # prüft OnlineSpread.update mit NaN-Kerzen und konstantem x
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from instrument import timed
+
+HEDGE_WINDOW = 500
+Z_WINDOW = 100
+RESYNC_EVERY = 1  # Rolling-Modus: exakte Neuberechnung alle RESYNC_EVERY * window Updates (gegen Drift)
+FLAT_TOL = 1e-12  # Varianz von x relativ zu mean(x)^2, darunter gilt x im Hedge-Fenster als konstant
+
+
+# ==== ROLLING-HILFSFUNKTIONEN (kumulative Summen) ====
+def cumulative_sums(values):
+    # Zentrieren vor dem Aufsummieren reduziert die Auslöschung bei der Varianz
+    centered = values - np.nanmean(values)
+    cs = np.concatenate([[0.0], np.cumsum(centered)])
+    cs2 = np.concatenate([[0.0], np.cumsum(centered * centered)])
+    return centered, cs, cs2
+
+
+def rolling_zscore(centered, cs, cs2, window):
+    """Z-Score gegen Rolling Mean/Std (ddof=1) des Fensters, aus kumulativen Summen."""
+    mean, std = _rolling_mean_std(cs, cs2, window, len(centered))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (centered - mean) / std
+
+
+def _rolling_mean_std(cs, cs2, window, n):
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    if window < 2 or window > n:
+        return mean, std
+    s = cs[window:] - cs[:-window]
+    s2 = cs2[window:] - cs2[:-window]
+    mean[window - 1:] = s / window
+    std[window - 1:] = np.sqrt(np.maximum(s2 - s * mean[window - 1:], 0.0) / (window - 1))
+    return mean, std
+
+
+def _ew_mean(values, alpha):
+    """m_t = (1-a) m_{t-1} + a v_t mit m_0 = v_0."""
+    from scipy.signal import lfilter  # scipy.signal lädt über eine Sekunde, nur für EW-Hedge nötig
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], values, zi=[(1.0 - alpha) * values[0]])
+    return out
+
+
+def _ew_comoment(dx, dy, alpha):
+    """c_t = (1-a) (c_{t-1} + a dx_t dy_t) mit c_0 = 0 (dx/dy = Abweichung vom Vor-Mittelwert)."""
+    prod = (1.0 - alpha) * alpha * dx * dy
+    prod[0] = 0.0
+    from scipy.signal import lfilter
+    return lfilter([1.0], [1.0, alpha - 1.0], prod)
+
+
+# ==== BATCH (HISTORIE) ====
+@timed('online_spread.batch')
+def batch_spread(y, x, hedge_window=HEDGE_WINDOW, z_window=Z_WINDOW, mode='rolling'):
+    """
+    Vektorisierte Berechnung über die Historie. Rückgabe: Dict mit Arrays
+    beta, spread, spread_mean, spread_std, zscore (NaN in der Anlaufphase).
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    n = len(y)
+    if n == 0:
+        empty = np.empty(0)
+        return dict(beta=empty, spread=empty, spread_mean=empty, spread_std=empty, zscore=empty)
+
+    if mode == 'rolling':
+        # Zentrierung um den ersten Wert: numerisch stabil und ohne Blick in die Zukunft
+        xc, yc = x - x[0], y - y[0]
+        cx = np.concatenate([[0.0], np.cumsum(xc)])
+        cy = np.concatenate([[0.0], np.cumsum(yc)])
+        cxx = np.concatenate([[0.0], np.cumsum(xc * xc)])
+        cxy = np.concatenate([[0.0], np.cumsum(xc * yc)])
+        beta = np.full(n, np.nan)
+        w = hedge_window
+        if 2 <= w <= n:
+            sx, sy = cx[w:] - cx[:-w], cy[w:] - cy[:-w]
+            sxx, sxy = cxx[w:] - cxx[:-w], cxy[w:] - cxy[:-w]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                beta[w - 1:] = (sxy - sx * sy / w) / (sxx - sx * sx / w)
+        spread = y - beta * x
+        mean = np.full(n, np.nan)
+        std = np.full(n, np.nan)
+        valid = np.flatnonzero(np.isfinite(spread))
+        if len(valid):
+            seg = spread[valid[0]:]
+            centered, cs, cs2 = cumulative_sums(seg)
+            m, s = _rolling_mean_std(cs, cs2, z_window, len(seg))
+            mean[valid[0]:] = m + np.nanmean(seg)
+            std[valid[0]:] = s
+    elif mode == 'ewm':
+        a = 2.0 / (hedge_window + 1.0)
+        mx, my = _ew_mean(x, a), _ew_mean(y, a)
+        dx = x - np.concatenate([[x[0]], mx[:-1]])
+        dy = y - np.concatenate([[y[0]], my[:-1]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = _ew_comoment(dx, dy, a) / _ew_comoment(dx, dx, a)
+        beta[:hedge_window - 1] = np.nan
+        spread = y - beta * x
+        mean = np.full(n, np.nan)
+        std = np.full(n, np.nan)
+        start = min(hedge_window - 1, n)
+        if start < n:
+            seg = spread[start:]
+            b = 2.0 / (z_window + 1.0)
+            m = _ew_mean(seg, b)
+            ds = seg - np.concatenate([[seg[0]], m[:-1]])
+            var = _ew_comoment(ds, ds, b)
+            m[:z_window - 1] = np.nan
+            mean[start:] = m
+            std[start:] = np.sqrt(var)
+    else:
+        raise ValueError(f"Unbekannter Modus: {mode}")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zscore = (spread - mean) / std
+    return dict(beta=beta, spread=spread, spread_mean=mean, spread_std=std, zscore=zscore)
+
+
+# ==== STREAMING (LIVE) ====
+class _RollingMoments:
+    """Mittelwerte und Co-Momente über ein festes Fenster, O(1) pro Update (Welford mit Entfernen)."""
+
+    def __init__(self, window, dims):
+        self.window = window
+        self.buf = np.zeros((window, dims))
+        self.pos = 0
+        self.count = 0
+        self.mean = np.zeros(dims)
+        self.comoment = np.zeros((dims, dims))
+        self._since_resync = 0
+
+    def push(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self.count == self.window:
+            old = self.buf[self.pos].copy()
+            d_old = old - self.mean
+            self.mean -= d_old / (self.count - 1)
+            self.comoment -= np.outer(d_old, old - self.mean)
+            self.count -= 1
+        self.buf[self.pos] = values
+        self.pos = (self.pos + 1) % self.window
+        self.count += 1
+        d = values - self.mean
+        self.mean += d / self.count
+        self.comoment += np.outer(d, values - self.mean)
+        self._since_resync += 1
+        if self._since_resync >= RESYNC_EVERY * self.window:
+            self._resync()
+
+    def _resync(self):
+        data = self.buf[:self.count]
+        self.mean = data.mean(axis=0)
+        dev = data - self.mean
+        self.comoment = dev.T @ dev
+        self._since_resync = 0
+
+    @property
+    def full(self):
+        return self.count == self.window
+
+
+class _EwMoments:
+    """Exponentiell gewichtete Mittelwerte und Co-Momente (adjust=False), O(1) pro Update."""
+
+    def __init__(self, span, dims):
+        self.alpha = 2.0 / (span + 1.0)
+        self.span = span
+        self.count = 0
+        self.mean = np.zeros(dims)
+        self.comoment = np.zeros((dims, dims))
+
+    def push(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self.count == 0:
+            self.mean = values.copy()
+        else:
+            a = self.alpha
+            d = values - self.mean
+            self.comoment = (1.0 - a) * (self.comoment + a * np.outer(d, d))
+            self.mean += a * d
+        self.count += 1
+
+    @property
+    def full(self):
+        return self.count >= self.span
+
+
+class OnlineSpread:
+    """
+    Streaming-Spread für den Live-Betrieb:
+        engine = OnlineSpread(hedge_window=500, z_window=100)
+        for y, x in candles:
+            beta, spread, z = engine.update(y, x)
+    Werte sind NaN, bis die jeweiligen Fenster gefüllt sind. Kerzen mit NaN/inf in y oder x
+    werden übersprungen (Rückgabe NaN, Zustand unverändert); ist x im Hedge-Fenster konstant,
+    gibt es kein beta und der Spread fließt nicht in Mean/Std ein.
+    """
+
+    def __init__(self, hedge_window=HEDGE_WINDOW, z_window=Z_WINDOW, mode='rolling'):
+        if mode == 'rolling':
+            self._hedge = _RollingMoments(hedge_window, 2)
+            self._spread = _RollingMoments(z_window, 1)
+        elif mode == 'ewm':
+            self._hedge = _EwMoments(hedge_window, 2)
+            self._spread = _EwMoments(z_window, 1)
+        else:
+            raise ValueError(f"Unbekannter Modus: {mode}")
+        self.mode = mode
+        self.beta = np.nan
+        self.spread = np.nan
+        self.zscore = np.nan
+        self.spread_mean = np.nan
+        self.spread_std = np.nan
+
+    def update(self, y, x):
+        if not (np.isfinite(y) and np.isfinite(x)):
+            return np.nan, np.nan, np.nan
+        self._hedge.push((x, y))
+        if not self._hedge.full:
+            return self.beta, self.spread, self.zscore
+        cm = self._hedge.comoment
+        # Welford mit Entfernen lässt bei konstantem x Rundungsreste statt 0 stehen
+        var_x = cm[0, 0] / self._hedge.count if self.mode == 'rolling' else cm[0, 0]
+        self.beta = cm[0, 1] / cm[0, 0] if var_x > FLAT_TOL * self._hedge.mean[0] ** 2 else np.nan
+        self.spread = y - self.beta * x
+        if not np.isfinite(self.spread):
+            self.zscore = np.nan
+            return self.beta, self.spread, self.zscore
+        self._spread.push((self.spread,))
+        self.spread_mean = self._spread.mean[0]
+        if self.mode == 'rolling':
+            var = self._spread.comoment[0, 0] / (self._spread.count - 1) if self._spread.count > 1 else np.nan
+        else:
+            var = self._spread.comoment[0, 0]
+        self.spread_std = np.sqrt(max(var, 0.0))
+        if self._spread.full and self.spread_std > 0:
+            self.zscore = (self.spread - self.spread_mean) / self.spread_std
+        else:
+            self.zscore = np.nan
+        return self.beta, self.spread, self.zscore
+
+
+# ==== PRÜFUNG ====
+def _run(engine, y, x):
+    return np.array([engine.update(a, b) for a, b in zip(y, x)])
+
+
+def check_update(mode, n=3000, hedge_window=200, z_window=50, seed=0):
+    """Fehlerliste von OnlineSpread.update für Kerzen mit NaN/inf und Strecken mit konstantem x."""
+    rng = np.random.default_rng(seed)
+    x = 100 + rng.standard_normal(n).cumsum()
+    y = 2 * x + rng.standard_normal(n)
+    problems = []
+
+    # ungültige Kerzen einstreuen: dort NaN, sonst dieselben Werte wie ohne sie
+    bad = np.sort(rng.choice(np.arange(1, n), 30, replace=False))
+    yb = np.insert(y, bad, np.where(np.arange(len(bad)) % 2, np.nan, 1.0))
+    xb = np.insert(x, bad, np.where(np.arange(len(bad)) % 2, 1.0, np.inf))
+    inserted = np.zeros(len(yb), dtype=bool)
+    inserted[bad + np.arange(len(bad))] = True
+    clean = _run(OnlineSpread(hedge_window, z_window, mode), y, x)
+    dirty = _run(OnlineSpread(hedge_window, z_window, mode), yb, xb)
+    if not np.isnan(dirty[inserted]).all():
+        problems.append(f"{mode}: ungültige Kerzen liefern Werte")
+    if not np.array_equal(dirty[~inserted], clean, equal_nan=True):
+        problems.append(f"{mode}: ungültige Kerzen verändern den Zustand")
+
+    # x konstant am Anfang und in der Mitte (länger als das Hedge-Fenster)
+    flat_len = 2 * hedge_window
+    mid = n // 2
+    xf = x.copy()
+    xf[:flat_len] = x[0]
+    xf[mid:mid + flat_len] = x[mid]
+    flat = _run(OnlineSpread(hedge_window, z_window, mode), y, xf)
+    if not np.isnan(flat[hedge_window - 1:flat_len, 0]).all():
+        problems.append(f"{mode}: beta bei konstantem x nicht NaN")
+    recover = hedge_window + z_window
+    for start, stop in ((flat_len + recover, mid), (mid + flat_len + recover, n)):
+        if not np.isfinite(flat[start:stop, 2]).all():
+            problems.append(f"{mode}: Z-Score nach konstantem x ab Kerze {start} nicht wieder endlich")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OnlineSpread.update mit NaN/inf-Kerzen und konstantem x prüfen")
+    parser.add_argument('--candles', type=int, default=3000)
+    parser.add_argument('--hedge-window', type=int, default=200)
+    parser.add_argument('--z-window', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    problems = [p for mode in ('rolling', 'ewm')
+                for p in check_update(mode, args.candles, args.hedge_window, args.z_window, args.seed)]
+    for problem in problems:
+        print(problem)
+    print("OK" if not problems else f"{len(problems)} Probleme")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
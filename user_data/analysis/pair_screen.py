@@ -0,0 +1,182 @@
+# user_data/analysis/pair_screen.py
+"""
+Mehrstufiges Vorsieben der Paar-Kandidaten vor dem teuren ADF-Test.
+
+Stufen (jede optional, in dieser Reihenfolge):
+  support    gemeinsame Stützmenge >= min_length
+  corr       |Korrelation der Log-Preise| >= min_corr
+  ret_corr   Korrelation der Log-Returns >= min_return_corr
+  top_k      nur die top_k Paare nach |Korrelation der Log-Preise|
+  half_life  Halbwertszeit der Spread-Mean-Reversion in (0, max_half_life] Kerzen
+  hurst      Hurst-Exponent des Spreads < max_hurst
+
+Die Korrelationen aller Paare kommen aus wenigen Matrixprodukten über das ganze Panel
+(ohne Lücken genau eines, mit Lücken vier für die paarweise gemeinsame Stützmenge).
+Halbwertszeit und Hurst werden nur noch für die verbliebenen Paare gerechnet, gruppiert
+nach gleicher Stützmenge wie im ADF-Scan. Der Bericht nennt je Stufe die entfernten Paare.
+"""
+
+import numpy as np
+import pandas as pd
+
+from coint_scan import hedge_ratios, upper_pairs
+from instrument import timed
+from price_panel import pack_valid, support_rows
+
+HURST_LAGS = np.arange(2, 20)
+
+
+# ==== KORRELATION ====
+def masked_correlation(values, valid):
+    """
+    Korrelationsmatrix (Symbol x Symbol) über die jeweils gemeinsame Stützmenge beider Spalten
+    (entspricht DataFrame.corr() mit paarweisem Ausschluss fehlender Werte).
+    Zusätzlich die Anzahl gemeinsamer Zeilen je Paar.
+    """
+    m = valid.astype(np.float64)
+    counts = np.maximum(m.sum(axis=0), 1)
+    x = np.where(valid, values, 0.0)
+    x = np.where(valid, x - x.sum(axis=0) / counts, 0.0)  # zentrieren gegen Auslöschung
+    if valid.all():
+        cov = x.T @ x
+        n = np.full(cov.shape, float(len(values)))
+        var = np.diag(cov)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return cov / np.sqrt(np.outer(var, var)), n
+    n = m.T @ m
+    sx = x.T @ m          # sx[i, j]: Summe von x_i über die Zeilen, in denen i und j gültig sind
+    sxx = (x * x).T @ m
+    sxy = x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var_i = sxx - sx * sx / n
+        return cov / np.sqrt(var_i * var_i.T), n
+
+
+def log_prices(values):
+    """Log-Preise und Gültigkeitsmaske (nicht-positive Kurse gelten als fehlend)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.log(values)
+    valid = np.isfinite(logs)
+    return logs, valid
+
+
+# ==== SPREAD-KENNZAHLEN ====
+def half_life(spread):
+    """Halbwertszeit je Zeile aus ds_t = a + lambda * s_{t-1}; inf, wenn nicht mean-reverting."""
+    lag = spread[:, :-1] - spread[:, :-1].mean(axis=1, keepdims=True)
+    diff = np.diff(spread, axis=1)
+    diff = diff - diff.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lam = np.einsum('pm,pm->p', lag, diff) / np.einsum('pm,pm->p', lag, lag)
+        return np.where(lam < 0, -np.log(2) / lam, np.inf)
+
+
+def hurst(spread, lags=HURST_LAGS):
+    """Hurst-Exponent je Zeile: Steigung von log std(s_{t+k} - s_t) über log k."""
+    lags = lags[lags < spread.shape[1]]
+    if len(lags) < 2:
+        return np.full(len(spread), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tau = np.log(np.stack([np.std(spread[:, k:] - spread[:, :-k], axis=1) for k in lags], axis=1))
+    lx = np.log(lags) - np.log(lags).mean()
+    return (tau - tau.mean(axis=1, keepdims=True)) @ lx / (lx @ lx)
+
+
+def spread_stats(values, valid, pairs, with_hurst=True, chunk_size=None):
+    """
+    (half_life, hurst) je Paar auf der gemeinsamen Stützmenge, Spread wie im ADF-Scan.
+    chunk_size begrenzt die Paare, deren Spreads gleichzeitig im Speicher liegen.
+    """
+    hl = np.full(len(pairs), np.nan)
+    hu = np.full(len(pairs), np.nan)
+    groups = {}
+    for k, (i, j) in enumerate(pairs):
+        mask = valid[i] & valid[j]
+        groups.setdefault(mask.tobytes(), (mask, []))[1].append(k)
+    for mask, members in groups.values():
+        rows = support_rows(mask, len(values))
+        if len(rows) < 3:
+            continue
+        members = np.asarray(members)
+        step = chunk_size or len(members)
+        for start in range(0, len(members), step):
+            block = members[start:start + step]
+            y = values[np.ix_(rows, pairs[block, 0])].T
+            x = values[np.ix_(rows, pairs[block, 1])].T
+            spread = y - hedge_ratios(y, x)[:, None] * x
+            hl[block] = half_life(spread)
+            if with_hurst:
+                hu[block] = hurst(spread)
+    return hl, hu
+
+
+# ==== PIPELINE ====
+@timed('scan.screen')
+def screen_pairs(values, symbols, valid=None, min_length=0, min_corr=None, min_return_corr=None,
+                 top_k=None, max_half_life=None, max_hurst=None, pairs=None, chunk_size=None):
+    """
+    Siebt die Paare (Default: alle i < j) stufenweise aus.
+    Rückgabe: (pairs, report) mit pairs als (K, 2)-Indexarray in Paar-Reihenfolge
+    (direkt für scan_pairs) und report als DataFrame stage/vorher/entfernt/nachher.
+    chunk_size: Paare je Block bei Halbwertszeit/Hurst (siehe spread_stats).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    pairs = upper_pairs(len(symbols)) if pairs is None else np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+    valid = pack_valid(values) if valid is None else valid
+    report = []
+
+    def keep(stage, ok):
+        nonlocal pairs
+        report.append((stage, len(pairs), int(np.count_nonzero(~ok)), int(np.count_nonzero(ok))))
+        pairs = pairs[ok]
+        return ok
+
+    needs_corr = min_corr is not None or top_k is not None
+    if min_length or needs_corr:
+        logs, log_valid = log_prices(values)
+        corr, n = masked_correlation(logs, log_valid)
+        i, j = pairs[:, 0], pairs[:, 1]
+        level = np.abs(corr[i, j])
+        if min_length:
+            level = level[keep('support', n[i, j] >= min_length)]
+            i, j = pairs[:, 0], pairs[:, 1]
+        if min_corr is not None:
+            level = level[keep('corr', level >= min_corr)]
+    if min_return_corr is not None:
+        logs, log_valid = log_prices(values)
+        ret_valid = log_valid[1:] & log_valid[:-1]
+        ret_corr, _ = masked_correlation(np.where(ret_valid, np.diff(logs, axis=0), np.nan), ret_valid)
+        ok = ret_corr[pairs[:, 0], pairs[:, 1]] >= min_return_corr
+        if needs_corr:
+            level = level[ok]
+        keep('ret_corr', ok)
+    if top_k is not None and len(pairs) > top_k:
+        ok = np.zeros(len(pairs), dtype=bool)
+        ok[np.argsort(-np.nan_to_num(level, nan=-1.0), kind='stable')[:top_k]] = True
+        keep('top_k', ok)
+    if max_half_life is not None or max_hurst is not None:
+        hl, hu = spread_stats(values, valid, pairs, with_hurst=max_hurst is not None, chunk_size=chunk_size)
+        if max_half_life is not None:
+            ok = (hl > 0) & (hl <= max_half_life)
+            hu = hu[ok]
+            keep('half_life', ok)
+        if max_hurst is not None:
+            keep('hurst', hu < max_hurst)
+    return pairs, pd.DataFrame(report, columns=['stage', 'vorher', 'entfernt', 'nachher'])
+
+
+def add_arguments(parser):
+    """CLI-Optionen der Vorsiebung für die Scanner (alle Default aus = volle Paarmenge)."""
+    group = parser.add_argument_group("Vorsiebung vor dem ADF-Test")
+    group.add_argument('--min-corr', type=float, default=None, help="Mindestbetrag der Log-Preis-Korrelation")
+    group.add_argument('--min-return-corr', type=float, default=None, help="Mindestkorrelation der Log-Returns")
+    group.add_argument('--top-k', type=int, default=None, help="Nur die K am stärksten korrelierten Paare")
+    group.add_argument('--max-half-life', type=float, default=None, help="Max. Halbwertszeit des Spreads (Kerzen)")
+    group.add_argument('--max-hurst', type=float, default=None, help="Max. Hurst-Exponent des Spreads")
+
+
+def options(args):
+    """screen_pairs-Parameter aus den mit add_arguments angelegten Optionen."""
+    return {'min_corr': args.min_corr, 'min_return_corr': args.min_return_corr, 'top_k': args.top_k,
+            'max_half_life': args.max_half_life, 'max_hurst': args.max_hurst}
@@ -0,0 +1,308 @@
+# user_data/analysis/price_panel.py
+"""
+Vorab ausgerichtetes Preis-Panel für alle Paar-Analysen.
+
+Ein Panel ist eine (Zeit x Symbol)-float64-Matrix der Close-Kurse über der Vereinigung aller
+Zeitstempel (Epoch-ms, aufsteigend), fehlende Kerzen = NaN. Dazu kommt eine Gültigkeits-Bitmaske
+je Symbol (np.packbits entlang der Zeit, Form Symbole x ceil(T/8)): die gemeinsame Stützmenge
+eines Paares ist ein bitweises UND zweier Zeilen, gleiche Stützmengen erkennt man am Bytemuster.
+Damit richten alle Scanner gleich aus (über den Zeitstempel, nie über das Serienende).
+
+Plattencache: {data_dir}/panel/{timeframe}/ mit index.npy, values.npy, valid.npy (mmap) und
+meta.json (Symbole, Schlüssel). Der Schlüssel ist ein Hash über Pfad, mtime und Größe aller
+Quelldateien (Binär-Store bzw. CSV); ändert sich eine Datei, wird das Panel neu gebaut.
+Für den speicherbegrenzten Scan (tiled_screen) liegen daneben log32.npy/log32.json: die um den
+Spaltenmittelwert zentrierten Log-Preise als float32, abgeleitet vom selben Stand.
+
+    python user_data/analysis/price_panel.py --data-dir user_data/data/binance --timeframes 5m,15m,1h
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import ohlcv_store
+from instrument import timed
+
+PANEL_SUBDIR = 'panel'
+ARRAYS = ('index', 'values', 'valid')
+LOG_VALUES = 'log32'
+LOG_CHUNK_BYTES = 256 * 2 ** 20  # Zeilenblöcke beim Ableiten der Log-Preise
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+# ==== BITMASKEN ====
+def pack_valid(values):
+    """Gültigkeits-Bitmaske (Symbole x ceil(T/8), uint8) einer (Zeit x Symbol)-Matrix mit NaN."""
+    return np.ascontiguousarray(np.packbits(~np.isnan(values), axis=0).T)
+
+
+def support_rows(mask, length):
+    """Zeilenindizes einer gepackten Maske (Länge `length`)."""
+    return np.flatnonzero(np.unpackbits(mask, count=length))
+
+
+# ==== PANEL ====
+class PricePanel:
+
+    def __init__(self, index, symbols, values, valid=None):
+        self.index = index            # int64 Epoch-ms, aufsteigend
+        self.symbols = list(symbols)
+        self.values = values          # (Zeit x Symbol) float64, NaN = keine Kerze
+        self.valid = pack_valid(values) if valid is None else valid
+        self._pos = {s: k for k, s in enumerate(self.symbols)}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(np.asarray(self.index).astype('datetime64[ms]'), name='timestamp')
+
+    def counts(self):
+        """Anzahl gültiger Kerzen je Symbol (Bits der gepackten Maske, ohne sie zu entpacken)."""
+        return _POPCOUNT[np.asarray(self.valid)].sum(axis=1)
+
+    def column(self, symbol):
+        """Close-Serie eines Symbols ohne Lücken (DatetimeIndex)."""
+        k = self._pos[symbol]
+        rows = support_rows(self.valid[k], len(self))
+        return pd.Series(self.values[rows, k], index=self.dates[rows], name=symbol)
+
+    def common_support(self, a, b):
+        """Zeilen, in denen beide Symbole eine Kerze haben (entspricht dem Inner-Join)."""
+        return support_rows(self.valid[self._pos[a]] & self.valid[self._pos[b]], len(self))
+
+    def pair(self, a, b):
+        """(Zeitstempel, Kurse a, Kurse b) auf der gemeinsamen Stützmenge."""
+        rows = self.common_support(a, b)
+        return self.index[rows], self.values[rows, self._pos[a]], self.values[rows, self._pos[b]]
+
+    def columns(self, symbols=None, min_length=0):
+        """Spaltenindizes der vorhandenen Symbole (Reihenfolge wie übergeben) mit >= min_length Kerzen."""
+        symbols = self.symbols if symbols is None else [s for s in symbols if s in self._pos]
+        cols = np.asarray([self._pos[s] for s in symbols], dtype=np.intp)
+        if min_length:
+            cols = cols[self.counts()[cols] >= min_length]
+        return cols
+
+    def select(self, symbols=None, min_length=0):
+        """Teil-Panel (Symbolreihenfolge wie übergeben); Zeilen ohne jede Kerze entfallen."""
+        cols = self.columns(symbols, min_length)
+        symbols = [self.symbols[k] for k in cols]
+        values = self.values[:, cols]
+        rows = np.flatnonzero(~np.isnan(values).all(axis=1)) if len(cols) else np.empty(0, dtype=np.intp)
+        return PricePanel(self.index[rows], symbols, np.ascontiguousarray(values[rows]))
+
+    @classmethod
+    def from_arrays(cls, series, allocate=None):
+        """
+        Baut das Panel aus {symbol: (timestamps_ms, closes)}; doppelte Zeitstempel: letzter gewinnt.
+        allocate(shape) liefert die zu füllende Wertematrix (Default: im Speicher), z.B. eine
+        np.memmap-Datei; gefüllt wird spaltenweise, die Maske entsteht dabei gleich mit.
+        """
+        symbols = list(series)
+        stamps = [np.asarray(series[s][0], dtype=np.int64) for s in symbols]
+        index = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+        shape = (len(index), len(symbols))
+        values = np.empty(shape) if allocate is None else allocate(shape)
+        valid = np.empty((len(symbols), -(-len(index) // 8)), dtype=np.uint8)
+        column = np.empty(len(index))
+        for k, (s, ts) in enumerate(zip(symbols, stamps)):
+            column.fill(np.nan)
+            column[np.searchsorted(index, ts)] = series[s][1]
+            values[:, k] = column
+            valid[k] = np.packbits(~np.isnan(column))
+        return cls(index, symbols, values, valid)
+
+    @classmethod
+    def from_closes(cls, closes):
+        """Baut das Panel aus {symbol: Close-Serie mit DatetimeIndex} (z.B. async_fetch.fetch_closes)."""
+        return cls.from_arrays({s: (ohlcv_store.to_epoch_ms(c.index), c.to_numpy(dtype=np.float64))
+                                for s, c in closes.items()})
+
+
+# ==== QUELLEN UND CACHE ====
+def panel_dir(data_dir, timeframe):
+    return os.path.join(data_dir, PANEL_SUBDIR, timeframe)
+
+
+def source_files(data_dir, symbol, timeframe):
+    """Dateien, aus denen load_close das Symbol liest (Binär-Store bevorzugt, sonst CSV)."""
+    if ohlcv_store.exists(data_dir, symbol, timeframe):
+        path = ohlcv_store.partition_dir(data_dir, symbol, timeframe)
+        return [os.path.join(path, 'timestamp.npy'), os.path.join(path, 'close.npy')]
+    return [ohlcv_store.csv_path(data_dir, symbol, timeframe)]
+
+
+def source_key(data_dir, timeframe, symbols):
+    """Hash über Pfad, mtime und Größe aller Quelldateien."""
+    h = hashlib.sha1()
+    for symbol in symbols:
+        for path in source_files(data_dir, symbol, timeframe):
+            st = os.stat(path)
+            h.update(f"{symbol}\0{path}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+    return h.hexdigest()
+
+
+def _read_close(data_dir, symbol, timeframe):
+    data = ohlcv_store.read_ohlcv(data_dir, symbol, timeframe, columns=('timestamp', 'close'))
+    if data is not None:
+        return data['timestamp'], data['close']
+    close = ohlcv_store.load_close(data_dir, symbol, timeframe)
+    if close is None:
+        return None
+    return ohlcv_store.to_epoch_ms(close.index), close.to_numpy(dtype=np.float64)
+
+
+@timed('panel.build')
+def build_panel(data_dir, timeframe, symbols=None, allocate=None):
+    """Liest alle Symbole des Timeframes (ohne Cache) und richtet sie über den Zeitstempel aus."""
+    symbols = ohlcv_store.list_symbols(data_dir, timeframe) if symbols is None else symbols
+    series = {}
+    for s in symbols:
+        data = _read_close(data_dir, s, timeframe)
+        if data is not None and len(data[0]):
+            series[s] = data
+    return PricePanel.from_arrays(series, allocate=allocate)
+
+
+def read_cached(data_dir, timeframe, key=None):
+    """Panel aus dem Cache (memmapped) oder None, wenn keiner existiert bzw. der Schlüssel abweicht."""
+    path = panel_dir(data_dir, timeframe)
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if key is not None and meta.get('key') != key:
+        return None
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in ARRAYS}
+    return PricePanel(arrays['index'], meta['symbols'], arrays['values'], arrays['valid'])
+
+
+def write_cached(data_dir, timeframe, panel, key):
+    """Schreibt das Panel atomar; meta.json kommt zuletzt und macht den Stand gültig."""
+    path = panel_dir(data_dir, timeframe)
+    os.makedirs(path, exist_ok=True)
+    meta = os.path.join(path, 'meta.json')
+    if os.path.exists(meta):
+        os.remove(meta)  # während des Schreibens gilt der alte Stand nicht mehr
+    for name in ARRAYS:
+        target = os.path.join(path, f"{name}.npy")
+        array = getattr(panel, name)
+        if isinstance(array, np.memmap) and os.path.abspath(array.filename) == os.path.abspath(target + '.tmp'):
+            array.flush()  # direkt in die Datei gebaut (load_panel(low_memory=True))
+        else:
+            with open(target + '.tmp', 'wb') as f:
+                np.save(f, np.asarray(array))
+        os.replace(target + '.tmp', target)
+    with open(meta + '.tmp', 'w') as f:
+        json.dump({'key': key, 'symbols': panel.symbols, 'timeframe': timeframe}, f)
+    os.replace(meta + '.tmp', meta)
+
+
+@timed('panel.load')
+def load_panel(data_dir, timeframe, rebuild=False, low_memory=False):
+    """
+    Panel aller Symbole des Timeframes; gebaut wird nur, wenn sich Quelldateien geändert haben.
+    low_memory=True baut die Wertematrix direkt in die Cache-Datei und liefert immer das
+    memmapped Panel (nie die ganze float64-Matrix im Speicher).
+    """
+    symbols = ohlcv_store.list_symbols(data_dir, timeframe)
+    key = source_key(data_dir, timeframe, symbols)
+    panel = None if rebuild else read_cached(data_dir, timeframe, key)
+    if panel is None:
+        allocate = None
+        if low_memory:
+            path = panel_dir(data_dir, timeframe)
+            os.makedirs(path, exist_ok=True)
+
+            def allocate(shape):
+                if 0 in shape:  # leere Dateien lassen sich nicht einblenden
+                    return np.empty(shape)
+                return np.lib.format.open_memmap(os.path.join(path, 'values.npy.tmp'), mode='w+',
+                                                 dtype=np.float64, shape=shape)
+        panel = build_panel(data_dir, timeframe, symbols, allocate=allocate)
+        write_cached(data_dir, timeframe, panel, key)
+        if low_memory:
+            panel = read_cached(data_dir, timeframe, key)
+    return panel
+
+
+# ==== FLOAT32-LOG-PREISE ====
+def log_values(values, out=None, chunk_bytes=LOG_CHUNK_BYTES):
+    """
+    Um den Spaltenmittelwert zentrierte Log-Preise als float32 (NaN = keine Kerze oder Kurs <= 0).
+    Das Zentrieren hält die Beträge klein, damit float32 für Korrelationen genau genug bleibt.
+    Zwei Durchläufe in Zeilenblöcken von höchstens chunk_bytes, out z.B. eine np.memmap-Datei.
+    """
+    length, width = values.shape
+    rows = max(1, chunk_bytes // max(width * 8 * 3, 1))
+    total = np.zeros(width)
+    n = np.zeros(width)
+    for start in range(0, length, rows):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            logs = np.log(values[start:start + rows])
+        ok = np.isfinite(logs)
+        total += np.where(ok, logs, 0.0).sum(axis=0)
+        n += ok.sum(axis=0)
+    mean = total / np.maximum(n, 1)
+    out = np.empty((length, width), dtype=np.float32) if out is None else out
+    for start in range(0, length, rows):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            logs = np.log(values[start:start + rows])
+        out[start:start + rows] = np.where(np.isfinite(logs), logs - mean, np.nan)
+    return out
+
+
+@timed('panel.log32')
+def load_log_values(data_dir, timeframe, panel, chunk_bytes=LOG_CHUNK_BYTES):
+    """log_values des gecachten Panels (load_panel) als memmapped float32-Matrix, bei Bedarf neu abgeleitet."""
+    if not panel.values.size:
+        return log_values(panel.values)
+    path = panel_dir(data_dir, timeframe)
+    with open(os.path.join(path, 'meta.json')) as f:
+        key = json.load(f)['key']
+    target = os.path.join(path, f"{LOG_VALUES}.npy")
+    meta = os.path.join(path, f"{LOG_VALUES}.json")
+    try:
+        with open(meta) as f:
+            current = json.load(f).get('key') == key
+    except (OSError, ValueError):
+        current = False
+    if not current:
+        if os.path.exists(meta):
+            os.remove(meta)
+        out = np.lib.format.open_memmap(target + '.tmp', mode='w+', dtype=np.float32, shape=panel.values.shape)
+        log_values(panel.values, out, chunk_bytes)
+        out.flush()
+        del out
+        os.replace(target + '.tmp', target)
+        with open(meta + '.tmp', 'w') as f:
+            json.dump({'key': key}, f)
+        os.replace(meta + '.tmp', meta)
+    return np.load(target, mmap_mode='r')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Baut die Preis-Panels (Zeit x Symbol) für die Scanner")
+    parser.add_argument('--data-dir', default='user_data/data/binance')
+    parser.add_argument('--timeframes', default='5m,15m,1h', help="Kommagetrennt")
+    parser.add_argument('--rebuild', action='store_true', help="Cache ignorieren und neu bauen")
+    args = parser.parse_args(argv)
+    for timeframe in [t for t in args.timeframes.split(',') if t]:
+        panel = load_panel(args.data_dir, timeframe, rebuild=args.rebuild)
+        if not panel.symbols:
+            print(f"{timeframe}: keine Daten")
+            continue
+        print(f"{timeframe}: {len(panel.symbols)} Symbole x {len(panel)} Kerzen "
+              f"({panel.values.nbytes / 2 ** 20:.1f} MB) in {panel_dir(args.data_dir, timeframe)}")
+
+
+if __name__ == '__main__':
+    main()
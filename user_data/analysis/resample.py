@@ -0,0 +1,162 @@
+# user_data/analysis/resample.py
+"""
+Höhere Timeframes lokal aus den gespeicherten Basis-Kerzen (5m) ableiten statt sie zu laden.
+
+Aggregation je Epoch-ausgerichtetem Bucket (ts // step * step, wie bei Binance für m/h/d):
+open = erste, high = max, low = min, close = letzte Kerze, volume = Summe.
+Geschrieben werden nur abgeschlossene Buckets, d.h. solche, deren letzte Basis-Kerze schon
+gespeichert ist; der laufende Bucket folgt beim nächsten Lauf. Inkrementell wird ab dem
+Bucket nach dem letzten gespeicherten Ziel-Zeitstempel gerechnet und per append_ohlcv angehängt.
+
+    python user_data/analysis/resample.py --data-dir user_data/data/binance --timeframes 15m,30m,1h,4h
+    python user_data/analysis/resample.py --check   # gegen vorhandene Exchange-Kerzen vergleichen
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import ohlcv_store
+from instrument import timed
+
+BASE_TIMEFRAME = '5m'
+TIMEFRAMES = ('15m', '1h')
+UNIT_MS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000}
+VOLUME_RTOL = 1e-9  # Summen aus float64 weichen in der letzten Stelle von den Exchange-Werten ab
+
+
+def timeframe_ms(timeframe):
+    """'5m' -> 300000. Wochen/Monate beginnen bei Binance nicht Epoch-ausgerichtet -> ValueError."""
+    unit = timeframe[-1]
+    if unit not in UNIT_MS or not timeframe[:-1].isdigit():
+        raise ValueError(f"Timeframe nicht resamplebar: {timeframe}")
+    return int(timeframe[:-1]) * UNIT_MS[unit]
+
+
+def _empty():
+    return {col: np.empty(0, dtype=np.int64 if col == 'timestamp' else np.float64) for col in ohlcv_store.COLUMNS}
+
+
+def resample_ohlcv(data, base_ms, step, end=None, partial_head=False):
+    """
+    data: {spalte: array} wie ohlcv_store.read_ohlcv (aufsteigende Zeitstempel).
+    end: Zeitstempel nach der letzten gespeicherten Basis-Kerze (Default: letzte + base_ms);
+    Buckets, die über end hinausreichen, fehlen noch und werden weggelassen.
+    partial_head=False verwirft den ersten Bucket, wenn die Historie mitten darin beginnt.
+    """
+    ts = np.asarray(data['timestamp'], dtype=np.int64)
+    if not len(ts):
+        return _empty()
+    end = ts[-1] + base_ms if end is None else end
+    bucket = ts // step * step
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    lasts = np.r_[starts[1:], len(ts)] - 1
+    keep = bucket[starts] + step <= end
+    if not partial_head:
+        keep[0] &= ts[0] == bucket[0]
+    starts, lasts = starts[keep], lasts[keep]
+    if not len(starts):
+        return _empty()
+    # reduceat über den Bereich der behaltenen Buckets (der Kopf-Bucket ist ggf. abgeschnitten)
+    lo, hi = starts[0], lasts[-1] + 1
+    idx = starts - lo
+    return {
+        'timestamp': bucket[starts],
+        'open': np.asarray(data['open'])[starts],
+        'high': np.maximum.reduceat(np.asarray(data['high'][lo:hi]), idx),
+        'low': np.minimum.reduceat(np.asarray(data['low'][lo:hi]), idx),
+        'close': np.asarray(data['close'])[lasts],
+        'volume': np.add.reduceat(np.asarray(data['volume'][lo:hi], dtype=np.float64), idx),
+    }
+
+
+@timed('resample.update')
+def update_timeframe(data_dir, symbol, timeframe, base=BASE_TIMEFRAME):
+    """Hängt alle neu abgeschlossenen Buckets an die Ziel-Partition an. Rückgabe: neue Kerzen."""
+    base_ms, step = timeframe_ms(base), timeframe_ms(timeframe)
+    if step <= base_ms or step % base_ms:
+        raise ValueError(f"{timeframe} ist kein Vielfaches von {base}")
+    data = ohlcv_store.read_ohlcv(data_dir, symbol, base)
+    if data is None or not len(data['timestamp']):
+        return 0
+    last = ohlcv_store.last_timestamp(data_dir, symbol, timeframe)
+    if last is not None:
+        # Nur der Teil ab dem ersten noch fehlenden Bucket wird gelesen (memmapped Slice)
+        first = int(np.searchsorted(data['timestamp'], last + step))
+        data = {col: a[first:] for col, a in data.items()}
+    out = resample_ohlcv(data, base_ms, step, partial_head=last is not None)
+    if not len(out['timestamp']):
+        return 0
+    return ohlcv_store.append_ohlcv(data_dir, symbol, timeframe, pd.DataFrame(out))
+
+
+def resample_dir(data_dir, timeframes=TIMEFRAMES, base=BASE_TIMEFRAME, symbols=None, export_csv=False):
+    """Alle Symbole mit Basis-Kerzen im Store; Rückgabe: {timeframe: neue Kerzen}."""
+    symbols = ohlcv_store.list_symbols(data_dir, base) if symbols is None else symbols
+    added = {tf: 0 for tf in timeframes}
+    for symbol in symbols:
+        if not ohlcv_store.exists(data_dir, symbol, base):
+            continue
+        for tf in timeframes:
+            n = update_timeframe(data_dir, symbol, tf, base)
+            added[tf] += n
+            if export_csv and n:
+                ohlcv_store.export_csv(data_dir, symbol, tf)
+    return added
+
+
+def compare(data_dir, symbol, timeframe, base=BASE_TIMEFRAME):
+    """
+    Vergleicht das Resampling mit den gespeicherten Kerzen des Ziel-Timeframes (z.B. von der
+    Exchange geladen). Rückgabe: (gemeinsame Buckets, Abweichungen); Preise müssen exakt,
+    Volumen bis auf VOLUME_RTOL übereinstimmen.
+    """
+    data = ohlcv_store.read_ohlcv(data_dir, symbol, base)
+    target = ohlcv_store.read_ohlcv(data_dir, symbol, timeframe)
+    if data is None or target is None:
+        return 0, 0
+    ours = resample_ohlcv(data, timeframe_ms(base), timeframe_ms(timeframe))
+    common, i, j = np.intersect1d(ours['timestamp'], target['timestamp'], return_indices=True)
+    bad = np.zeros(len(common), dtype=bool)
+    for col in ('open', 'high', 'low', 'close'):
+        bad |= ours[col][i] != target[col][j]
+    bad |= ~np.isclose(ours['volume'][i], target['volume'][j], rtol=VOLUME_RTOL, atol=0.0)
+    return len(common), int(bad.sum())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Leitet höhere Timeframes aus den 5m-Kerzen im Store ab")
+    parser.add_argument('--data-dir', default='data/binance')
+    parser.add_argument('--base', default=BASE_TIMEFRAME, help="Basis-Timeframe im Store")
+    parser.add_argument('--timeframes', default=','.join(TIMEFRAMES), help="Ziel-Timeframes, kommagetrennt")
+    parser.add_argument('--csv', action='store_true', help="Zusätzlich {symbol}_{tf}.csv aktualisieren")
+    parser.add_argument('--check', action='store_true',
+                        help="Nichts schreiben, nur gegen vorhandene Kerzen der Ziel-Timeframes vergleichen")
+    args = parser.parse_args(argv)
+    timeframes = [tf for tf in args.timeframes.split(',') if tf]
+
+    if args.check:
+        failed = False
+        for tf in timeframes:
+            total = mismatched = 0
+            for symbol in ohlcv_store.list_symbols(args.data_dir, args.base):
+                n, bad = compare(args.data_dir, symbol, tf, args.base)
+                total += n
+                mismatched += bad
+                if bad:
+                    print(f"  {symbol} {tf}: {bad} von {n} Kerzen weichen ab")
+            failed |= mismatched > 0
+            print(f"{tf}: {total} Kerzen verglichen, {mismatched} Abweichungen")
+        if failed:
+            sys.exit(1)
+        return
+
+    added = resample_dir(args.data_dir, timeframes, args.base, export_csv=args.csv)
+    for tf, n in added.items():
+        print(f"{tf}: {n} neue Kerzen aus {args.base} abgeleitet")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+# user_data/analysis/scan_cache.py
+"""
+Persistenter Ergebnis-Cache für den Cointegration-Scan (SQLite).
+
+Schlüssel je Paar: (symbol1, symbol2, timeframe, Inhalts-Hash beider Serien, Testparameter).
+Der Inhalts-Hash einer Serie läuft über Zeitstempel und Kurse ihrer gültigen Panel-Zeilen;
+da die gemeinsame Stützmenge eines Paares allein davon abhängt, ist das Ergebnis genau dann
+wiederverwendbar, wenn sich keine der beiden Serien geändert hat. Nach einem inkrementellen
+Download werden also nur Paare mit aktualisierten Symbolen neu gerechnet.
+
+Auch nicht testbare Paare (zu kurz, ADF ungültig) werden gespeichert, damit sie beim
+nächsten Lauf nicht erneut versucht werden. Über max_rows hinaus verdrängt der Cache die
+am längsten nicht benutzten Einträge.
+
+    python user_data/analysis/scan_cache.py --cache user_data/data/binance/scan_cache.sqlite
+    python user_data/analysis/scan_cache.py --cache ... --clear
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from instrument import count
+from price_panel import support_rows
+
+CACHE_FILE = 'scan_cache.sqlite'
+MAX_ROWS = 1_000_000
+QUERY_CHUNK = 500  # Schlüssel je IN-Abfrage (SQLite-Limit für Parameter)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    timeframe TEXT, pair1 TEXT, pair2 TEXT,
+    beta REAL, adf_stat REAL, pvalue REAL, n REAL,
+    used INTEGER
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+
+def series_hashes(index, values, valid, symbols, columns=None):
+    """Inhalts-Hash je Symbol über Zeitstempel und Kurse der gültigen Zeilen (nur columns, sonst None)."""
+    hashes = [None] * len(symbols)
+    for k in range(len(symbols)) if columns is None else columns:
+        rows = support_rows(valid[k], len(index))
+        h = hashlib.blake2b(digest_size=16)
+        h.update(np.ascontiguousarray(index[rows], dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(values[rows, k], dtype=np.float64).tobytes())
+        hashes[k] = h.digest()
+    return hashes
+
+
+class ScanCache:
+
+    def __init__(self, path, max_rows=MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def for_panel(self, timeframe, panel, columns=None):
+        """
+        Cache-Sicht für scan_pairs(..., cache=...) auf ein price_panel.PricePanel;
+        columns beschränkt das Hashen auf die Spalten, aus denen die Paare stammen.
+        """
+        return PanelCache(self, timeframe, panel.symbols,
+                          series_hashes(panel.index, panel.values, panel.valid, panel.symbols, columns))
+
+    def rows(self):
+        return self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def fetch(self, keys):
+        """{key: (beta, adf_stat, pvalue, n)} der vorhandenen Schlüssel; markiert sie als benutzt."""
+        found = {}
+        now = time.time_ns()
+        with self.db:
+            for start in range(0, len(keys), QUERY_CHUNK):
+                chunk = keys[start:start + QUERY_CHUNK]
+                marks = ','.join('?' * len(chunk))
+                for row in self.db.execute(
+                        f"SELECT key, beta, adf_stat, pvalue, n FROM results WHERE key IN ({marks})", chunk):
+                    found[row[0]] = row[1:]
+                self.db.execute(f"UPDATE results SET used = ? WHERE key IN ({marks})", (now, *chunk))
+        return found
+
+    def insert(self, rows):
+        """rows: (key, timeframe, pair1, pair2, beta, adf_stat, pvalue, n); danach ggf. verdrängen."""
+        now = time.time_ns()
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [(*row, now) for row in rows])
+            excess = self.rows() - self.max_rows
+            if excess > 0:
+                self.db.execute("DELETE FROM results WHERE key IN "
+                                "(SELECT key FROM results ORDER BY used LIMIT ?)", (excess,))
+                self.evictions += excess
+
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM results")
+        self.db.execute("VACUUM")
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (f"Ergebnis-Cache: {self.hits} Treffer, {self.misses} neu gerechnet ({rate:.1%} Trefferquote), "
+                f"{self.rows()} Einträge, {self.evictions} verdrängt")
+
+
+class PanelCache:
+    """Bindet den Cache an Timeframe und Serien-Hashes eines Panels."""
+
+    def __init__(self, cache, timeframe, symbols, hashes):
+        self.cache = cache
+        self.timeframe = timeframe
+        self.symbols = symbols
+        self.hashes = hashes
+
+    def keys(self, pairs, params):
+        suffix = f"\0{self.timeframe}\0{params!r}".encode()
+        out = []
+        for i, j in pairs:
+            h = hashlib.blake2b(digest_size=16)
+            h.update(self.symbols[i].encode() + b'\0' + self.hashes[i] + b'\0')
+            h.update(self.symbols[j].encode() + b'\0' + self.hashes[j] + suffix)
+            out.append(h.digest())
+        return out
+
+    def lookup(self, pairs, params):
+        """(Ergebnis-Array wie _scan_results, bool-Maske der fehlenden Paare)."""
+        keys = self.keys(pairs, params)
+        found = self.cache.fetch(keys)
+        results = np.full((len(pairs), 4), np.nan)
+        missing = np.ones(len(pairs), dtype=bool)
+        for k, key in enumerate(keys):
+            row = found.get(key)
+            if row is not None:
+                results[k] = np.array(row, dtype=np.float64)  # NULL (NaN) -> nan
+                missing[k] = False
+        hits = len(pairs) - int(missing.sum())
+        self.cache.hits += hits
+        self.cache.misses += len(pairs) - hits
+        count('scan.cache_hit', hits)
+        count('scan.cache_miss', len(pairs) - hits)
+        return results, missing
+
+    def store(self, pairs, results, params):
+        keys = self.keys(pairs, params)
+        self.cache.insert([
+            (key, self.timeframe, self.symbols[i], self.symbols[j],
+             *(None if np.isnan(v) else float(v) for v in res))
+            for key, (i, j), res in zip(keys, pairs, results)
+        ])
+
+
+def add_arguments(parser, data_dir):
+    group = parser.add_argument_group("Ergebnis-Cache")
+    group.add_argument('--cache', default=os.path.join(data_dir, CACHE_FILE), help="SQLite-Datei des Caches")
+    group.add_argument('--no-cache', action='store_true', help="Alle Paare neu rechnen, nichts speichern")
+    group.add_argument('--cache-max-rows', type=int, default=MAX_ROWS, help="Höchstzahl gespeicherter Paare")
+
+
+def open_cache(args):
+    """ScanCache aus den mit add_arguments angelegten Optionen (None bei --no-cache)."""
+    return None if args.no_cache else ScanCache(args.cache, max_rows=args.cache_max_rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Statistik bzw. Leeren des Scan-Ergebnis-Caches")
+    parser.add_argument('--cache', default=os.path.join('user_data/data/binance', CACHE_FILE))
+    parser.add_argument('--clear', action='store_true', help="Alle Einträge löschen")
+    args = parser.parse_args(argv)
+    cache = ScanCache(args.cache)
+    try:
+        if args.clear:
+            cache.clear()
+            print(f"Cache {args.cache} geleert.")
+            return
+        print(f"{cache.rows()} Einträge in {args.cache}")
+        for timeframe, n in cache.db.execute("SELECT timeframe, COUNT(*) FROM results GROUP BY timeframe"):
+            print(f"  {timeframe}: {n}")
+    finally:
+        cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,142 +1,226 @@
+import argparse
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import os
+
+import ohlcv_store
+from instrument import timed
+from online_spread import batch_spread
 
 # ==== SETTINGS =====
 PAIR1 = "ETHUSDT"
 PAIR2 = "ETHDAI"
 TIMEFRAME = "15m"
 FEE_RATE = 0.001  # 0.1% pro Trade, Roundtrip = 0.2%
+CAPITAL = 10000   # USDT Startkapital
+WINDOW = 100      # Rolling-Fenster für Mean/Std des Spreads
+ENTRY_Z = 2.0     # Einstieg bei |z| > ENTRY_Z
+EXIT_Z = 0.5      # Ausstieg bei |z| < EXIT_Z
+HEDGE = "static"  # static = OLS über alles (Look-Ahead!), rolling/ewm = nur Vergangenheit
+HEDGE_WINDOW = 500
 
 DATA_DIR = "user_data/data/binance"
-CSV1 = f"{DATA_DIR}/{PAIR1}_{TIMEFRAME}.csv"
-CSV2 = f"{DATA_DIR}/{PAIR2}_{TIMEFRAME}.csv"
+OUT_DIR = "user_data/analysis"
 
 # ==== LOAD DATA =====
-def load_price(csv):
-    df = pd.read_csv(csv)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df.set_index("timestamp", inplace=True)
-    return df["close"].astype(float)
-
-s1 = load_price(CSV1)
-s2 = load_price(CSV2)
-df = pd.DataFrame({PAIR1: s1, PAIR2: s2}).dropna()
+def load_price(symbol, timeframe):
+    # Binär-Store (falls konvertiert), sonst CSV
+    close = ohlcv_store.load_close(DATA_DIR, symbol, timeframe)
+    if close is None:
+        raise FileNotFoundError(ohlcv_store.csv_path(DATA_DIR, symbol, timeframe))
+    return close.astype(float)
+
+def load_pair(pair1, pair2, timeframe):
+    s1 = load_price(pair1, timeframe)
+    s2 = load_price(pair2, timeframe)
+    return pd.DataFrame({pair1: s1, pair2: s2}).dropna()
 
 # ==== SPREAD-BERECHNUNG (Lineares Hedge-Ratio) =====
-# Hedge-Ratio via linearer Regression, damit Spread stationär ist
-import statsmodels.api as sm
-X = sm.add_constant(df[PAIR2])
-model = sm.OLS(df[PAIR1], X).fit()
-hedge_ratio = model.params[PAIR2]
-
-df["spread"] = df[PAIR1] - hedge_ratio * df[PAIR2]
-df["spread_mean"] = df["spread"].rolling(100).mean()
-df["spread_std"] = df["spread"].rolling(100).std()
-df["zscore"] = (df["spread"] - df["spread_mean"]) / df["spread_std"]
+@timed('backtest.spread')
+def add_spread(df, pair1, pair2, window=WINDOW, hedge=HEDGE, hedge_window=HEDGE_WINDOW):
+    if hedge != "static":
+        # Rollierendes/EW Hedge-Ratio: jeder Wert nutzt nur Kerzen bis zum jeweiligen Zeitpunkt
+        out = batch_spread(df[pair1].to_numpy(), df[pair2].to_numpy(), hedge_window, window, mode=hedge)
+        df["hedge_ratio"] = out["beta"]
+        df["spread"] = out["spread"]
+        df["spread_mean"] = out["spread_mean"]
+        df["spread_std"] = out["spread_std"]
+        df["zscore"] = out["zscore"]
+        return df["hedge_ratio"].iloc[-1]
+
+    # Hedge-Ratio via linearer Regression, damit Spread stationär ist
+    import statsmodels.api as sm
+    X = sm.add_constant(df[pair2])
+    model = sm.OLS(df[pair1], X).fit()
+    hedge_ratio = model.params[pair2]
+
+    df["spread"] = df[pair1] - hedge_ratio * df[pair2]
+    df["spread_mean"] = df["spread"].rolling(window).mean()
+    df["spread_std"] = df["spread"].rolling(window).std()
+    df["zscore"] = (df["spread"] - df["spread_mean"]) / df["spread_std"]
+    return hedge_ratio
 
 # ==== VISUALISIERUNG ====
-plt.figure(figsize=(16, 8))
-plt.plot(df.index, df["spread"], label="Spread")
-plt.plot(df.index, df["spread_mean"], label="Rolling Mean (100)")
-plt.fill_between(df.index, df["spread_mean"] + 2 * df["spread_std"],
-                 df["spread_mean"] - 2 * df["spread_std"], color="grey", alpha=0.2, label="±2 Std")
-plt.title(f"Spread und Rolling Mean - {PAIR1} vs {PAIR2} ({TIMEFRAME})")
-plt.legend()
-plt.tight_layout()
-plt.savefig(f"user_data/analysis/{PAIR1}_{PAIR2}_{TIMEFRAME}_spread.png")
-plt.close()
-
-plt.figure(figsize=(16, 4))
-plt.plot(df.index, df["zscore"], label="Z-Score")
-plt.axhline(2, color="red", linestyle="--")
-plt.axhline(-2, color="red", linestyle="--")
-plt.axhline(0, color="black", linestyle=":")
-plt.title(f"Z-Score des Spreads - {PAIR1} vs {PAIR2} ({TIMEFRAME})")
-plt.legend()
-plt.tight_layout()
-plt.savefig(f"user_data/analysis/{PAIR1}_{PAIR2}_{TIMEFRAME}_zscore.png")
-plt.close()
+def plot_spread(df, pair1, pair2, timeframe, window=WINDOW, entry_z=ENTRY_Z):
+    import matplotlib.pyplot as plt  # erst beim Plotten laden
+    plt.figure(figsize=(16, 8))
+    plt.plot(df.index, df["spread"], label="Spread")
+    plt.plot(df.index, df["spread_mean"], label=f"Rolling Mean ({window})")
+    plt.fill_between(df.index, df["spread_mean"] + entry_z * df["spread_std"],
+                     df["spread_mean"] - entry_z * df["spread_std"], color="grey", alpha=0.2,
+                     label=f"±{entry_z:g} Std")
+    plt.title(f"Spread und Rolling Mean - {pair1} vs {pair2} ({timeframe})")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(f"{OUT_DIR}/{pair1}_{pair2}_{timeframe}_spread.png")
+    plt.close()
+
+    plt.figure(figsize=(16, 4))
+    plt.plot(df.index, df["zscore"], label="Z-Score")
+    plt.axhline(entry_z, color="red", linestyle="--")
+    plt.axhline(-entry_z, color="red", linestyle="--")
+    plt.axhline(0, color="black", linestyle=":")
+    plt.title(f"Z-Score des Spreads - {pair1} vs {pair2} ({timeframe})")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(f"{OUT_DIR}/{pair1}_{pair2}_{timeframe}_zscore.png")
+    plt.close()
+
+def plot_pnl(result, pair1, pair2, timeframe):
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(10, 4))
+    plt.plot(np.cumsum(result["trades"]) - result["fee_paid"], label="Cumulative P&L")
+    plt.title(f"Cumulative P&L ({pair1}/{pair2}, {timeframe})")
+    plt.xlabel("Trade")
+    plt.ylabel("Profit (USDT)")
+    plt.legend()
+    plt.tight_layout()
+    plt.show()  # Zeigt Plot direkt im Codespace an, wenn möglich
 
 # ==== ADFULLER (STATIONARITÄT) ====
-from statsmodels.tsa.stattools import adfuller
-adf_result = adfuller(df["spread"].dropna())
-with open(f"user_data/analysis/{PAIR1}_{PAIR2}_{TIMEFRAME}_adf.txt", "w") as f:
-    f.write(f"ADF Statistic: {adf_result[0]}\n")
-    f.write(f"p-value: {adf_result[1]}\n")
+def adf_test(df, pair1, pair2, timeframe, write=True):
+    from statsmodels.tsa.stattools import adfuller
+    adf_result = adfuller(df["spread"].dropna())
+    if write:
+        with open(f"{OUT_DIR}/{pair1}_{pair2}_{timeframe}_adf.txt", "w") as f:
+            f.write(f"ADF Statistic: {adf_result[0]}\n")
+            f.write(f"p-value: {adf_result[1]}\n")
+    return adf_result
 
 # ==== SIMPLE MEAN REVERSION BACKTEST ====
-capital = 10000  # USDT Startkapital
-position = 0     # +1 = Long Spread, -1 = Short Spread
-entry_price = 0
-pnl = []
-trades = []
-fee_paid = 0
-in_trade = False
-
-for i in range(1, len(df)):
-    # Entry-Logik
-    if not in_trade:
-        if df["zscore"].iloc[i-1] > 2:
-            position = -1  # Short Spread
-            entry_price = df["spread"].iloc[i]
-            entry_idx = i
-            in_trade = True
-            fee_paid += capital * FEE_RATE
-        elif df["zscore"].iloc[i-1] < -2:
-            position = 1  # Long Spread
-            entry_price = df["spread"].iloc[i]
-            entry_idx = i
-            in_trade = True
-            fee_paid += capital * FEE_RATE
-    # Exit-Logik
-    elif in_trade:
-        if (position == 1 and abs(df["zscore"].iloc[i-1]) < 0.5) or \
-           (position == -1 and abs(df["zscore"].iloc[i-1]) < 0.5):
-            # Position schließen
-            profit = (df["spread"].iloc[i] - entry_price) * position
-            fee_paid += capital * FEE_RATE
-            trades.append(profit)
-            pnl.append(np.sum(trades) - fee_paid)
-            in_trade = False
-            position = 0
+def trade_signals(zscore, entry_z=ENTRY_Z, exit_z=EXIT_Z):
+    """
+    Kerzen-Indizes, an denen ein Entry bzw. Exit ausgelöst werden kann: Signal auf Basis
+    des Z-Scores der Vorkerze, ausgeführt zum Spread der aktuellen Kerze (i >= 1).
+    """
+    z = np.asarray(zscore, dtype=np.float64)[:-1]
+    with np.errstate(invalid="ignore"):
+        short = z > entry_z
+        long = z < -entry_z
+        flat = np.abs(z) < exit_z
+    entry_idx = np.flatnonzero(short | long) + 1
+    exit_idx = np.flatnonzero(flat) + 1
+    # +1 = Long Spread, -1 = Short Spread
+    side = np.where(short, -1, 1)[entry_idx - 1]
+    return entry_idx, side, exit_idx
+
+def match_trades(entry_idx, side, exit_idx):
+    """
+    Zustandsdurchlauf über die Signal-Flanken statt über jede Kerze: nach einem Entry
+    schließt der nächste Exit-Kandidat danach, der nächste Entry folgt frühestens eine
+    Kerze nach dem Exit. Kostet O(Trades * log n).
+    """
+    entries, exits, sides = [], [], []
+    k = 0
+    while k < len(entry_idx):
+        entry = entry_idx[k]
+        e = np.searchsorted(exit_idx, entry, side="right")
+        entries.append(entry)
+        sides.append(side[k])
+        if e == len(exit_idx):
+            break  # Position bleibt bis zum Ende offen
+        exits.append(exit_idx[e])
+        k = np.searchsorted(entry_idx, exit_idx[e], side="right")
+    return np.asarray(entries, dtype=np.intp), np.asarray(sides, dtype=np.int8), np.asarray(exits, dtype=np.intp)
+
+@timed('backtest.run')
+def backtest(spread, zscore, entry_z=ENTRY_Z, exit_z=EXIT_Z, fee_rate=FEE_RATE, capital=CAPITAL):
+    """
+    Mean-Reversion-Backtest auf rohen Arrays: Short Spread bei z > entry_z, Long bei
+    z < -entry_z, Exit bei |z| < exit_z. Gebühr pro Entry/Exit = capital * fee_rate.
+    """
+    spread = np.asarray(spread, dtype=np.float64)
+    entry_idx, side, exit_idx = trade_signals(zscore, entry_z, exit_z)
+    entries, sides, exits = match_trades(entry_idx, side, exit_idx)
+    n_closed = len(exits)
+    trades = (spread[exits] - spread[entries[:n_closed]]) * sides[:n_closed]
+    fee = capital * fee_rate
+    fee_paid = fee * (len(entries) + n_closed)
+    cum = np.cumsum(trades)
+    return {
+        "trades": trades,
+        "entries": entries,
+        "exits": exits,
+        "sides": sides,
+        "pnl": cum - fee * 2 * np.arange(1, n_closed + 1),
+        "fee_paid": fee_paid,
+        "final_pnl": cum[-1] - fee_paid if n_closed else -fee_paid,
+        "hit_ratio": np.mean(trades > 0) if n_closed else np.nan,
+        "max_drawdown": np.max(np.maximum.accumulate(cum) - cum) if n_closed else 0.0,
+    }
 
 # ===== REPORT =====
-if len(trades) == 0:
-    print("Keine Trades ausgeführt!")
-    exit()
-
-final_pnl = np.sum(trades) - fee_paid
-hit_ratio = np.mean(np.array(trades) > 0)
-max_drawdown = np.max(np.maximum.accumulate(np.cumsum(trades)) - np.cumsum(trades))
-
-report = (
-    f"\n===== SUMMARY: {PAIR1} / {PAIR2} ({TIMEFRAME}) =====\n"
-    f"Anzahl Trades: {len(trades)}\n"
-    f"P&L gesamt: {final_pnl:.2f} USDT\n"
-    f"Trefferquote: {hit_ratio*100:.2f}%\n"
-    f"Max Drawdown: {max_drawdown:.2f} USDT\n"
-    f"Total Fees: {fee_paid:.2f} USDT\n"
-    f"ADF-Stat: {adf_result[0]:.3f}, p-value: {adf_result[1]:.3e}\n"
-)
-
-print(report)
-
-# Trade-by-Trade-Report:
-print("\n==== Einzelne Trades (Profit pro Trade) ====")
-for i, trade in enumerate(trades):
-    print(f"Trade {i+1}: {'Gewinn' if trade>0 else 'Verlust'}: {trade:.2f} USDT")
-
-# Plot sofort anzeigen (optional, kann Terminal blockieren):
-import matplotlib.pyplot as plt
-plt.figure(figsize=(10, 4))
-plt.plot(np.cumsum(trades) - fee_paid, label="Cumulative P&L")
-plt.title(f"Cumulative P&L ({PAIR1}/{PAIR2}, {TIMEFRAME})")
-plt.xlabel("Trade")
-plt.ylabel("Profit (USDT)")
-plt.legend()
-plt.tight_layout()
-plt.show()  # Zeigt Plot direkt im Codespace an, wenn möglich
-
-
+def report(result, adf_result, pair1, pair2, timeframe):
+    trades = result["trades"]
+    text = (
+        f"\n===== SUMMARY: {pair1} / {pair2} ({timeframe}) =====\n"
+        f"Anzahl Trades: {len(trades)}\n"
+        f"P&L gesamt: {result['final_pnl']:.2f} USDT\n"
+        f"Trefferquote: {result['hit_ratio']*100:.2f}%\n"
+        f"Max Drawdown: {result['max_drawdown']:.2f} USDT\n"
+        f"Total Fees: {result['fee_paid']:.2f} USDT\n"
+        f"ADF-Stat: {adf_result[0]:.3f}, p-value: {adf_result[1]:.3e}\n"
+    )
+    print(text)
+
+    # Trade-by-Trade-Report:
+    print("\n==== Einzelne Trades (Profit pro Trade) ====")
+    for i, trade in enumerate(trades):
+        print(f"Trade {i+1}: {'Gewinn' if trade>0 else 'Verlust'}: {trade:.2f} USDT")
+
+def run(pair1=PAIR1, pair2=PAIR2, timeframe=TIMEFRAME, window=WINDOW, entry_z=ENTRY_Z, exit_z=EXIT_Z,
+        fee_rate=FEE_RATE, plot=True, hedge=HEDGE, hedge_window=HEDGE_WINDOW):
+    df = load_pair(pair1, pair2, timeframe)
+    add_spread(df, pair1, pair2, window, hedge, hedge_window)
+    if plot:
+        plot_spread(df, pair1, pair2, timeframe, window, entry_z)
+    adf_result = adf_test(df, pair1, pair2, timeframe)
+    result = backtest(df["spread"].to_numpy(), df["zscore"].to_numpy(), entry_z, exit_z, fee_rate)
+    if len(result["trades"]) == 0:
+        print("Keine Trades ausgeführt!")
+        return result
+    report(result, adf_result, pair1, pair2, timeframe)
+    if plot:
+        plot_pnl(result, pair1, pair2, timeframe)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spread-Mean-Reversion-Backtest für ein Paar")
+    parser.add_argument("--pair1", default=PAIR1)
+    parser.add_argument("--pair2", default=PAIR2)
+    parser.add_argument("--timeframe", default=TIMEFRAME)
+    parser.add_argument("--window", type=int, default=WINDOW)
+    parser.add_argument("--entry-z", type=float, default=ENTRY_Z)
+    parser.add_argument("--exit-z", type=float, default=EXIT_Z)
+    parser.add_argument("--fee", type=float, default=FEE_RATE)
+    parser.add_argument("--hedge", choices=["static", "rolling", "ewm"], default=HEDGE,
+                        help="Hedge-Ratio: statisch (OLS über alles) oder rollierend/EW ohne Look-Ahead")
+    parser.add_argument("--hedge-window", type=int, default=HEDGE_WINDOW)
+    parser.add_argument("--no-plot", action="store_true", help="Keine Plots erzeugen/anzeigen")
+    args = parser.parse_args(argv)
+    run(args.pair1, args.pair2, args.timeframe, args.window, args.entry_z, args.exit_z, args.fee,
+        plot=not args.no_plot, hedge=args.hedge, hedge_window=args.hedge_window)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# user_data/analysis/spread_sweep.py
+"""
+Parameter-Sweep für den Spread-Mean-Reversion-Backtest.
+
+Daten werden einmal geladen und ausgerichtet, der Spread einmal berechnet. Rolling
+Mean/Std für alle Fenster kommen aus kumulativen Summen (O(n) pro Fenster statt
+pandas.rolling), und die (window, entry_z, exit_z, fee)-Kombinationen laufen über
+einen Prozess-Pool. Keine Plots.
+
+Beispiel:
+    python user_data/analysis/spread_sweep.py --pair1 ETHUSDT --pair2 ETHDAI \
+        --windows 50:300:25 --entry 1.5:3:0.25 --exit 0:1:0.25 --fees 0.001,0.0005 --workers 8
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from instrument import collect, merge, timed
+from online_spread import cumulative_sums, rolling_zscore
+from spread_mean_reversion_backtest import (
+    CAPITAL, FEE_RATE, PAIR1, PAIR2, TIMEFRAME, backtest, load_pair,
+)
+
+RANK_BY = 'final_pnl'
+
+
+def parse_grid(text, cast=float):
+    """'50,100,200' oder 'start:stop:step' (stop inklusive)."""
+    if ':' in text:
+        start, stop, step = (float(x) for x in text.split(':'))
+        values = np.arange(start, stop + step / 2, step)
+        return [cast(round(v, 10)) for v in values]
+    return [cast(x) for x in text.split(',') if x]
+
+
+def hedge_spread(df, pair1, pair2):
+    """Spread mit statischem OLS-Hedge-Ratio (wie add_spread im Backtest, ohne statsmodels-Overhead)."""
+    y = df[pair1].to_numpy(dtype=np.float64)
+    x = df[pair2].to_numpy(dtype=np.float64)
+    xc = x - x.mean()
+    hedge_ratio = np.dot(xc, y - y.mean()) / np.dot(xc, xc)
+    return y - hedge_ratio * x, hedge_ratio
+
+
+_sweep_state = {}
+
+
+def _init_sweep(spread):
+    centered, cs, cs2 = cumulative_sums(spread)
+    _sweep_state.update(spread=spread, centered=centered, cs=cs, cs2=cs2)
+
+
+@timed('sweep.window')
+def _evaluate_window(window, entry_zs, exit_zs, fees, capital):
+    st = _sweep_state
+    z = rolling_zscore(st['centered'], st['cs'], st['cs2'], window)
+    rows = []
+    for entry_z in entry_zs:
+        for exit_z in exit_zs:
+            # Gebühren ändern die Trades nicht -> einmal ohne Gebühr rechnen, dann je Fee verrechnen
+            res = backtest(st['spread'], z, entry_z, exit_z, fee_rate=0.0, capital=capital)
+            gross = res['trades'].sum()
+            fills = len(res['entries']) + len(res['exits'])
+            for fee in fees:
+                fee_paid = capital * fee * fills
+                rows.append((window, entry_z, exit_z, fee, len(res['trades']), gross - fee_paid,
+                             res['hit_ratio'], res['max_drawdown'], fee_paid))
+    return rows
+
+
+def sweep(spread, windows, entry_zs, exit_zs, fees=(FEE_RATE,), capital=CAPITAL, workers=1):
+    """Bewertet alle Kombinationen und liefert ein nach RANK_BY sortiertes DataFrame."""
+    spread = np.asarray(spread, dtype=np.float64)
+    args = (entry_zs, exit_zs, fees, capital)
+    rows = []
+    with tqdm(total=len(windows), desc="Sweep (Fenster)") as bar:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep, initargs=(spread,)) as pool:
+                calls = [_evaluate_window] * len(windows)
+                for out, stages in pool.map(collect, calls, windows, *([a] * len(windows) for a in args)):
+                    merge(stages)
+                    rows.extend(out)
+                    bar.update(1)
+        else:
+            _init_sweep(spread)
+            for window in windows:
+                rows.extend(_evaluate_window(window, *args))
+                bar.update(1)
+    columns = ['window', 'entry_z', 'exit_z', 'fee_rate', 'trades', 'final_pnl', 'hit_ratio',
+               'max_drawdown', 'fee_paid']
+    result = pd.DataFrame(rows, columns=columns)
+    return result.sort_values(RANK_BY, ascending=False, kind='stable').reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parameter-Sweep für den Spread-Backtest")
+    parser.add_argument('--pair1', default=PAIR1)
+    parser.add_argument('--pair2', default=PAIR2)
+    parser.add_argument('--timeframe', default=TIMEFRAME)
+    parser.add_argument('--windows', default='50:300:10', help="Liste '50,100' oder Bereich 'start:stop:step'")
+    parser.add_argument('--entry', default='1.5:3:0.25')
+    parser.add_argument('--exit', default='0:1:0.1')
+    parser.add_argument('--fees', default=str(FEE_RATE))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--out', default=None, help="Ergebnis-CSV (Default: sweep_{pair1}_{pair2}_{tf}.csv)")
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    df = load_pair(args.pair1, args.pair2, args.timeframe)
+    spread, hedge_ratio = hedge_spread(df, args.pair1, args.pair2)
+    windows = parse_grid(args.windows, int)
+    entry_zs, exit_zs, fees = parse_grid(args.entry), parse_grid(args.exit), parse_grid(args.fees)
+    n = len(windows) * len(entry_zs) * len(exit_zs) * len(fees)
+    print(f"{args.pair1}/{args.pair2} ({args.timeframe}): {len(df)} Kerzen, Hedge-Ratio {hedge_ratio:.4f}, "
+          f"{n} Kombinationen")
+
+    result = sweep(spread, windows, entry_zs, exit_zs, fees, workers=args.workers)
+    out = args.out or f"sweep_{args.pair1}_{args.pair2}_{args.timeframe}.csv"
+    result.to_csv(out, index=False)
+    print(result.head(args.top).to_string(index=False))
+    print(f"Ergebnis gespeichert in: {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+# user_data/analysis/tiled_screen.py
+"""
+Speicherbegrenzter Scan-Modus für sehr große Symbolmengen (--tiled).
+
+Statt der float64-Matrix im Speicher arbeitet das Vorsieben auf den zentrierten Log-Preisen
+als float32 (price_panel.load_log_values, memmapped). Der Paarraum wird in Symbolblöcke
+zerlegt; je Kachel (Block i x Block j, j >= i) werden die Summen der paarweisen Korrelation
+(n, Sx, Sy, Sxx, Syy, Sxy) als GEMMs über Zeilenblöcke akkumuliert, in float32 gerechnet und
+in float64 aufsummiert. So viele Kacheln wie in das Speicherlimit passen teilen sich einen
+Durchlauf über die Datei. Die Stufen support/corr/ret_corr/top_k entsprechen screen_pairs;
+Halbwertszeit, Hurst und der ADF-Test laufen danach unverändert in float64 auf dem memmapped
+Panel (die p-Werte hängen also nicht von float32 ab), in Paar-Blöcken passend zum Limit.
+
+    python user_data/analysis/find_stationary_pairs_local.py --tiled --max-memory-mb 2048 --min-corr 0.8
+"""
+
+import numpy as np
+import pandas as pd
+
+from coint_scan import CHUNK_SIZE, default_maxlag
+from instrument import timed
+from pair_screen import screen_pairs
+from price_panel import load_log_values
+
+MAX_MEMORY_MB = 1024
+TILE_SYMBOLS = 256
+SUMS = 6             # n, Sx, Sy, Sxx, Syy, Sxy je Kachel
+MAX_CHUNK_ROWS = 1 << 16  # float32-Summen über höchstens so viele Zeilen, danach float64
+
+
+# ==== SPEICHERBUDGET ====
+def tile_passes(n_blocks, tile, budget, kinds=1):
+    """Kacheln (bi, bj) mit bj >= bi, zu Durchläufen gruppiert, deren Akkumulatoren in budget passen."""
+    per_pass = max(1, budget // (SUMS * kinds * tile * tile * 8))
+    tiles = [(bi, bj) for bi in range(n_blocks) for bj in range(bi, n_blocks)]
+    return [tiles[start:start + per_pass] for start in range(0, len(tiles), per_pass)]
+
+
+def chunk_rows(n_columns, budget, kinds=1):
+    """Zeilen je Block, sodass Rohdaten, Maske, x und x² aller Spalten eines Durchlaufs in budget passen."""
+    return int(min(MAX_CHUNK_ROWS, max(1, budget // max(n_columns * 4 * 5 * kinds, 1))))
+
+
+def adf_chunk_size(n_rows, max_bytes, maxlag=None):
+    """Paare je ADF-Batch, sodass die gestapelten Designmatrizen (mit QR) in max_bytes passen."""
+    maxlag = default_maxlag(n_rows) if maxlag is None else maxlag
+    per_pair = n_rows * (2 * (max(maxlag, 0) + 2) + 6) * 8
+    return int(min(CHUNK_SIZE, max(1, max_bytes // max(per_pair, 1))))
+
+
+def spread_chunk_size(n_rows, max_bytes):
+    """Paare je Block für Halbwertszeit/Hurst (y, x, Spread und Lag-Differenzen)."""
+    return int(max(1, max_bytes // max(n_rows * 8 * 6, 1)))
+
+
+# ==== KACHELN ====
+def _read(logs, start, stop, cols, returns):
+    """Zeilenblock der Spalten cols; returns=True liefert die Log-Returns der Zeilen start..stop-1."""
+    lo = max(start - 1, 0) if returns else start
+    block = np.asarray(logs[lo:stop, cols])
+    return np.diff(block, axis=0) if returns else block
+
+
+def _accumulate(acc, block, spans):
+    """Addiert die GEMM-Summen eines Zeilenblocks auf die Akkumulatoren der Kacheln."""
+    m = np.isfinite(block)
+    x = np.where(m, block, 0.0).astype(np.float32)
+    m = m.astype(np.float32)
+    xx = x * x
+    for (bi, bj), sums in acc.items():
+        a, b = spans[bi], spans[bj]
+        sums[0] += m[:, a].T @ m[:, b]
+        sums[1] += x[:, a].T @ m[:, b]
+        sums[2] += m[:, a].T @ x[:, b]
+        sums[3] += xx[:, a].T @ m[:, b]
+        sums[4] += m[:, a].T @ xx[:, b]
+        sums[5] += x[:, a].T @ x[:, b]
+
+
+def _correlation(sums):
+    """(Korrelation, n) einer Kachel auf der paarweise gemeinsamen Stützmenge."""
+    n, sx, sy, sxx, syy, sxy = sums
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        return cov / np.sqrt(var_x * var_y), n
+
+
+@timed('scan.tiles')
+def tile_correlations(logs, cols, tile=TILE_SYMBOLS, max_bytes=MAX_MEMORY_MB * 2 ** 20, returns=False):
+    """
+    Erzeugt je Kachel (a, b, level, n[, ret_corr]): lokale Spaltenpositionen a < b in cols,
+    Korrelation der Log-Preise und gemeinsame Stützmenge (bei returns=True zusätzlich die
+    Korrelation der Log-Returns). Die Hälfte von max_bytes geht an die Akkumulatoren.
+    """
+    cols = np.asarray(cols, dtype=np.intp)
+    starts = list(range(0, len(cols), tile))
+    kinds = 2 if returns else 1
+    for tiles in tile_passes(len(starts), tile, max_bytes // 2, kinds):
+        blocks = sorted({b for t in tiles for b in t})
+        spans, offset = {}, 0
+        for b in blocks:
+            width = min(tile, len(cols) - starts[b])
+            spans[b] = slice(offset, offset + width)
+            offset += width
+        pass_cols = np.concatenate([cols[starts[b]:starts[b] + tile] for b in blocks])
+        accs = [{t: np.zeros((SUMS, spans[t[0]].stop - spans[t[0]].start, spans[t[1]].stop - spans[t[1]].start))
+                 for t in tiles} for _ in range(kinds)]
+        rows = chunk_rows(len(pass_cols), max_bytes // 2, kinds)
+        for start in range(0, len(logs), rows):
+            stop = min(start + rows, len(logs))
+            for k, acc in enumerate(accs):
+                block = _read(logs, start, stop, pass_cols, returns=k == 1)
+                if len(block):
+                    _accumulate(acc, block, spans)
+        for bi, bj in tiles:
+            corr, n = _correlation(accs[0][bi, bj])
+            a, b = np.meshgrid(np.arange(starts[bi], starts[bi] + corr.shape[0]),
+                               np.arange(starts[bj], starts[bj] + corr.shape[1]), indexing='ij')
+            upper = a < b
+            out = [a[upper], b[upper], np.abs(corr[upper]), n[upper]]
+            if returns:
+                out.append(_correlation(accs[1][bi, bj])[0][upper])
+            yield tuple(out)
+
+
+# ==== PIPELINE ====
+@timed('scan.screen_tiled')
+def screen_tiled(logs, cols, min_length=0, min_corr=None, min_return_corr=None, top_k=None,
+                 tile=TILE_SYMBOLS, max_bytes=MAX_MEMORY_MB * 2 ** 20):
+    """
+    Stufen support/corr/ret_corr/top_k wie pair_screen.screen_pairs, kachelweise auf den
+    float32-Log-Preisen logs (Zeit x Spalte). Rückgabe: (pairs, report) mit pairs als
+    Spaltenindizes von logs in Paar-Reihenfolge der Reihenfolge von cols.
+    """
+    cols = np.asarray(cols, dtype=np.intp)
+    stages = [name for name, on in (('support', bool(min_length)), ('corr', min_corr is not None),
+                                    ('ret_corr', min_return_corr is not None)) if on]
+    removed = dict.fromkeys(stages, 0)
+    found = []
+    kept = 0
+    for tile_out in tile_correlations(logs, cols, tile, max_bytes, returns=min_return_corr is not None):
+        a, b, level, n = tile_out[:4]
+        ok = np.ones(len(a), dtype=bool)
+        for stage in stages:
+            if stage == 'support':
+                drop = ok & (n < min_length)
+            elif stage == 'corr':
+                drop = ok & ~(level >= min_corr)
+            else:
+                drop = ok & ~(tile_out[4] >= min_return_corr)
+            removed[stage] += int(np.count_nonzero(drop))
+            ok &= ~drop
+        found.append((a[ok], b[ok], level[ok]))
+        kept += int(np.count_nonzero(ok))
+        if top_k is not None and kept > 2 * top_k:
+            # Zwischendurch kürzen; Gleichstände an der Grenze bleiben für die stabile Auswahl
+            a, b, level = (np.concatenate(parts) for parts in zip(*found))
+            limit = np.partition(np.nan_to_num(level, nan=-1.0), -top_k)[-top_k]
+            ok = np.nan_to_num(level, nan=-1.0) >= limit
+            found, kept = [(a[ok], b[ok], level[ok])], int(np.count_nonzero(ok))
+
+    total = len(cols) * (len(cols) - 1) // 2
+    report = []
+    for stage in stages:
+        report.append((stage, total, removed[stage], total - removed[stage]))
+        total -= removed[stage]
+    if found:
+        a, b, level = (np.concatenate(parts) for parts in zip(*found))
+    else:
+        a = b = np.empty(0, dtype=np.intp)
+        level = np.empty(0)
+    order = np.lexsort((b, a))
+    a, b, level = a[order], b[order], level[order]
+    if top_k is not None and total > top_k:
+        ok = np.zeros(len(a), dtype=bool)
+        ok[np.argsort(-np.nan_to_num(level, nan=-1.0), kind='stable')[:top_k]] = True
+        report.append(('top_k', total, total - top_k, top_k))
+        a, b = a[ok], b[ok]
+    pairs = np.column_stack([cols[a], cols[b]]).astype(np.intp).reshape(-1, 2)
+    return pairs, pd.DataFrame(report, columns=['stage', 'vorher', 'entfernt', 'nachher'])
+
+
+def screen_panel(data_dir, timeframe, panel, cols, min_length=0, min_corr=None, min_return_corr=None, top_k=None,
+                 max_half_life=None, max_hurst=None, tile=TILE_SYMBOLS, max_bytes=MAX_MEMORY_MB * 2 ** 20):
+    """
+    Vorsieben auf einem gecachten Panel (load_panel(low_memory=True)) im Kachel-Modus;
+    Halbwertszeit/Hurst danach über screen_pairs in float64. Paare als Spaltenindizes des Panels.
+    """
+    logs = load_log_values(data_dir, timeframe, panel)
+    pairs, report = screen_tiled(logs, cols, min_length, min_corr, min_return_corr, top_k, tile, max_bytes)
+    if max_half_life is not None or max_hurst is not None:
+        pairs, spread_report = screen_pairs(panel.values, panel.symbols, valid=panel.valid, pairs=pairs,
+                                            max_half_life=max_half_life, max_hurst=max_hurst,
+                                            chunk_size=spread_chunk_size(len(panel), max_bytes))
+        report = pd.concat([report, spread_report], ignore_index=True)
+    return pairs, report
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("Speicherbegrenzter Scan")
+    group.add_argument('--tiled', action='store_true',
+                       help="float32-Log-Panel (memmapped) kachelweise vorsieben, ADF in float64")
+    group.add_argument('--max-memory-mb', type=int, default=MAX_MEMORY_MB,
+                       help="Speicherlimit für Kacheln, Zeilenblöcke und ADF-Batches")
+    group.add_argument('--tile-symbols', type=int, default=TILE_SYMBOLS, help="Symbole je Kachelblock")
+
+
+def options(args):
+    """screen_panel-Parameter aus den mit add_arguments angelegten Optionen."""
+    return {'tile': args.tile_symbols, 'max_bytes': args.max_memory_mb * 2 ** 20}
@@ -1,69 +1,266 @@
+# user_data/analysis/volume_feature_analysis.py
+"""
+Vorhersagekraft der Volumen-Features (volume, obv, cvd, ...) für zukünftige Preisänderungen,
+für alle Paare und beliebige Horizonte in einem Lauf, ohne Fenster (headless).
+
+Je Paar x Feature x Horizont:
+  corr / corr_delta     Korrelation von Feature-Niveau bzw. -Änderung mit dem Forward-Return
+  threshold             sigma * Std der Feature-Änderung (Spike-Schwelle, Default 2σ)
+  spike_*               Forward-Returns in den Kerzen mit |Änderung| > threshold
+                        (Anzahl, Mittel, Std, Median, Trefferquote > 0, Mittel in Spike-Richtung)
+  base_mean, t_stat     Mittel aller Kerzen und t-Wert der Abweichung der Spike-Kerzen davon
+
+Paare werden blockweise zu NaN-aufgefüllten (Paare x Kerzen)-Matrizen gestapelt; die
+Forward-Returns aller Horizonte kommen aus einer Strided-Sicht auf die Close-Matrix.
+
+    python user_data/analysis/volume_feature_analysis.py --out feature_ranking.csv
+    python user_data/analysis/volume_feature_analysis.py --pairs BTC/USDT,ETH/USDT --horizons 1,3,6,12,24 \\
+        --plots plots/ --plot-pairs BTC/USDT
+    python user_data/analysis/volume_feature_analysis.py --csv user_data/data/volume_features_BTC_USDT.csv
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# --- 1. CSV einlesen ---
-df = pd.read_csv("user_data/data/volume_features_BTC_USDT.csv", index_col=0)
-
-# --- 2. Zielvariablen berechnen: zukünftige Preisänderungen ---
-df['future_close_1'] = df['close'].shift(-1)
-df['future_close_6'] = df['close'].shift(-6)     # ~30min bei 5m-Candles
-df['future_close_12'] = df['close'].shift(-12)   # ~1h
-
-df['target_1'] = (df['future_close_1'] - df['close']) / df['close']
-df['target_6'] = (df['future_close_6'] - df['close']) / df['close']
-df['target_12'] = (df['future_close_12'] - df['close']) / df['close']
-
-# --- 3. Korrelationen berechnen ---
-features = ['volume', 'obv', 'cvd']
-targets = ['target_1', 'target_6', 'target_12']
-
-print("\nKorrelationen der Volumen-Features mit zukünftigen Preisänderungen:")
-corr = df[features + targets].corr()
-print(corr.loc[features, targets])
-
-# --- 4. Feature-Signale plotten und untersuchen ---
-plt.figure(figsize=(15, 8))
-ax1 = plt.subplot(311)
-ax1.plot(df['close'], label='Price', color='black')
-ax1.set_ylabel("Price")
-ax1.legend()
-ax2 = plt.subplot(312, sharex=ax1)
-ax2.plot(df['cvd'], label='CVD', color='blue')
-ax2.set_ylabel("CVD")
-ax2.legend()
-ax3 = plt.subplot(313, sharex=ax1)
-ax3.plot(df['obv'], label='OBV', color='green')
-ax3.set_ylabel("OBV")
-ax3.legend()
-plt.suptitle("BTC/USDT: Preis, CVD, OBV")
-plt.show()
-
-# --- 5. Signal-Engineering: Beispiele für Volumen-Crosses ---
-# (Wo ändert sich cvd/obv stark? Folgt der Kurs?)
-
-df['cvd_delta'] = df['cvd'].diff()
-df['obv_delta'] = df['obv'].diff()
-
-# Schwellenwerte testen: Wenn cvd_delta oder obv_delta besonders hoch, wie verhält sich target_6?
-threshold_cvd = df['cvd_delta'].std() * 2
-threshold_obv = df['obv_delta'].std() * 2
-
-signal_cvd = df[abs(df['cvd_delta']) > threshold_cvd]
-signal_obv = df[abs(df['obv_delta']) > threshold_obv]
-
-print("\nWenn CVD starken Schub bekommt (>|%.2f|):" % threshold_cvd)
-print(signal_cvd['target_6'].describe())
-
-print("\nWenn OBV starken Schub bekommt (>|%.2f|):" % threshold_obv)
-print(signal_obv['target_6'].describe())
-
-# Visualisierung: Histogramm der target_6 bei CVD/OBV-Schüben
-plt.figure(figsize=(12,6))
-sns.histplot(signal_cvd['target_6'], bins=40, color='blue', label='CVD Spike', kde=True)
-sns.histplot(signal_obv['target_6'], bins=40, color='green', label='OBV Spike', kde=True)
-plt.axvline(0, color='black', linestyle='--')
-plt.legend()
-plt.title("Future Returns bei Volumen-Spikes")
-plt.xlabel("6x5min-Future-Return (ca. 30min)")
-plt.show()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'strategies'))
+import feature_sink  # noqa: E402
+
+FEATURE_DIR = 'user_data/data/volume_features'
+FEATURES = ('volume', 'obv', 'cvd')
+HORIZONS = (1, 6, 12)  # Kerzen; bei 5m: 5min, ~30min, ~1h
+SIGMA = 2.0
+PAIR_CHUNK = 64  # Paare je Matrix-Block (begrenzt den Speicher)
+
+RESULT_COLUMNS = ['pair', 'feature', 'horizon', 'n', 'corr', 'corr_delta', 'threshold', 'spike_n',
+                  'spike_mean', 'spike_std', 'spike_median', 'spike_hit', 'spike_signed_mean',
+                  'base_mean', 't_stat']
+
+
+# ==== LADEN ====
+def list_pairs(root):
+    """Alle Paare mit Feature-Export unter root (Verzeichnisname wie in feature_sink.pair_dir)."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root) if os.path.exists(os.path.join(root, d, 'timestamp.bin')))
+
+
+def load_csv(path):
+    """Feature-Datei im alten CSV-Format (erste Spalte = Index)."""
+    return pd.read_csv(path, index_col=0)
+
+
+def stack_padded(arrays, length=None):
+    """Liste 1-D-Arrays -> (Anzahl x length)-Matrix, am Ende mit NaN aufgefüllt."""
+    length = max((len(a) for a in arrays), default=0) if length is None else length
+    out = np.full((len(arrays), length), np.nan)
+    for k, a in enumerate(arrays):
+        out[k, :len(a)] = a
+    return out
+
+
+# ==== KENNZAHLEN ====
+def forward_returns(close, horizons):
+    """(Paare x Kerzen x Horizonte): close[t+h] / close[t] - 1, NaN wo t+h fehlt."""
+    horizons = np.asarray(horizons, dtype=np.intp)
+    padded = np.concatenate([close, np.full((len(close), horizons.max()), np.nan)], axis=1)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, horizons.max() + 1, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return windows[:, :, horizons] / close[:, :, None] - 1
+
+
+def nan_corr(a, b):
+    """Pearson-Korrelation je Zeile über die Kerzen, in denen beide Werte endlich sind."""
+    mask = np.isfinite(a) & np.isfinite(b)
+    n = mask.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(mask, a, 0.0)
+        b = np.where(mask, b, 0.0)
+        a = np.where(mask, a - (a.sum(axis=-1) / n)[..., None], 0.0)
+        b = np.where(mask, b - (b.sum(axis=-1) / n)[..., None], 0.0)
+        return (a * b).sum(axis=-1) / np.sqrt((a * a).sum(axis=-1) * (b * b).sum(axis=-1)), n
+
+
+def nan_mean_std(values):
+    """Mittel und Std (ddof=1) je Zeile über die endlichen Werte (ohne Warnungen bei leeren Zeilen)."""
+    mask = np.isfinite(values)
+    n = mask.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(mask, values, 0.0).sum(axis=-1) / n
+        var = np.where(mask, (values - mean[..., None]) ** 2, 0.0).sum(axis=-1) / (n - 1)
+    return mean, np.sqrt(var)
+
+
+def masked_stats(values, mask):
+    """Anzahl, Mittel, Std (ddof=1), Median und Anteil > 0 je Zeile über die Kerzen mit mask."""
+    mask = mask & np.isfinite(values)
+    n = mask.sum(axis=-1)
+    x = np.where(mask, values, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(mask, values, 0.0).sum(axis=-1) / n
+        var = np.where(mask, (values - mean[..., None]) ** 2, 0.0).sum(axis=-1) / (n - 1)
+        hit = (mask & (values > 0)).sum(axis=-1) / n
+    median = np.full(len(x), np.nan)
+    rows = n > 0
+    median[rows] = np.nanmedian(x[rows], axis=-1)
+    return n, mean, np.sqrt(var), median, hit
+
+
+def analyze_block(pairs, frames, features, horizons, sigma=SIGMA):
+    """Ergebnis-Zeilen für einen Block Paare (dict pair -> DataFrame mit close + Features)."""
+    close = stack_padded([frames[p]['close'].to_numpy(dtype=np.float64) for p in pairs])
+    targets = forward_returns(close, horizons)
+    base = [nan_mean_std(targets[:, :, h])[0] for h in range(len(horizons))]
+    out = []
+    for feature in features:
+        level = stack_padded([frames[p][feature].to_numpy(dtype=np.float64) if feature in frames[p]
+                              else np.full(len(frames[p]), np.nan) for p in pairs], close.shape[1])
+        delta = np.full_like(level, np.nan)
+        delta[:, 1:] = np.diff(level, axis=1)
+        threshold = sigma * nan_mean_std(delta)[1]
+        with np.errstate(invalid='ignore'):
+            spike = np.abs(delta) > threshold[:, None]
+        direction = np.sign(delta)
+        for h, horizon in enumerate(horizons):
+            target = targets[:, :, h]
+            corr, n = nan_corr(level, target)
+            corr_delta, _ = nan_corr(delta, target)
+            spike_n, spike_mean, spike_std, spike_median, spike_hit = masked_stats(target, spike)
+            _, signed_mean, _, _, _ = masked_stats(target * direction, spike)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_stat = (spike_mean - base[h]) / (spike_std / np.sqrt(spike_n))
+            out.append(pd.DataFrame({
+                'pair': pairs, 'feature': feature, 'horizon': horizon, 'n': n, 'corr': corr,
+                'corr_delta': corr_delta, 'threshold': threshold, 'spike_n': spike_n,
+                'spike_mean': spike_mean, 'spike_std': spike_std, 'spike_median': spike_median,
+                'spike_hit': spike_hit, 'spike_signed_mean': signed_mean, 'base_mean': base[h],
+                't_stat': t_stat,
+            }))
+    return out
+
+
+def analyze(frames, features=FEATURES, horizons=HORIZONS, sigma=SIGMA, chunk=PAIR_CHUNK):
+    """
+    frames: {pair: DataFrame} oder Iterator von (pair, DataFrame); je Block werden nur
+    PAIR_CHUNK Paare gleichzeitig im Speicher gehalten. Rückgabe: eine Ergebnistabelle.
+    """
+    items = frames.items() if isinstance(frames, dict) else frames
+    parts, block = [], {}
+    for pair, df in items:
+        if df is None or not len(df):
+            continue
+        block[pair] = df
+        if len(block) >= chunk:
+            parts += analyze_block(list(block), block, features, horizons, sigma)
+            block = {}
+    if block:
+        parts += analyze_block(list(block), block, features, horizons, sigma)
+    if not parts:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    result = pd.concat(parts, ignore_index=True)
+    return result.sort_values(['pair', 'feature', 'horizon'], kind='stable').reset_index(drop=True)
+
+
+def ranking(result):
+    """Feature x Horizont über alle Paare: mittlere |Korrelation|, Median t-Wert, Anteil |t| > 2."""
+    grouped = result.assign(abs_corr=result['corr'].abs(), abs_corr_delta=result['corr_delta'].abs(),
+                            significant=result['t_stat'].abs() > 2).groupby(['feature', 'horizon'])
+    return grouped.agg(pairs=('pair', 'nunique'), mean_abs_corr=('abs_corr', 'mean'),
+                       mean_abs_corr_delta=('abs_corr_delta', 'mean'), median_t=('t_stat', 'median'),
+                       share_significant=('significant', 'mean'), spikes=('spike_n', 'sum')) \
+        .sort_values('mean_abs_corr_delta', ascending=False)
+
+
+# ==== PLOTS (optional, nur in Dateien) ====
+def write_plots(plot_dir, result, frames, horizon, sigma=SIGMA):
+    """Heatmap der Rangliste plus Preis/CVD/OBV- und Spike-Histogramm je übergebenem Paar."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    os.makedirs(plot_dir, exist_ok=True)
+    table = result.assign(abs_corr_delta=result['corr_delta'].abs()) \
+        .pivot_table(index='feature', columns='horizon', values='abs_corr_delta', aggfunc='mean')
+    fig, ax = plt.subplots(figsize=(8, 4))
+    image = ax.imshow(table.to_numpy(), aspect='auto', cmap='viridis')
+    ax.set_xticks(range(len(table.columns)), labels=table.columns)
+    ax.set_yticks(range(len(table.index)), labels=table.index)
+    ax.set_xlabel("Horizont (Kerzen)")
+    fig.colorbar(image, label="mittlere |Korrelation| der Feature-Änderung")
+    fig.savefig(os.path.join(plot_dir, 'ranking.png'), dpi=120, bbox_inches='tight')
+    plt.close(fig)
+
+    for pair, df in frames.items():
+        name = pair.replace('/', '_').replace(':', '_')
+        fig, axes = plt.subplots(3, 1, sharex=True, figsize=(15, 8))
+        for ax, col, color in zip(axes, ('close', 'cvd', 'obv'), ('black', 'blue', 'green')):
+            if col in df:
+                ax.plot(df[col], label=col.upper(), color=color)
+            ax.legend()
+        fig.suptitle(f"{pair}: Preis, CVD, OBV")
+        fig.savefig(os.path.join(plot_dir, f"{name}_features.png"), dpi=100, bbox_inches='tight')
+        plt.close(fig)
+
+        target = df['close'].shift(-horizon) / df['close'] - 1
+        fig, ax = plt.subplots(figsize=(12, 6))
+        for col, color in (('cvd', 'blue'), ('obv', 'green')):
+            if col in df:
+                delta = df[col].diff()
+                ax.hist(target[delta.abs() > delta.std() * sigma].dropna(), bins=40, alpha=0.5,
+                        color=color, label=f"{col.upper()} Spike")
+        ax.axvline(0, color='black', linestyle='--')
+        ax.legend()
+        ax.set_title(f"{pair}: Future Returns bei Volumen-Spikes")
+        ax.set_xlabel(f"{horizon}-Kerzen-Future-Return")
+        fig.savefig(os.path.join(plot_dir, f"{name}_spikes.png"), dpi=100, bbox_inches='tight')
+        plt.close(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vorhersagekraft der Volumen-Features über alle Paare")
+    parser.add_argument('--root', default=FEATURE_DIR, help="Verzeichnis des Feature-Exports (feature_sink)")
+    parser.add_argument('--pairs', default=None, help="Kommagetrennt, Default: alle Paare unter --root")
+    parser.add_argument('--csv', action='append', default=[], help="Feature-CSV im alten Format (mehrfach)")
+    parser.add_argument('--features', default=','.join(FEATURES))
+    parser.add_argument('--horizons', default=','.join(map(str, HORIZONS)), help="Kerzen, kommagetrennt")
+    parser.add_argument('--sigma', type=float, default=SIGMA, help="Spike-Schwelle in Std der Feature-Änderung")
+    parser.add_argument('--out', default='volume_feature_results.csv', help="Ergebnistabelle (CSV)")
+    parser.add_argument('--plots', default=None, help="Verzeichnis für PNG-Plots (Default: keine Plots)")
+    parser.add_argument('--plot-pairs', default=None, help="Paare mit Einzelplots, kommagetrennt")
+    args = parser.parse_args(argv)
+
+    features = [f for f in args.features.split(',') if f]
+    horizons = [int(h) for h in args.horizons.split(',') if h]
+    if args.pairs:
+        pairs = [p for p in args.pairs.split(',') if p]
+    else:
+        pairs = [] if args.csv else list_pairs(args.root)
+
+    def frames():
+        for path in args.csv:
+            yield os.path.splitext(os.path.basename(path))[0], load_csv(path)
+        for pair in pairs:
+            yield pair, feature_sink.read_features(args.root, pair)
+
+    result = analyze(frames(), features, horizons, args.sigma)
+    if result.empty:
+        print("Keine Feature-Daten gefunden.")
+        return
+    result.to_csv(args.out, index=False)
+    print(f"{result['pair'].nunique()} Paare x {len(features)} Features x {len(horizons)} Horizonte "
+          f"-> {args.out}")
+    print(ranking(result).to_string(float_format=lambda x: f"{x:.4f}"))
+
+    if args.plots:
+        plot_pairs = [p for p in (args.plot_pairs or '').split(',') if p]
+        selected = {p: feature_sink.read_features(args.root, p) for p in plot_pairs}
+        write_plots(args.plots, result, {p: df for p, df in selected.items() if df is not None},
+                    horizons[len(horizons) // 2], args.sigma)
+        print(f"Plots gespeichert in: {args.plots}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
 from freqtrade.strategy import IStrategy
 import pandas as pd
 
-class SimpleMarketMaker(IStrategy):
+import indicator_kernels as kernels
+from batch_signals import BatchSignalMixin
+from incremental_indicators import RollingMean
+
+class SimpleMarketMaker(BatchSignalMixin, IStrategy):
     """
     Einfache Market Maker/Grid-Strategie für Krypto: platziert Buy/Sell auf Grid-Levels um den aktuellen Preis.
     Nimmt kleine Gewinne mit, minimiert Drawdown durch Stoploss. Kein echtes Inventory-Management!
@@ -17,25 +21,29 @@ class SimpleMarketMaker(IStrategy):
     grid_pct = 0.003  # 0.3% Abstand um den aktuellen Preis
     max_open_trades = 3
 
-    def populate_indicators(self, dataframe: pd.DataFrame, metadata: dict) -> pd.DataFrame:
+    def indicator_specs(self):
         # Mittlerer Preis als MA20
-        dataframe['midprice'] = dataframe['close'].rolling(window=20).mean()
-        return dataframe
+        return {'midprice': RollingMean('close', 20)}
 
-    def populate_buy_trend(self, dataframe: pd.DataFrame, metadata: dict) -> pd.DataFrame:
+    def buy_signal(self, c, out):
         # Buy-Signal: Kurs unterhalb von midprice - grid_pct
-        grid_level = dataframe['midprice'] * (1 - self.grid_pct)
-        dataframe.loc[
-            (dataframe['close'] < grid_level),
-            'buy'
-        ] = 1
+        return kernels.less_scaled(c['close'], c['midprice'], 1 - self.grid_pct, out,
+                                   self.scratch('level', out.shape))
+
+    def sell_signal(self, c, out):
+        # Sell-Signal: Kurs oberhalb von midprice + grid_pct (für Short oder für das Schließen von Longs)
+        return kernels.greater_scaled(c['close'], c['midprice'], 1 + self.grid_pct, out,
+                                      self.scratch('level', out.shape))
+
+    def populate_indicators(self, dataframe: pd.DataFrame, metadata: dict) -> pd.DataFrame:
+        if self.batch_mode:
+            return self.batched_indicators(metadata['pair'], dataframe)
+        return self.indicator_cache().update(metadata['pair'], dataframe)
+
+    def populate_buy_trend(self, dataframe: pd.DataFrame, metadata: dict) -> pd.DataFrame:
+        dataframe['buy'] = self.signal_column(metadata['pair'], dataframe, 'buy')
         return dataframe
 
     def populate_sell_trend(self, dataframe: pd.DataFrame, metadata: dict) -> pd.DataFrame:
-        # Sell-Signal: Kurs oberhalb von midprice + grid_pct (für Short oder für das Schließen von Longs)
-        grid_level = dataframe['midprice'] * (1 + self.grid_pct)
-        dataframe.loc[
-            (dataframe['close'] > grid_level),
-            'sell'
-        ] = 1
+        dataframe['sell'] = self.signal_column(metadata['pair'], dataframe, 'sell')
         return dataframe
@@ -1,12 +1,18 @@
 # user_data/strategies/TrendVolatilityStrategy.py
 
 from freqtrade.strategy import IStrategy
-import ta  # Pure Python-Package, keine Systemlibs nötig
 
-class TrendVolatilityStrategy(IStrategy):
+import numpy as np
+
+import indicator_kernels as kernels
+from batch_signals import BatchSignalMixin
+from incremental_indicators import Atr, Ema, RollingMean
+
+class TrendVolatilityStrategy(BatchSignalMixin, IStrategy):
     """
     Trendfolge-Strategie: EMA50/EMA200 Cross, Einstieg nur bei überdurchschnittlicher Volatilität (ATR).
-    Kompatibel mit purem Python-Package 'ta'.
+    Indikatoren werden inkrementell über die seit dem ersten Aufruf gesehene Historie berechnet
+    (siehe incremental_indicators; auf den vorderen Zeilen nicht gleich 'ta' auf dem aktuellen Dataframe).
     """
     timeframe = '5m'
     minimal_roi = {
@@ -21,31 +27,42 @@ class TrendVolatilityStrategy(IStrategy):
     exit_profit_only = False
     ignore_roi_if_entry_signal = False
 
+    def indicator_specs(self):
+        return {
+            # EMA Indikatoren
+            'ema50': Ema('close', 50),
+            'ema200': Ema('close', 200),
+            # ATR + ATR-Mittelwert
+            'atr': Atr(14),
+            'atr_mean': RollingMean('atr', 100),
+        }
+
+    def buy_signal(self, c, out):
+        # EMA50 kreuzt EMA200 nach oben und ATR über seinem Mittel
+        tmp = self.scratch('mask', out.shape, bool)
+        kernels.cross_above(c['ema50'], c['ema200'], out, tmp)
+        with np.errstate(invalid='ignore'):
+            np.greater(c['atr'], c['atr_mean'], out=tmp)
+        return np.logical_and(out, tmp, out=out)
+
+    def sell_signal(self, c, out):
+        # EMA50 unter EMA200 oder Kurssprung > 2% gegenüber der Vorkerze
+        tmp = self.scratch('mask', out.shape, bool)
+        kernels.jump_above(c['close'], 1.02, tmp, self.scratch('level', out.shape))
+        with np.errstate(invalid='ignore'):
+            np.less(c['ema50'], c['ema200'], out=out)
+        return np.logical_or(out, tmp, out=out)
+
     def populate_indicators(self, dataframe, metadata):
-        # EMA Indikatoren
-        dataframe['ema50'] = ta.trend.ema_indicator(close=dataframe['close'], window=50)
-        dataframe['ema200'] = ta.trend.ema_indicator(close=dataframe['close'], window=200)
-        # ATR + ATR-Mittelwert
-        dataframe['atr'] = ta.volatility.average_true_range(
-            high=dataframe['high'], low=dataframe['low'], close=dataframe['close'], window=14)
-        dataframe['atr_mean'] = dataframe['atr'].rolling(window=100).mean()
-        return dataframe
+        if self.batch_mode:
+            return self.batched_indicators(metadata['pair'], dataframe)
+        # Nur neue Kerzen werden gerechnet, der Rest kommt aus dem Cache je Paar
+        return self.indicator_cache().update(metadata['pair'], dataframe)
 
     def populate_buy_trend(self, dataframe, metadata):
-        dataframe.loc[
-            (
-                (dataframe['ema50'] > dataframe['ema200']) &
-                (dataframe['ema50'].shift(1) <= dataframe['ema200'].shift(1)) &
-                (dataframe['atr'] > dataframe['atr_mean'])
-            ),
-            'buy'] = 1
+        dataframe['buy'] = self.signal_column(metadata['pair'], dataframe, 'buy')
         return dataframe
 
     def populate_sell_trend(self, dataframe, metadata):
-        dataframe.loc[
-            (
-                (dataframe['ema50'] < dataframe['ema200']) |
-                (dataframe['close'] > dataframe['close'].shift(1) * 1.02)
-            ),
-            'sell'] = 1
+        dataframe['sell'] = self.signal_column(metadata['pair'], dataframe, 'sell')
         return dataframe
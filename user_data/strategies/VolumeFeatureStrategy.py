@@ -1,12 +1,16 @@
 from freqtrade.strategy import IStrategy
-import ta
 import pandas as pd
 import numpy as np
 
-class VolumeFeatureStrategy(IStrategy):
+from batch_signals import BatchSignalMixin
+from feature_sink import FeatureSink
+from incremental_indicators import CumSum, Elementwise, Obv
+
+class VolumeFeatureStrategy(BatchSignalMixin, IStrategy):
     """
     Feature-Engineering-Strategie auf Basis von Volume, OBV und CVD.
-    Exportiert alle relevanten Features als CSV für weitere Analyse.
+    Exportiert alle relevanten Features für weitere Analyse: nur neue Zeilen, gesammelt von
+    einem Hintergrund-Thread und binär angehängt (siehe feature_sink.py).
     """
     timeframe = '5m'
     minimal_roi = {"0": 0.02}
@@ -16,31 +20,60 @@ class VolumeFeatureStrategy(IStrategy):
     trailing_stop_positive_offset = 0.02
     trailing_only_offset_is_reached = True
 
-    def populate_indicators(self, dataframe: pd.DataFrame, metadata: dict) -> pd.DataFrame:
-        # Volume direkt aus Daten
-        dataframe['volume'] = dataframe['volume']
+    # Feature-Export
+    feature_export = True
+    feature_dir = 'user_data/data/volume_features'
+    feature_columns = ['open', 'high', 'low', 'close', 'volume', 'obv', 'buy_vol', 'sell_vol', 'delta_vol', 'cvd']
+    feature_flush_interval = 5.0   # Sekunden
+    feature_queue_size = 1000
+    _feature_sink = None
+
+    def feature_sink(self):
+        if self._feature_sink is None:
+            self._feature_sink = FeatureSink(self.feature_dir, self.feature_columns,
+                                             flush_interval=self.feature_flush_interval,
+                                             queue_size=self.feature_queue_size)
+        return self._feature_sink
 
-        # On-Balance Volume (ta)
-        dataframe['obv'] = ta.volume.on_balance_volume(close=dataframe['close'], volume=dataframe['volume'])
+    def indicator_specs(self):
+        return {
+            # On-Balance Volume (wie ta.volume.on_balance_volume)
+            'obv': Obv(),
+            # Cumulative Volume Delta (CVD) - OHLCV-Approximierung
+            # "Buy Volumen" = Volumen wenn close > open, "Sell Volumen" = Volumen wenn close < open
+            'buy_vol': Elementwise(lambda c: np.where(c['close'] > c['open'], c['volume'], 0)),
+            'sell_vol': Elementwise(lambda c: np.where(c['close'] < c['open'], c['volume'], 0)),
+            'delta_vol': Elementwise(lambda c: c['buy_vol'] - c['sell_vol']),
+            'cvd': CumSum('delta_vol'),
+        }
 
-        # Cumulative Volume Delta (CVD) - OHLCV-Approximierung
-        # "Buy Volumen" = Volumen wenn close > open, "Sell Volumen" = Volumen wenn close < open
-        dataframe['buy_vol'] = np.where(dataframe['close'] > dataframe['open'], dataframe['volume'], 0)
-        dataframe['sell_vol'] = np.where(dataframe['close'] < dataframe['open'], dataframe['volume'], 0)
-        dataframe['delta_vol'] = dataframe['buy_vol'] - dataframe['sell_vol']
-        dataframe['cvd'] = dataframe['delta_vol'].cumsum()
+    # Noch keine echten Signale (nur Analyse)
+    def buy_signal(self, c, out):
+        out[...] = False
+        return out
+
+    def sell_signal(self, c, out):
+        out[...] = False
+        return out
+
+    def populate_indicators(self, dataframe: pd.DataFrame, metadata: dict) -> pd.DataFrame:
+        if self.batch_mode:
+            dataframe = self.batched_indicators(metadata['pair'], dataframe)
+        else:
+            # Nur neue Kerzen werden gerechnet, der Rest kommt aus dem Cache je Paar
+            dataframe = self.indicator_cache().update(metadata['pair'], dataframe)
 
-        # Export für Analyse (letzte 2000 Kerzen)
-        if len(dataframe) > 0:
-            dataframe.tail(2000).to_csv(f"user_data/data/volume_features_{metadata['pair'].replace('/', '_')}.csv")
+        # Export für Analyse: nur einreihen, geschrieben wird im Hintergrund
+        if self.feature_export:
+            self.feature_sink().submit(metadata['pair'], dataframe)
 
         return dataframe
 
     # Dummy-Signale (noch kein echtes Trading, nur Analyse)
     def populate_buy_trend(self, dataframe: pd.DataFrame, metadata: dict) -> pd.DataFrame:
-        dataframe['buy'] = 0
+        dataframe['buy'] = self.signal_column(metadata['pair'], dataframe, 'buy')
         return dataframe
 
     def populate_sell_trend(self, dataframe: pd.DataFrame, metadata: dict) -> pd.DataFrame:
-        dataframe['sell'] = 0
+        dataframe['sell'] = self.signal_column(metadata['pair'], dataframe, 'sell')
         return dataframe
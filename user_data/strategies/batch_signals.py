@@ -0,0 +1,115 @@
+# user_data/strategies/batch_signals.py
+"""
+Paarübergreifende Batch-Auswertung für Strategien.
+
+Statt jeden Dataframe einzeln durch populate_* zu schicken, werden die OHLCV-Spalten aller
+Paare mit gleicher Länge und gleicher letzter Kerze zu (Paare x Kerzen)-Matrizen gestapelt,
+Indikatoren und Buy/Sell-Masken in einem Durchlauf gerechnet und das Ergebnis je Paar
+zurückverteilt. Die Indikatoren laufen dabei über den IndicatorCache der Strategie
+(update_many): derselbe Zustand je Paar wie im Einzelpfad, nur gestapelt weitergerechnet.
+
+Eine Strategie erbt von BatchSignalMixin und implementiert
+    indicator_specs()         -> {spalte: Indikator}   siehe incremental_indicators
+    buy_signal(cols, out)                             schreibt die Maske in den bool-Puffer out
+    sell_signal(cols, out)                            cols: {spalte: array (n,) oder (P, n)}
+Alle drei werden im Einzel- wie im Batch-Pfad benutzt, Indikatoren und Signale sind also identisch.
+Signale landen als int8-Spalten (0/1) im Dataframe; Zwischenergebnisse laufen über
+wiederverwendete Scratch-Puffer (scratch()), pro Aufruf wird nur die Ergebnisspalte angelegt.
+Mit batch_mode = True rechnet bot_loop_start einmal pro Iteration alle Paare der Whitelist;
+populate_* holen sich dann nur noch ihr Ergebnis ab (Fallback: Einzelrechnung).
+"""
+
+import numpy as np
+
+from incremental_indicators import OHLCV, FrameColumns, IndicatorCache, attach_columns, frame_times
+
+
+def frame_key(dataframe, time_column='date'):
+    """(Länge, letzte Kerze): Paare mit gleichem Schlüssel lassen sich stapeln."""
+    if len(dataframe) == 0:
+        return (0, None)
+    return (len(dataframe), dataframe[time_column].iloc[-1])
+
+
+class BatchResult:
+    def __init__(self, key, indicators, buy, sell):
+        self.key = key
+        self.indicators = indicators
+        self.buy = buy
+        self.sell = sell
+
+
+def evaluate(strategy, frames, time_column='date'):
+    """Rechnet alle Dataframes gruppenweise als Matrix. Rückgabe: {pair: BatchResult}."""
+    groups = {}
+    for pair, df in frames.items():
+        if df is not None and len(df):
+            groups.setdefault(frame_key(df, time_column), []).append(pair)
+    cache = strategy.indicator_cache()
+    results = {}
+    for key, pairs in groups.items():
+        cols = {c: np.stack([frames[p][c].to_numpy(dtype=np.float64) for p in pairs]) for c in OHLCV}
+        times = [frame_times(frames[p], cache.time_column) for p in pairs]
+        indicators = cache.update_many(pairs, times, cols)
+        buy, sell = strategy.batch_signals({**cols, **indicators})
+        buy, sell = buy.view(np.int8), sell.view(np.int8)
+        for i, pair in enumerate(pairs):
+            results[pair] = BatchResult(key, {name: values[i] for name, values in indicators.items()},
+                                        buy[i], sell[i])
+    return results
+
+
+class BatchSignalMixin:
+    """Erwartet indicator_specs, buy_signal und sell_signal in der Strategie (siehe Modul-Docstring)."""
+    batch_mode = False  # True: alle Paare der Whitelist einmal pro Iteration gemeinsam rechnen
+    _batch = None
+    _indicators = None
+
+    def indicator_cache(self):
+        """IndicatorCache der Strategie: ein Zustand je Paar für Einzel-, Batch- und Stream-Pfad."""
+        if self._indicators is None:
+            self._indicators = IndicatorCache(self.indicator_specs())
+        return self._indicators
+
+    def batch_signals(self, cols):
+        """(buy, sell) als neue bool-Arrays."""
+        shape = cols['close'].shape
+        buy, sell = np.empty(shape, dtype=bool), np.empty(shape, dtype=bool)
+        return self.buy_signal(cols, buy), self.sell_signal(cols, sell)
+
+    def scratch(self, name, shape, dtype=np.float64):
+        """Wiederverwendeter Zwischenpuffer; neu angelegt nur wenn sich Form oder Typ ändern."""
+        buffers = self.__dict__.setdefault('_scratch', {})
+        buf = buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = buffers[name] = np.empty(shape, dtype=dtype)
+        return buf
+
+    def bot_loop_start(self, current_time=None, **kwargs):
+        if not self.batch_mode or getattr(self, 'dp', None) is None:
+            return
+        frames = {pair: self.dp.get_pair_dataframe(pair, self.timeframe) for pair in self.dp.current_whitelist()}
+        self._batch = evaluate(self, frames)
+
+    def _batch_result(self, pair, dataframe):
+        if self._batch is None:
+            self._batch = {}
+        result = self._batch.get(pair)
+        if result is None or result.key != frame_key(dataframe):
+            result = self._batch[pair] = evaluate(self, {pair: dataframe})[pair]
+        return result
+
+    def batched_indicators(self, pair, dataframe):
+        """Dataframe plus Indikatorspalten aus dem Batch-Ergebnis (neues Objekt)."""
+        if len(dataframe) == 0:
+            return dataframe
+        return attach_columns(dataframe, self._batch_result(pair, dataframe).indicators)
+
+    def signal_column(self, pair, dataframe, side):
+        """Buy- (side='buy') oder Sell-Signal als int8-Array (0/1) für den Dataframe."""
+        if self.batch_mode and len(dataframe):
+            result = self._batch_result(pair, dataframe)
+            return result.buy if side == 'buy' else result.sell
+        out = np.empty(len(dataframe), dtype=bool)
+        signal = self.buy_signal if side == 'buy' else self.sell_signal
+        return signal(FrameColumns(dataframe), out).view(np.int8)
@@ -0,0 +1,199 @@
+# user_data/strategies/feature_sink.py
+"""
+Asynchroner Feature-Export für Strategien.
+
+Die Strategie ruft nur sink.submit(pair, dataframe) auf: neue Zeilen (nach dem zuletzt
+übergebenen Zeitstempel) werden in eine begrenzte Queue gelegt, ein Hintergrund-Thread
+sammelt sie und hängt sie alle flush_interval Sekunden (oder ab flush_rows Zeilen) an.
+
+Layout: {root}/{pair}/{spalte}.bin, reine Binärspalten ohne Header
+  timestamp -> int64 (Epoch-ms), alle Features -> float64
+Anhängen kostet nur die neuen Zeilen; timestamp wird zuletzt geschrieben, Leser kürzen auf
+die kürzeste Spalte, und vor jedem Anhängen werden alle Spalten auf timestamp.bin gekürzt. Ist die Queue voll, wird nicht blockiert, sondern `dropped` hochgezählt;
+die Zeilen gehen dabei nicht verloren, sie werden beim nächsten submit erneut angeboten.
+
+Lesen / Export für die Analyse:
+    python user_data/strategies/feature_sink.py user_data/data/volume_features ETH/USDT --csv out.csv
+"""
+
+import argparse
+import atexit
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+FLUSH_INTERVAL = 5.0   # Sekunden
+FLUSH_ROWS = 5000      # spätestens ab so vielen gepufferten Zeilen schreiben
+QUEUE_SIZE = 1000      # Batches, nicht Zeilen
+
+
+def pair_dir(root, pair):
+    return os.path.join(root, pair.replace('/', '_').replace(':', '_'))
+
+
+def _column_path(path, col):
+    return os.path.join(path, f"{col}.bin")
+
+
+def _dtype(col):
+    return np.int64 if col == 'timestamp' else np.float64
+
+
+def read_features(root, pair, columns=None):
+    """Gespeicherte Features als DataFrame mit DatetimeIndex 'timestamp' oder None."""
+    path = pair_dir(root, pair)
+    if not os.path.exists(_column_path(path, 'timestamp')):
+        return None
+    if columns is None:
+        columns = sorted(f[:-4] for f in os.listdir(path) if f.endswith('.bin') and f != 'timestamp.bin')
+    data = {col: np.fromfile(_column_path(path, col), dtype=_dtype(col)) for col in ['timestamp', *columns]}
+    n = min(len(a) for a in data.values())  # Schutz gegen halb geschriebene Anhänge
+    index = pd.DatetimeIndex(data.pop('timestamp')[:n].astype('datetime64[ms]'), name='timestamp')
+    return pd.DataFrame({col: a[:n] for col, a in data.items()}, index=index)
+
+
+def last_timestamp(root, pair):
+    path = _column_path(pair_dir(root, pair), 'timestamp')
+    if not os.path.exists(path):
+        return None
+    size = os.path.getsize(path) // 8
+    if size == 0:
+        return None
+    return int(np.memmap(path, dtype=np.int64, mode='r', offset=(size - 1) * 8, shape=(1,))[0])
+
+
+class FeatureSink:
+    """Hintergrund-Writer mit begrenzter Queue; submit() ist der einzige Aufruf im Strategie-Loop."""
+
+    def __init__(self, root, columns, flush_interval=FLUSH_INTERVAL, flush_rows=FLUSH_ROWS,
+                 queue_size=QUEUE_SIZE):
+        self.root = root
+        self.columns = list(columns)
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0       # verworfene Batches (Queue voll)
+        self.written = 0       # geschriebene Zeilen
+        self._submitted = {}   # pair -> letzter erfolgreich eingereihter Zeitstempel (ms)
+        self._thread = threading.Thread(target=self._run, name='feature-sink', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, pair, dataframe, time_column='date'):
+        """Reiht alle Zeilen nach dem letzten eingereihten Zeitstempel ein. Rückgabe: Anzahl Zeilen."""
+        if len(dataframe) == 0:
+            return 0
+        if pair not in self._submitted:
+            self._submitted[pair] = last_timestamp(self.root, pair)
+        dates = dataframe[time_column]
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_convert(None)
+        timestamps = dates.to_numpy(dtype='datetime64[ms]').view(np.int64)
+        last = self._submitted[pair]
+        start = 0 if last is None else int(np.searchsorted(timestamps, last, side='right'))
+        if start >= len(timestamps):
+            return 0
+        batch = {'timestamp': timestamps[start:].copy()}
+        for col in self.columns:
+            batch[col] = dataframe[col].to_numpy(dtype=np.float64)[start:].copy()
+        try:
+            self.queue.put_nowait((pair, batch))
+        except queue.Full:
+            self.dropped += 1
+            return 0
+        self._submitted[pair] = int(timestamps[-1])
+        return len(timestamps) - start
+
+    def _run(self):
+        pending = {}
+        rows = 0
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=max(deadline - time.monotonic(), 0.0))
+                if item is None:
+                    stopping = True
+                else:
+                    pair, batch = item
+                    pending.setdefault(pair, []).append(batch)
+                    rows += len(batch['timestamp'])
+            except queue.Empty:
+                pass
+            if stopping or rows >= self.flush_rows or time.monotonic() >= deadline:
+                for pair, batches in pending.items():
+                    self._append(pair, batches)
+                pending.clear()
+                rows = 0
+                deadline = time.monotonic() + self.flush_interval
+
+    def _append(self, pair, batches):
+        path = pair_dir(self.root, pair)
+        os.makedirs(path, exist_ok=True)
+        last = last_timestamp(self.root, pair)
+        ts = np.concatenate([b['timestamp'] for b in batches])
+        keep = np.ones(len(ts), dtype=bool) if last is None else ts > last
+        keep[1:] &= ts[1:] > np.maximum.accumulate(ts)[:-1]  # nur streng steigende Zeitstempel
+        if not keep.any():
+            return
+        self._align(path)
+        # Features zuerst, timestamp zuletzt: Leser sehen nie mehr Zeitstempel als Daten
+        for col in self.columns + ['timestamp']:
+            values = np.concatenate([b[col] for b in batches])[keep].astype(_dtype(col), copy=False)
+            with open(_column_path(path, col), 'ab') as f:
+                values.tofile(f)
+        self.written += int(keep.sum())
+
+    def _align(self, path):
+        """
+        Kürzt jede Spalte auf die Zeilenzahl von timestamp.bin, bevor angehängt wird: nach einem
+        Abbruch mitten im Anhängen stehen sonst verwaiste Feature-Zeilen vor den neuen Daten.
+        Fehlende Zeilen (z.B. neu hinzugekommene Spalte) werden mit NaN aufgefüllt.
+        """
+        ts_path = _column_path(path, 'timestamp')
+        rows = os.path.getsize(ts_path) // 8 if os.path.exists(ts_path) else 0
+        for col in self.columns + ['timestamp']:
+            col_path = _column_path(path, col)
+            size = os.path.getsize(col_path) if os.path.exists(col_path) else 0
+            if size > rows * 8:
+                os.truncate(col_path, rows * 8)
+            elif size < rows * 8:
+                with open(col_path, 'r+b' if size else 'wb') as f:
+                    f.truncate(size // 8 * 8)
+                    f.seek(0, os.SEEK_END)
+                    np.full(rows - size // 8, np.nan).tofile(f)
+
+    def close(self, timeout=None):
+        """Schreibt alles Eingereihte und beendet den Writer (läuft auch per atexit)."""
+        if not self._thread.is_alive():
+            return
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'dropped': self.dropped, 'written': self.written}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Liest exportierte Features eines Paares")
+    parser.add_argument('root', help="Feature-Verzeichnis, z.B. user_data/data/volume_features")
+    parser.add_argument('pair', help="z.B. ETH/USDT")
+    parser.add_argument('--csv', default=None, help="Als CSV speichern statt nur anzeigen")
+    args = parser.parse_args(argv)
+
+    df = read_features(args.root, args.pair)
+    if df is None:
+        parser.error(f"Keine Features für {args.pair} in {args.root}")
+    if args.csv:
+        df.to_csv(args.csv)
+        print(f"{len(df)} Zeilen gespeichert in: {args.csv}")
+    else:
+        print(df.tail(20).to_string())
+
+
+if __name__ == '__main__':
+    main()
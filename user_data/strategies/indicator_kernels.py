@@ -0,0 +1,192 @@
+# user_data/strategies/indicator_kernels.py
+"""
+Indikator-Kernels auf reinen NumPy-Arrays (Ersatz für das Package 'ta').
+
+Alle Kernels rechnen entlang der letzten Achse, nehmen also eine Serie (n,) oder eine
+Matrix (Paare x Kerzen) in einem Aufruf. Über `out` kann ein vorhandener Puffer gleicher
+Form übergeben werden, der dann (wo NumPy das erlaubt) ohne Zwischen-Arrays befüllt wird.
+
+Semantik wie ta bzw. pandas:
+  ema         ewm(span, adjust=False, min_periods=span).mean()       NaN in der Anlaufphase
+  atr         ta.volatility.average_true_range (Wilder)               0 in der Anlaufphase
+  obv         ta.volume.on_balance_volume
+  cvd         cumsum(volume * sign(close - open))
+  sma         rolling(window).mean()                                   NaN in der Anlaufphase
+  rolling_std rolling(window).std(ddof)                                NaN in der Anlaufphase
+              (beide: NaN nur in Fenstern, die ein NaN enthalten)
+"""
+
+import numpy as np
+from scipy.signal import lfilter
+
+
+def _out(x, out):
+    return np.empty(x.shape, dtype=np.float64) if out is None else out
+
+
+def _as_float(x):
+    return np.asarray(x, dtype=np.float64)
+
+
+def ema(x, span, out=None, prev=None):
+    """`prev`: letzter EMA-Wert je Serie zum Weiterrechnen (dann ohne Anlaufphase)."""
+    x = _as_float(x)
+    out = _out(x, out)
+    if x.shape[-1] == 0:
+        return out
+    a = 2.0 / (span + 1.0)
+    start = x[..., :1] if prev is None else np.reshape(prev, x.shape[:-1] + (1,))
+    out[...], _ = lfilter([a], [1.0, a - 1.0], x, axis=-1, zi=(1.0 - a) * start)
+    if prev is None:
+        out[..., :span - 1] = np.nan
+    return out
+
+
+def true_range(high, low, close, out=None, prev_close=None):
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    out = _out(close, out)
+    shifted = np.empty_like(close)
+    shifted[..., 1:] = close[..., :-1]
+    shifted[..., :1] = np.nan if prev_close is None else np.reshape(prev_close, close.shape[:-1] + (1,))
+    np.subtract(high, low, out=out)
+    with np.errstate(invalid='ignore'):
+        np.fmax(out, np.abs(high - shifted), out=out)
+        np.fmax(out, np.abs(low - shifted), out=out)
+    return out
+
+
+def atr(high, low, close, window=14, out=None):
+    out = true_range(high, low, close, out=out)
+    n = out.shape[-1]
+    if n < window:
+        out[...] = 0.0
+        return out
+    k = (window - 1.0) / window
+    seed = out[..., :window].mean(axis=-1, keepdims=True)
+    rest = out[..., window:]
+    out[..., window:], _ = lfilter([1.0 / window], [1.0, -k], rest, axis=-1, zi=k * seed)
+    out[..., window - 1:window] = seed
+    out[..., :window - 1] = 0.0
+    return out
+
+
+def obv(close, volume, out=None):
+    close, volume = _as_float(close), _as_float(volume)
+    out = _out(close, out)
+    # -volume bei fallendem Close, sonst +volume (auch die erste Kerze)
+    falling = np.zeros(close.shape, dtype=bool)
+    np.less(close[..., 1:], close[..., :-1], out=falling[..., 1:])
+    np.copyto(out, volume)
+    np.negative(volume, out=out, where=falling)
+    return np.cumsum(out, axis=-1, out=out)
+
+
+def cvd(open_, close, volume, out=None):
+    open_, close, volume = _as_float(open_), _as_float(close), _as_float(volume)
+    out = _out(close, out)
+    np.subtract(close, open_, out=out)
+    np.sign(out, out=out)
+    np.multiply(out, volume, out=out)
+    return np.cumsum(out, axis=-1, out=out)
+
+
+def _window_sums(x, window, power):
+    """Summen von x**power über gleitende Fenster, Länge n - window + 1 (entlang der letzten Achse)."""
+    cs = np.zeros(x.shape[:-1] + (x.shape[-1] + 1,))
+    np.cumsum(x ** power if power != 1 else x, axis=-1, out=cs[..., 1:])
+    return cs[..., window:] - cs[..., :-window]
+
+
+def _centered(x):
+    """
+    (x - Mittel der gültigen Werte je Serie mit 0 statt NaN, Mittel, NaN-Maske oder None).
+    Ohne das Ersetzen machte ein einzelnes NaN über die Cumsum alle folgenden Fenster ungültig.
+    """
+    nan = np.isnan(x)
+    if not nan.any():
+        mean = x.mean(axis=-1, keepdims=True)
+        return x - mean, mean, None
+    filled = np.where(nan, 0.0, x)
+    count = x.shape[-1] - nan.sum(axis=-1, keepdims=True)
+    total = filled.sum(axis=-1, keepdims=True)
+    mean = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+    np.subtract(filled, mean, out=filled)
+    filled[nan] = 0.0
+    return filled, mean, nan
+
+
+def _mask_nan_windows(body, nan, window):
+    """Setzt Fenster mit mindestens einem NaN auf NaN (wie pandas mit min_periods=window)."""
+    if nan is not None:
+        body[_window_sums(nan, window, 1) > 0] = np.nan
+
+
+def sma(x, window, out=None):
+    x = _as_float(x)
+    out = _out(x, out)
+    out[..., :window - 1] = np.nan
+    if x.shape[-1] >= window:
+        # zentriert summieren, sonst wächst der Rundungsfehler der Cumsum mit der Länge
+        centered, mean, nan = _centered(x)
+        body = out[..., window - 1:]
+        np.divide(_window_sums(centered, window, 1), window, out=body)
+        np.add(body, mean, out=body)
+        _mask_nan_windows(body, nan, window)
+    return out
+
+
+def rolling_std(x, window, ddof=1, out=None):
+    x = _as_float(x)
+    out = _out(x, out)
+    out[..., :window - 1] = np.nan
+    if x.shape[-1] < window or window <= ddof:
+        out[..., window - 1:] = np.nan
+        return out
+    # Zentrieren je Serie reduziert die Auslöschung in sum(x^2) - sum(x)^2 / n
+    centered, _, nan = _centered(x)
+    s = _window_sums(centered, window, 1)
+    s2 = _window_sums(centered, window, 2)
+    var = out[..., window - 1:]
+    np.multiply(s, s, out=var)
+    np.divide(var, window, out=var)
+    np.subtract(s2, var, out=var)
+    np.maximum(var, 0.0, out=var)
+    np.divide(var, window - ddof, out=var)
+    np.sqrt(var, out=var)
+    _mask_nan_windows(var, nan, window)
+    return out
+
+
+# ==== SIGNAL-KERNELS ====
+# Schreiben in einen vorhandenen bool-Puffer `out`; `scratch` ist ein Puffer gleicher Form
+# für Zwischenergebnisse. Vergleiche mit NaN sind False (wie bei pandas).
+
+def cross_above(a, b, out, scratch):
+    """a kreuzt b nach oben: a > b und in der Vorkerze a <= b (ohne shift-Kopien)."""
+    out[..., :1] = False
+    with np.errstate(invalid='ignore'):
+        np.greater(a[..., 1:], b[..., 1:], out=out[..., 1:])
+        np.less_equal(a[..., :-1], b[..., :-1], out=scratch[..., 1:])
+    np.logical_and(out[..., 1:], scratch[..., 1:], out=out[..., 1:])
+    return out
+
+
+def greater_scaled(x, ref, factor, out, scratch):
+    """x > ref * factor; scratch muss float64 sein."""
+    np.multiply(ref, factor, out=scratch)
+    with np.errstate(invalid='ignore'):
+        return np.greater(x, scratch, out=out)
+
+
+def less_scaled(x, ref, factor, out, scratch):
+    """x < ref * factor; scratch muss float64 sein."""
+    np.multiply(ref, factor, out=scratch)
+    with np.errstate(invalid='ignore'):
+        return np.less(x, scratch, out=out)
+
+
+def jump_above(x, factor, out, scratch):
+    """x > Vorkerze * factor (erste Kerze False)."""
+    out[..., :1] = False
+    greater_scaled(x[..., 1:], x[..., :-1], factor, out[..., 1:], scratch[..., 1:])
+    return out